@@ -13,10 +13,11 @@ from app.data_operations import (
     remove_from_blocklist,
     get_users, 
     add_user,    
-    remove_user,
+    remove_users,
     update_access_request_status
 )
 from app.logger import log_action
+from app.log_query import consultar_logs, opcoes_filtro_logs, COLUNAS_LOG, TAMANHO_PAGINA_LOGS
 from app.utils import clear_access_cache
 # NOVAS IMPORTAÇÕES PARA A PÁGINA DE TESTES
 from app.notifications import GmailNotifier, send_notification
@@ -40,7 +41,7 @@ def display_user_management(sheet_ops):
             else:
                 if add_user(new_user_email.strip().lower(), new_user_role):
                     st.success(f"Usuário '{new_user_email.strip()}' adicionado com sucesso!")
-                    clear_access_cache()
+                    clear_access_cache('users', 'roles')
                     st.rerun()
 
     st.divider()
@@ -65,14 +66,11 @@ def display_user_management(sheet_ops):
                 if not users_to_remove:
                     st.warning("Nenhum usuário selecionado para remoção.")
                 else:
-                    success_count = 0
-                    for user in users_to_remove:
-                        if remove_user(user):
-                            success_count += 1
+                    success_count = len(remove_users(users_to_remove))
                     
                     st.success(f"{success_count} de {len(users_to_remove)} usuário(s) removido(s) com sucesso!")
                     if success_count > 0:
-                        clear_access_cache()
+                        clear_access_cache('users', 'roles')
                         st.rerun()
 
 def display_access_requests(sheet_ops):
@@ -164,7 +162,7 @@ def display_access_requests(sheet_ops):
                                         role=request['desired_role']
                                     )
                                     st.success(f"✅ Acesso aprovado para {request['user_name']}!")
-                                    clear_access_cache()
+                                    clear_access_cache('users', 'roles')
                                     st.rerun()
                                 else:
                                     st.error("Erro ao adicionar usuário ao sistema.")
@@ -290,7 +288,7 @@ def display_pending_requests(sheet_ops):
                                 if block_id_to_remove:
                                     if remove_from_blocklist([block_id_to_remove]):
                                         st.success(f"Bloqueio permanente para '{person_name}' removido com sucesso!")
-                                        clear_access_cache()
+                                        clear_access_cache('blocklist')
                                     else:
                                         st.error(f"A entrada foi aprovada, mas FALHA ao remover o bloqueio permanente. Remova manualmente na aba 'Gerenciar Bloqueios'.")
                                 else:
@@ -317,7 +315,7 @@ def display_blocklist_management(sheet_ops):
         st.subheader("Adicionar Bloqueio de Pessoa ou Empresa")
         block_type = st.radio("Selecione o tipo de bloqueio:", ["Pessoa", "Empresa"], horizontal=True, key="block_type")
         
-        acess_data = sheet_ops.carregar_dados()
+        acess_data = sheet_ops.carregar_dados_recentes()
         options = []
         if acess_data and len(acess_data) > 1:
             df_acess = pd.DataFrame(acess_data[1:], columns=acess_data[0])
@@ -344,7 +342,7 @@ def display_blocklist_management(sheet_ops):
                     admin_name = get_user_display_name()
                     if add_to_blocklist(block_type, values_to_block, clean_reason, admin_name):
                         st.success(f"{block_type}(s) bloqueada(s) com sucesso!")
-                        clear_access_cache()
+                        clear_access_cache('blocklist')
                         st.rerun()
     st.divider()
 
@@ -378,19 +376,47 @@ def display_blocklist_management(sheet_ops):
                 
                 if success:
                     st.success("Bloqueios removidos com sucesso! A lista será atualizada.")
-                    clear_access_cache()
+                    clear_access_cache('blocklist')
                 
                 st.session_state.processing_blocklist = False 
                 st.rerun()
                 
 def display_logs(sheet_ops):
-    """Lida com a lógica da aba de Logs."""
+    """Lida com a lógica da aba de Logs (consulta paginada, das entradas mais recentes para as mais antigas)."""
     st.header("Logs de Atividade do Sistema")
     try:
-        log_data = sheet_ops.carregar_dados_aba('logs')
-        if log_data and len(log_data) > 1:
-            log_df = pd.DataFrame(log_data[1:], columns=log_data[0])
-            st.dataframe(log_df.sort_values(by="Timestamp", ascending=False), use_container_width=True, hide_index=True)
+        col1, col2, col3 = st.columns(3)
+        # O período vem primeiro: as opções de usuário e ação saem só das abas de logs dele
+        with col3:
+            periodo = st.date_input("Período:", value=(), format="DD/MM/YYYY", key="logs_periodo")
+        data_inicio = periodo[0] if len(periodo) > 0 else None
+        data_fim = periodo[1] if len(periodo) > 1 else data_inicio
+        usuarios_disponiveis, acoes_disponiveis = opcoes_filtro_logs(data_inicio, data_fim)
+        # Mantém as seleções feitas antes de o período mudar
+        usuarios_disponiveis = sorted(set(usuarios_disponiveis) | set(st.session_state.get('logs_usuarios', [])))
+        acoes_disponiveis = sorted(set(acoes_disponiveis) | set(st.session_state.get('logs_acoes', [])))
+        with col1:
+            usuarios = st.multiselect("Usuário:", usuarios_disponiveis, key="logs_usuarios")
+        with col2:
+            acoes = st.multiselect("Ação:", acoes_disponiveis, key="logs_acoes")
+
+        # Volta à primeira página quando os filtros mudam
+        filtros = (tuple(usuarios), tuple(acoes), data_inicio, data_fim)
+        if st.session_state.get('logs_filtros') != filtros:
+            st.session_state.logs_filtros = filtros
+            st.session_state.logs_limite = TAMANHO_PAGINA_LOGS
+
+        linhas, ha_mais = consultar_logs(usuarios, acoes, data_inicio, data_fim, st.session_state.logs_limite)
+        if linhas is None:
+            st.warning("Não foi possível carregar os logs.")
+        elif linhas:
+            st.dataframe(pd.DataFrame(linhas, columns=COLUNAS_LOG), use_container_width=True, hide_index=True)
+            st.caption(f"Exibindo as {len(linhas)} entradas mais recentes.")
+            if ha_mais and st.button("Carregar mais", key="logs_carregar_mais"):
+                st.session_state.logs_limite += TAMANHO_PAGINA_LOGS
+                st.rerun()
+        elif any(filtros):
+            st.info("Nenhuma entrada de log corresponde aos filtros.")
         else:
             st.info("Nenhuma atividade de log registrada ainda.")
     except Exception as e:
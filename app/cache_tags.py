@@ -0,0 +1,39 @@
+import logging
+import streamlit as st
+
+# Cache de leituras com invalidação por etiqueta ("tag"). Cada função cacheada
+# declara os dados de que depende; uma gravação invalida só as etiquetas que
+# tocou, em vez de st.cache_data.clear(), que descartaria o cache de todas as
+# funções (e de todas as sessões do servidor).
+ETIQUETAS = ('access', 'users', 'blocklist', 'roles', 'schedules', 'materials')
+
+_funcoes_por_etiqueta = {etiqueta: [] for etiqueta in ETIQUETAS}
+
+
+def cache_data(*etiquetas, **opcoes):
+    """
+    Igual a st.cache_data (com as mesmas opções, ex.: ttl), registrando a função
+    sob as etiquetas informadas para que invalidar() possa limpá-la.
+    """
+    def decorar(funcao):
+        cacheada = st.cache_data(**opcoes)(funcao)
+        for etiqueta in etiquetas:
+            if etiqueta not in _funcoes_por_etiqueta:
+                logging.warning(f"Etiqueta de cache desconhecida em '{funcao.__name__}': '{etiqueta}'")
+                continue
+            _funcoes_por_etiqueta[etiqueta].append(cacheada)
+        return cacheada
+    return decorar
+
+
+def invalidar(*etiquetas):
+    """Limpa o cache das funções registradas sob qualquer uma das etiquetas."""
+    limpas = set()
+    for etiqueta in etiquetas:
+        if etiqueta not in _funcoes_por_etiqueta:
+            logging.warning(f"Etiqueta de cache desconhecida: '{etiqueta}'")
+            continue
+        for funcao in _funcoes_por_etiqueta[etiqueta]:
+            if id(funcao) not in limpas:
+                funcao.clear()
+                limpas.add(id(funcao))
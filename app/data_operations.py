@@ -1,23 +1,90 @@
 import streamlit as st
 import pandas as pd
+import threading
 from datetime import datetime, timedelta
 from app.operations import SheetOperations
+from app.schemas import para_dataframe
+from app import cache_tags
 from app.logger import log_action
 from app.utils import get_sao_paulo_time, validate_cpf
 
 
+def build_access_dataframe(data):
+    """
+    Monta o DataFrame da portaria a partir dos dados da aba 'acess' (cabeçalho + linhas):
+    tipado segundo o esquema da aba (Data_dt, Horário de Entrada_min, categorias) e
+    ordenado do registro mais recente para o mais antigo.
+    """
+    df = para_dataframe(data, 'acess')
+    if df.empty:
+        return df
+    return df.sort_values(
+        by=['Data_dt', 'Horário de Entrada_min'], ascending=[False, False], na_position='last'
+    ).reset_index(drop=True)
+
+@st.cache_resource
+def _shared_access_dataset():
+    """
+    Conjunto de dados da portaria compartilhado por todas as sessões do processo:
+    um único DataFrame (build_access_dataframe), somente leitura, com um número
+    de versão. Cada sessão guarda apenas a versão que está usando
+    (st.session_state.acesso_versao), e não uma cópia dos dados.
+    """
+    return {'lock': threading.Lock(), 'versao': 0, 'linhas': None, 'df': pd.DataFrame()}
+
+def _same_rows(atuais, anteriores):
+    """Compara as linhas lidas com as do DataFrame compartilhado (mesmo objeto ou mesmo conteúdo)."""
+    if anteriores is None or len(atuais) != len(anteriores):
+        return False
+    return all(a is b or a == b for a, b in zip(atuais, anteriores))
+
+def refresh_access_dataset(sheet_operations=None):
+    """
+    Relê os registros recentes (do cache de SheetOperations) e, só se mudaram,
+    monta um novo DataFrame compartilhado e avança a versão. Se a leitura
+    falhar, mantém o DataFrame atual (não publica um conjunto vazio para todas
+    as sessões) e avisa a sessão. Retorna a versão atual.
+    """
+    sheet_operations = sheet_operations or SheetOperations()
+    # A portaria usa só o histórico recente (mês corrente e últimas partições mensais)
+    data = sheet_operations.carregar_dados_recentes()
+    dataset = _shared_access_dataset()
+    if data is None:
+        if dataset['linhas'] is None:
+            st.error("Não foi possível carregar os registros de acesso da planilha.")
+        else:
+            st.warning("Não foi possível atualizar os registros de acesso; exibindo os últimos dados carregados.")
+        return dataset['versao']
+    with dataset['lock']:
+        if not _same_rows(data, dataset['linhas']):
+            dataset['df'] = build_access_dataframe(data)
+            dataset['linhas'] = data
+            dataset['versao'] += 1
+        return dataset['versao']
+
+def get_access_dataframe():
+    """
+    Retorna o DataFrame compartilhado da portaria, na versão mais recente (sem
+    cópia: não deve ser alterado). Se a sessão ainda não tem uma versão (primeiro
+    acesso ou após clear_access_cache), os dados são conferidos antes.
+    """
+    if 'acesso_versao' not in st.session_state:
+        load_data_from_sheets()
+    dataset = _shared_access_dataset()
+    st.session_state.acesso_versao = dataset['versao']
+    return dataset['df']
+
 def load_data_from_sheets():
-    """Carrega os dados da planilha e armazena no estado da sessão."""
+    """Carrega os dados da planilha no conjunto compartilhado e registra a versão na sessão."""
     try:
         sheet_operations = SheetOperations()
-        data = sheet_operations.carregar_dados()
-        if data:
-            st.session_state.df_acesso_veiculos = pd.DataFrame(data[1:], columns=data[0]).fillna("")
-        else:
-            st.session_state.df_acesso_veiculos = pd.DataFrame()
+        # Busca de uma vez as abas usadas na primeira tela; as leituras
+        # seguintes (acesso, aprovadores, bloqueios, agendamentos, usuários) vêm do cache
+        sheet_operations.pre_carregar_abas()
+        st.session_state.acesso_versao = refresh_access_dataset(sheet_operations)
     except Exception as e:
         st.error(f"Falha ao carregar dados iniciais da planilha: {e}")
-        st.session_state.df_acesso_veiculos = pd.DataFrame()
+        st.session_state.acesso_versao = _shared_access_dataset()['versao']
 
 def add_record(name, cpf, placa, marca_carro, horario_entrada, data, empresa, status, motivo, aprovador, first_reg_date=""):
     """Adiciona um novo registro de acesso na planilha."""
@@ -65,43 +132,39 @@ def update_exit_time(name, exit_date_str, exit_time_str):
         except ValueError as e:
             return False, f"Erro ao processar datas: {e}"
 
-        # Pega os índices das colunas
-        try:
-            exit_time_index = header.index("Horário de Saída")
-        except ValueError:
+        if "Horário de Saída" not in header:
             return False, "Coluna 'Horário de Saída' não encontrada na planilha."
 
+        def fechar_saida(horario):
+            # Grava só o horário de saída e só se o registro ainda estiver em aberto:
+            # outra portaria pode ter registrado a saída desde a leitura acima
+            def alterar(registro):
+                if registro.get("Horário de Saída", ""):
+                    return None
+                return {"Horário de Saída": horario}
+            return alterar
+
         # Caso 1: Saída no mesmo dia da entrada
         if entry_date.date() == exit_date.date():
-            # Encontra a linha original nos dados
-            original_row = next((row for row in all_data if str(row[0]) == str(record_id)), None)
-            if original_row is None: 
-                return False, "Registro original não encontrado para edição."
-            
-            # Cria uma cópia dos dados sem o ID
-            updated_data = list(original_row[1:])
-            
-            # Atualiza o horário de saída (índice - 1 porque removemos o ID)
-            updated_data[exit_time_index - 1] = exit_time_str 
-            
-            # Usa o método correto editar_dados (que chama editar_dados_aba internamente)
-            if sheet_operations.editar_dados(record_id, updated_data):
+            resultado = sheet_operations.atualizar_campos(record_id, fechar_saida(exit_time_str))
+            if resultado:
                 return True, "Horário de saída atualizado com sucesso."
+            if resultado is None:
+                return False, "A saída desta pessoa já foi registrada em outra estação."
             return False, "Falha ao editar o registro na planilha."
         
         # Caso 2: Pernoite (saída em dia diferente)
         else:
             # Atualiza o primeiro registro para fechar às 23:59
-            original_row = next((row for row in all_data if str(row[0]) == str(record_id)), None)
-            if original_row is None:
-                return False, "Registro original não encontrado."
-            
-            updated_data = list(original_row[1:])
-            updated_data[exit_time_index - 1] = "23:59"
-            
-            if not sheet_operations.editar_dados(record_id, updated_data):
+            resultado = sheet_operations.atualizar_campos(record_id, fechar_saida("23:59"))
+            if resultado is None:
+                return False, "A saída desta pessoa já foi registrada em outra estação."
+            if not resultado:
                 return False, "Falha ao atualizar registro de entrada."
 
+            # Acumula os registros de pernoite para gravá-los em uma única chamada
+            novos_registros = []
+
             # Cria registros intermediários (00:00 - 23:59)
             current_date = entry_date + timedelta(days=1)
             while current_date.date() < exit_date.date():
@@ -120,8 +183,7 @@ def update_exit_time(name, exit_date_str, exit_time_str):
                     ""
                 ]
                 
-                # Usa adc_dados que adiciona à aba 'acess' por padrão
-                sheet_operations.adc_dados(intermediate_data)
+                novos_registros.append(intermediate_data)
                 current_date += timedelta(days=1)
 
             # Cria registro final com horário de saída real
@@ -139,8 +201,10 @@ def update_exit_time(name, exit_date_str, exit_time_str):
                 record_to_update.get("Aprovador", ""), 
                 ""
             ]
+            novos_registros.append(final_data)
             
-            sheet_operations.adc_dados(final_data)
+            if not sheet_operations.adc_dados_lote(novos_registros):
+                return False, "Saída fechada às 23:59, mas falhou ao criar os registros de pernoite."
             return True, "Registros de pernoite criados com sucesso."
             
     except Exception as e:
@@ -155,35 +219,24 @@ def update_record_status(record_id, new_status, approver_name):
     """
     try:
         sheet_operations = SheetOperations()
-        all_data = sheet_operations.carregar_dados()
+        # Inclui as partições recentes para encontrar um CPF de visitas anteriores
+        all_data = sheet_operations.carregar_dados_recentes()
         
         if not all_data or len(all_data) < 2:
             st.error("Não foi possível carregar dados para atualização.")
             return False
 
-        header = all_data[0]
-        df = pd.DataFrame(all_data[1:], columns=header)
+        df = para_dataframe(all_data, 'acess')
         
         record_to_update = df[df['ID'] == str(record_id)]
         if record_to_update.empty:
             st.error(f"Registro com ID {record_id} não encontrado para atualização.")
             return False
 
-        original_row_list = next((row for row in all_data if str(row[0]) == str(record_id)), None)
-        if original_row_list is None:
-            return False # Segurança extra
-        
-        updated_data = original_row_list[1:]
-
-        status_index = header.index("Status da Entrada")
-        approver_index = header.index("Aprovador")
-        
         # Atualiza o status e o aprovador
-        updated_data[status_index - 1] = new_status
-        updated_data[approver_index - 1] = approver_name
+        campos = {"Status da Entrada": new_status, "Aprovador": approver_name}
 
         if new_status == "Autorizado":
-            cpf_index = header.index("CPF")
             current_cpf = record_to_update.iloc[0].get('CPF', '')
             
             # Só busca CPF anterior se o atual estiver vazio ou inválido
@@ -191,16 +244,12 @@ def update_record_status(record_id, new_status, approver_name):
                 person_name = record_to_update.iloc[0]['Nome']
                 
                 # >>> BUSCA MELHORADA COM VALIDAÇÃO <
-                # Converte coluna Data para datetime para ordenar corretamente
-                df_copy = df.copy()
-                df_copy['Data_dt'] = pd.to_datetime(df_copy['Data'], format='%d/%m/%Y', errors='coerce')
-                
                 # Busca registros com CPF válido, ordenados do mais recente para o mais antigo
-                previous_records_with_cpf = df_copy[
-                    (df_copy['Nome'] == person_name) & 
-                    (df_copy['CPF'].notna()) & 
-                    (df_copy['CPF'] != '') &
-                    (df_copy['CPF'].astype(str).str.match(r'^\d{3}\.\d{3}\.\d{3}-\d{2}$', na=False))  # Valida formato
+                previous_records_with_cpf = df[
+                    (df['Nome'] == person_name) & 
+                    (df['CPF'].notna()) & 
+                    (df['CPF'] != '') &
+                    (df['CPF'].astype(str).str.match(r'^\d{3}\.\d{3}\.\d{3}-\d{2}$', na=False))  # Valida formato
                 ].sort_values('Data_dt', ascending=False)  # Mais recente primeiro
                 
                 if not previous_records_with_cpf.empty:
@@ -209,7 +258,7 @@ def update_record_status(record_id, new_status, approver_name):
                     
                     # Valida o CPF antes de usar
                     if validate_cpf(last_valid_cpf):
-                        updated_data[cpf_index - 1] = last_valid_cpf
+                        campos["CPF"] = last_valid_cpf
                         log_action(
                             "ENRICH_DATA", 
                             f"CPF '{last_valid_cpf}' (do registro mais recente) adicionado ao registro {record_id} para '{person_name}' durante a aprovação."
@@ -226,7 +275,14 @@ def update_record_status(record_id, new_status, approver_name):
                     )
                 # >>> FIM DA MELHORIA <
 
-        if sheet_operations.editar_dados(record_id, updated_data):
+        def alterar(registro):
+            # O CPF só é preenchido se continuar vazio ou inválido no registro atual
+            atuais = dict(campos)
+            if "CPF" in atuais and validate_cpf(registro.get("CPF", "")):
+                del atuais["CPF"]
+            return atuais
+
+        if sheet_operations.atualizar_campos(record_id, alterar):
             st.success("Status do registro atualizado com sucesso!")
             return True
         else:
@@ -237,11 +293,14 @@ def update_record_status(record_id, new_status, approver_name):
         st.error(f"Erro ao atualizar o status do registro: {e}")
         return False
 
-def delete_record_by_id(record_id):
-    """Função administrativa para deletar um registro com base no seu ID único."""
+def delete_record_by_id(record_id, data_str=""):
+    """
+    Função administrativa para deletar um registro com base no seu ID único.
+    `data_str` (dd/mm/aaaa) permite localizar registros já arquivados na partição do mês.
+    """
     try:
         sheet_operations = SheetOperations()
-        if sheet_operations.excluir_dados(record_id):
+        if sheet_operations.excluir_dados(record_id, data_str):
             return True
         else:
             st.error(f"Não foi possível deletar o registro com ID {record_id}.")
@@ -268,12 +327,13 @@ def delete_record(name, data_str):
         return False
 
 def check_blocked_records(df):
-    """Verifica os status mais recentes e alerta sobre 'Bloqueado' ou 'Pendente de Aprovação'."""
+    """
+    Verifica os status mais recentes e alerta sobre 'Bloqueado' ou 'Pendente de Aprovação'.
+    O `df` é o da portaria (build_access_dataframe), já com as colunas tipadas.
+    """
     try:
         if df.empty: return None
-        df_copy = df.copy()
-        df_copy['Data_dt'] = pd.to_datetime(df_copy['Data'], format='%d/%m/%Y', errors='coerce')
-        df_sorted = df_copy.dropna(subset=['Data_dt']).sort_values(by=['Data_dt', 'Horário de Entrada'], ascending=False)
+        df_sorted = df.dropna(subset=['Data_dt']).sort_values(by=['Data_dt', 'Horário de Entrada_min'], ascending=False)
         
         latest_status_df = df_sorted.drop_duplicates(subset='Nome', keep='first')
         
@@ -300,7 +360,7 @@ def check_blocked_records(df):
         return "Ocorreu um erro ao verificar os status de bloqueio."
 
 
-@st.cache_data(ttl=60) 
+@cache_tags.cache_data('blocklist', ttl=60)
 def get_blocklist():
     """Carrega e retorna a blocklist como um DataFrame."""
     try:
@@ -318,9 +378,11 @@ def add_to_blocklist(block_type, values, reason, admin_name):
     try:
         sheet_ops = SheetOperations()
         timestamp = get_sao_paulo_time().strftime('%Y-%m-%d %H:%M:%S')
+        new_entries = [[block_type, value, reason, admin_name, timestamp] for value in values]
+        if not sheet_ops.adc_dados_aba_lote(new_entries, 'blocklist'):
+            st.error("Falha ao gravar os bloqueios na planilha.")
+            return False
         for value in values:
-            new_entry = [block_type, value, reason, admin_name, timestamp]
-            sheet_ops.adc_dados_aba(new_entry, 'blocklist') # Supondo que adc_dados_aba existe
             log_action("ADD_TO_BLOCKLIST", f"Tipo: {block_type}, Valor: '{value}', Motivo: {reason}")
         return True
     except Exception as e:
@@ -364,22 +426,28 @@ def editar_dados(self, id, updated_data):
     return self.editar_dados_aba(id, updated_data, 'acess')
     
 def remove_from_blocklist(block_ids):
-    """Remove uma ou mais entradas da blocklist pelo ID."""
+    """Remove uma ou mais entradas da blocklist pelo ID, em uma única operação."""
     try:
         sheet_ops = SheetOperations()
         blocklist_df = get_blocklist()
         if blocklist_df.empty: return True
 
+        values_to_log = {}
         for block_id in block_ids:
             value_to_log = "ID Desconhecido"
             if not blocklist_df[blocklist_df['ID'] == str(block_id)].empty:
                  value_to_log = blocklist_df[blocklist_df['ID'] == str(block_id)]['Value'].iloc[0]
+            values_to_log[str(block_id)] = value_to_log
+
+        removed_ids = sheet_ops.excluir_dados_por_ids_aba(block_ids, 'blocklist')
+        for block_id in removed_ids:
+            log_action("REMOVE_FROM_BLOCKLIST", f"Liberado: '{values_to_log.get(block_id, 'ID Desconhecido')}' (ID do bloqueio: {block_id})")
 
-            if not sheet_ops.excluir_dados_por_id_aba(block_id, 'blocklist'):
-                st.error(f"Falha ao remover o bloqueio para '{value_to_log}' (ID: {block_id}). A operação foi interrompida.")
-                return False
-            else:
-                log_action("REMOVE_FROM_BLOCKLIST", f"Liberado: '{value_to_log}' (ID do bloqueio: {block_id})")
+        failed_ids = [block_id for block_id in values_to_log if block_id not in removed_ids]
+        if failed_ids:
+            failed_desc = ", ".join(f"'{values_to_log[block_id]}' (ID: {block_id})" for block_id in failed_ids)
+            st.error(f"Falha ao remover o bloqueio para: {failed_desc}.")
+            return False
         
         return True
         
@@ -410,7 +478,7 @@ def is_entity_blocked(name, company):
     return False, None
 
 
-@st.cache_data(ttl=60)
+@cache_tags.cache_data('users', ttl=60)
 def get_users():
     """Carrega e retorna a lista de usuários como um DataFrame."""
     try:
@@ -449,6 +517,20 @@ def remove_user(user_email):
         st.error(f"Erro ao remover usuário: {e}")
         return False
 
+def remove_users(user_emails):
+    """Remove vários usuários da planilha 'users' com uma única exclusão. Retorna os emails removidos."""
+    try:
+        sheet_ops = SheetOperations()
+        removed = sheet_ops.excluir_linhas_por_valores(
+            [email.lower() for email in user_emails], 'user_email', 'users'
+        )
+        for user_email in removed:
+            log_action("REMOVE_USER", f"Removeu o usuário '{user_email}'.")
+        return removed
+    except Exception as e:
+        st.error(f"Erro ao remover usuários: {e}")
+        return []
+
 def update_access_request_status(request_id, new_status, reviewer_name):
     """
     Atualiza o status de uma solicitação de acesso.
@@ -522,40 +604,30 @@ def check_briefing_needed(person_name, df):
     """
     Verifica se o briefing de segurança precisa ser repassado.
     Retorna True se a pessoa não tem registro ou o último acesso foi há mais de 1 ano.
+    O `df` da portaria cobre o mês corrente e os meses anteriores definidos em
+    MESES_HISTORICO_PORTARIA (12), o que basta para essa verificação, e já
+    traz a coluna tipada Data_dt (build_access_dataframe).
     """
     try:
         if df.empty:
             return True, "Primeira visita"
         
-        person_records = df[df["Nome"] == person_name].copy()
+        person_records = df[df["Nome"] == person_name]
         if person_records.empty:
             return True, "Primeira visita"
         
-        # Procura pela data do primeiro registro
-        first_reg_date = person_records.iloc[0].get("Data do Primeiro Registro", "")
-        
-        if not first_reg_date or pd.isna(first_reg_date) or str(first_reg_date).strip() == "":
-            # Se não tem data do primeiro registro, usa a data mais antiga
-            person_records['Data_dt'] = pd.to_datetime(person_records['Data'], format='%d/%m/%Y', errors='coerce')
-            person_records = person_records.dropna(subset=['Data_dt']).sort_values('Data_dt')
-            
-            if person_records.empty:
-                return True, "Sem histórico válido"
-            
-            first_date = person_records.iloc[0]['Data_dt']
-        else:
-            first_date = pd.to_datetime(first_reg_date, format='%d/%m/%Y', errors='coerce')
+        last_date = person_records['Data_dt'].max()
         
-        if pd.isna(first_date):
-            return True, "Data inválida no histórico"
+        if pd.isna(last_date):
+            return True, "Sem histórico válido"
         
-        now = get_sao_paulo_time()
-        days_since_first = (now - first_date).days
+        now = get_sao_paulo_time().replace(tzinfo=None)
+        days_since_last = (now - last_date).days
         
-        if days_since_first > 365:
-            return True, f"Último acesso há {days_since_first} dias (mais de 1 ano)"
+        if days_since_last > 365:
+            return True, f"Último acesso há {days_since_last} dias (mais de 1 ano)"
         
-        return False, f"Último acesso há {days_since_first} dias"
+        return False, f"Último acesso há {days_since_last} dias"
         
     except Exception as e:
         print(f"Erro em check_briefing_needed: {e}")
@@ -0,0 +1,248 @@
+import time
+import threading
+from app.operations import SheetOperations, mes_da_aba_logs, nome_aba_logs
+from app.utils import get_sao_paulo_time
+
+# Consulta paginada dos logs, que ficam em abas mensais 'logs_AAAA_MM' (e, as
+# mais antigas, na antiga aba única 'logs'; ver SheetOperations.abas_de_logs).
+# Em vez de baixar as abas inteiras, o processo mantém para cada uma um índice
+# só com as colunas curtas (Timestamp, User, Action) de cada linha, estendido
+# com as linhas anexadas desde a consulta anterior (uma leitura do final da aba,
+# feita em lote para as abas já indexadas). Os filtros são aplicados sobre os
+# índices, da aba mais recente para a mais antiga; o índice de uma aba mensal só
+# é construído quando a consulta chega a ela (abas fora do período nem são
+# lidas), e só as linhas da página pedida são lidas por inteiro, em uma única
+# chamada. A aba 'logs' pode guardar meses mais novos que os das abas mensais
+# restantes (ver SheetOperations.virar_mes_logs), então ela é sempre indexada e
+# suas entradas são intercaladas às das abas mensais pelo Timestamp.
+# Se a linha que encerrava um índice mudar (ex.: entradas movidas na virada do
+# mês), ele é refeito.
+COLUNAS_LOG = ["Timestamp", "User", "Action", "Details"]
+COLUNAS_INDICE = 3
+TAMANHO_PAGINA_LOGS = 100
+# A aba do mês corrente recebe entradas o tempo todo; as demais quase não mudam
+INTERVALO_ATUALIZACAO_INDICE_SEGUNDOS = 5
+INTERVALO_ATUALIZACAO_ABAS_ANTIGAS_SEGUNDOS = 600
+# Linhas completas guardadas por aba para paginação; acima disso o cache é esvaziado
+LIMITE_LINHAS_COMPLETAS = 5000
+
+_indices = {}
+_indices_lock = threading.Lock()
+
+
+def _linha_indice(row):
+    row = [str(valor) for valor in row[:COLUNAS_INDICE]]
+    return tuple(row + [""] * (COLUNAS_INDICE - len(row)))
+
+
+def _linha_completa(row):
+    row = [str(valor) for valor in row[:len(COLUNAS_LOG)]]
+    return row + [""] * (len(COLUNAS_LOG) - len(row))
+
+
+def _precisa_atualizar(aba_name, indice, mes_atual, forcar):
+    if forcar or not indice['verificado_em']:
+        return True
+    intervalo = INTERVALO_ATUALIZACAO_INDICE_SEGUNDOS
+    if mes_da_aba_logs(aba_name) != mes_atual:
+        intervalo = INTERVALO_ATUALIZACAO_ABAS_ANTIGAS_SEGUNDOS
+    return time.time() - indice['verificado_em'] >= intervalo
+
+
+def _atualizar_indices(sheet_ops, abas, forcar=False):
+    """
+    Atualiza (chamada com _indices_lock adquirido) os índices das abas de logs.
+    'linhas' guarda (Timestamp, User, Action) da linha i + 2 da aba.
+    """
+    hoje = get_sao_paulo_time()
+    mes_atual = (hoje.year, hoje.month)
+    indices = {
+        aba_name: _indices.setdefault((sheet_ops.my_archive_google_sheets, aba_name),
+                                      {'linhas': [], 'completas': {}, 'verificado_em': 0})
+        for aba_name in abas
+    }
+    pendentes = [aba_name for aba_name, indice in indices.items()
+                 if _precisa_atualizar(aba_name, indice, mes_atual, forcar)]
+    if not pendentes:
+        return indices
+
+    # Relê a última linha conhecida de cada índice para confirmar que nada foi removido antes dela
+    inicios = [len(indices[aba_name]['linhas']) + 1 if indices[aba_name]['linhas'] else 2 for aba_name in pendentes]
+    lidas = sheet_ops.ler_intervalos_aba([(aba_name, inicio, COLUNAS_INDICE, None) for aba_name, inicio in zip(pendentes, inicios)])
+    if lidas is None:
+        return indices
+
+    refazer = []
+    for aba_name, linhas_lidas in zip(pendentes, lidas):
+        indice = indices[aba_name]
+        linhas_lidas = [_linha_indice(row) for row in linhas_lidas]
+        if indice['linhas']:
+            if not linhas_lidas or linhas_lidas[0] != indice['linhas'][-1]:
+                refazer.append(aba_name)
+                continue
+            linhas_lidas = linhas_lidas[1:]
+        indice['linhas'].extend(linhas_lidas)
+        indice['verificado_em'] = time.time()
+
+    if refazer:
+        lidas = sheet_ops.ler_intervalos_aba([(aba_name, 2, COLUNAS_INDICE, None) for aba_name in refazer])
+        for i, aba_name in enumerate(refazer):
+            indice = indices[aba_name]
+            indice['completas'].clear()
+            indice['linhas'] = [_linha_indice(row) for row in lidas[i]] if lidas is not None else []
+            indice['verificado_em'] = time.time() if lidas is not None else 0
+    return indices
+
+
+def _no_periodo(aba_name, data_inicio, data_fim):
+    """Se a aba pode ter entradas no período (a aba única 'logs' sempre pode)."""
+    mes = mes_da_aba_logs(aba_name)
+    if mes is None:
+        return True
+    if data_inicio and mes < (data_inicio.year, data_inicio.month):
+        return False
+    if data_fim and mes > (data_fim.year, data_fim.month):
+        return False
+    return True
+
+
+def _corresponde(linha, usuarios, acoes, data_inicio, data_fim):
+    timestamp, usuario, acao = linha
+    if usuarios and usuario not in usuarios:
+        return False
+    if acoes and acao not in acoes:
+        return False
+    # Timestamps no formato '%Y-%m-%d %H:%M:%S' comparam como texto
+    if data_inicio and timestamp[:10] < data_inicio.strftime('%Y-%m-%d'):
+        return False
+    if data_fim and timestamp[:10] > data_fim.strftime('%Y-%m-%d'):
+        return False
+    return any(linha)
+
+
+def _faixas(numeros):
+    """Agrupa números de linha (ordenados) em faixas contíguas (inicio, fim)."""
+    faixas = []
+    for numero in numeros:
+        if faixas and faixas[-1][1] == numero - 1:
+            faixas[-1][1] = numero
+        else:
+            faixas.append([numero, numero])
+    return faixas
+
+
+def _carregar_completas(sheet_ops, indices, encontradas):
+    """
+    Lê por inteiro, em uma única chamada para todas as abas, as linhas
+    (aba, número) ainda não guardadas. Retorna False se a leitura falhar.
+    """
+    intervalos = []
+    for aba_name in dict.fromkeys(aba_name for aba_name, _ in encontradas):
+        completas = indices[aba_name]['completas']
+        numeros = [numero for aba, numero in encontradas if aba == aba_name]
+        faltantes = sorted(numero for numero in numeros if numero not in completas)
+        if len(completas) + len(faltantes) > LIMITE_LINHAS_COMPLETAS:
+            completas.clear()
+            faltantes = sorted(numeros)
+        intervalos.extend((aba_name, inicio, fim) for inicio, fim in _faixas(faltantes))
+    if not intervalos:
+        return True
+
+    lidas = sheet_ops.ler_intervalos_aba([(aba_name, inicio, len(COLUNAS_LOG), fim) for aba_name, inicio, fim in intervalos])
+    if lidas is None:
+        return False
+    for (aba_name, inicio, fim), linhas in zip(intervalos, lidas):
+        for deslocamento in range(fim - inicio + 1):
+            row = linhas[deslocamento] if deslocamento < len(linhas) else []
+            indices[aba_name]['completas'][inicio + deslocamento] = _linha_completa(row)
+    return True
+
+
+def _indexadas(sheet_ops, abas):
+    """Abas, dentre as informadas, cujo índice já foi construído neste processo."""
+    return [aba_name for aba_name in abas if (sheet_ops.my_archive_google_sheets, aba_name) in _indices]
+
+
+def consultar_logs(usuarios=None, acoes=None, data_inicio=None, data_fim=None, limite=TAMANHO_PAGINA_LOGS):
+    """
+    Retorna (linhas, ha_mais): até `limite` entradas de log que atendem aos
+    filtros (usuários, ações, intervalo de datas; vazios = todos), da mais
+    recente para a mais antiga, como listas [Timestamp, User, Action, Details],
+    e se há mais entradas além delas. Retorna (None, False) em caso de falha.
+    """
+    sheet_ops = SheetOperations()
+    if not sheet_ops.credentials or not sheet_ops.my_archive_google_sheets:
+        return None, False
+    usuarios, acoes = set(usuarios or ()), set(acoes or ())
+    abas = [aba_name for aba_name in sheet_ops.abas_de_logs() if _no_periodo(aba_name, data_inicio, data_fim)]
+    legadas = [aba_name for aba_name in abas if not mes_da_aba_logs(aba_name)]
+    mensais = [aba_name for aba_name in abas if mes_da_aba_logs(aba_name)]
+
+    for tentativa in range(2):
+        with _indices_lock:
+            # Os índices já construídos (e o da aba 'logs') são atualizados juntos;
+            # os das abas mensais, só se a busca chegar à aba
+            indices = _atualizar_indices(sheet_ops, list(dict.fromkeys(_indexadas(sheet_ops, abas) + legadas)),
+                                         forcar=tentativa > 0)
+            encontradas = []
+            for aba_name in legadas:
+                linhas = indices[aba_name]['linhas']
+                encontradas.extend((aba_name, i + 2) for i in range(len(linhas) - 1, -1, -1)
+                                   if _corresponde(linhas[i], usuarios, acoes, data_inicio, data_fim))
+            # As abas mensais seguem em ordem cronológica: a busca para quando a
+            # página está completa, pois as abas seguintes são de meses anteriores
+            do_mes = 0
+            for aba_name in mensais:
+                if aba_name not in indices:
+                    indices.update(_atualizar_indices(sheet_ops, [aba_name]))
+                linhas = indices[aba_name]['linhas']
+                for i in range(len(linhas) - 1, -1, -1):
+                    if _corresponde(linhas[i], usuarios, acoes, data_inicio, data_fim):
+                        encontradas.append((aba_name, i + 2))
+                        do_mes += 1
+                        if do_mes > limite:
+                            break
+                if do_mes > limite:
+                    break
+            # Timestamps no formato '%Y-%m-%d %H:%M:%S' ordenam como texto; a
+            # ordenação é estável, então empates mantêm a ordem das linhas
+            encontradas.sort(key=lambda encontrada: indices[encontrada[0]]['linhas'][encontrada[1] - 2][0], reverse=True)
+            ha_mais = len(encontradas) > limite
+            encontradas = encontradas[:limite]
+            if not _carregar_completas(sheet_ops, indices, encontradas):
+                return None, False
+            resultado = [indices[aba_name]['completas'][numero] for aba_name, numero in encontradas]
+            # A aba pode ter mudado entre a atualização do índice e a leitura das linhas
+            if all(_linha_indice(row) == indices[aba_name]['linhas'][numero - 2]
+                   for row, (aba_name, numero) in zip(resultado, encontradas)):
+                return resultado, ha_mais
+            for indice in indices.values():
+                indice['completas'].clear()
+    return None, False
+
+
+def opcoes_filtro_logs(data_inicio=None, data_fim=None):
+    """
+    Retorna (usuários, ações) distintos, em ordem alfabética, das entradas de
+    log do período. Sem período, considera a aba do mês corrente e as já
+    indexadas. Só as abas mensais do período têm o índice construído para isso.
+    """
+    sheet_ops = SheetOperations()
+    if not sheet_ops.credentials or not sheet_ops.my_archive_google_sheets:
+        return [], []
+    abas = sheet_ops.abas_de_logs()
+    if data_inicio or data_fim:
+        no_periodo = [aba_name for aba_name in abas if _no_periodo(aba_name, data_inicio, data_fim)]
+        construir = [aba_name for aba_name in no_periodo if mes_da_aba_logs(aba_name)]
+    else:
+        hoje = get_sao_paulo_time()
+        no_periodo = abas
+        construir = [aba_name for aba_name in abas if aba_name == nome_aba_logs(hoje.year, hoje.month)]
+    usuarios, acoes = set(), set()
+    with _indices_lock:
+        abas = list(dict.fromkeys(construir + _indexadas(sheet_ops, no_periodo)))
+        indices = _atualizar_indices(sheet_ops, abas)
+        for indice in indices.values():
+            usuarios.update(linha[1] for linha in indice['linhas'] if linha[1])
+            acoes.update(linha[2] for linha in indice['linhas'] if linha[2])
+    return sorted(usuarios), sorted(acoes)
@@ -1,11 +1,34 @@
 import streamlit as st
+import atexit
+import random
+import threading
+from collections import deque
 from datetime import datetime
 import pytz
-import pygsheets
-from app.sheets_api import connect_sheet
+from app import spool
+from app.operations import SheetOperations, nome_aba_logs, mes_do_log, mes_da_aba_logs, ABA_LOGS_LEGADA
+from app.request_scheduler import prioridade, PRIORIDADE_LOG
 from auth.auth_utils import get_user_display_name, is_user_logged_in
 
-LOG_SHEET_NAME = 'logs'
+# As entradas de log ficam em um buffer do processo e são enviadas em lote (uma
+# chamada append por aba) às abas mensais 'logs_AAAA_MM', escolhidas pelo
+# Timestamp de cada entrada, por uma thread: a cada
+# INTERVALO_ENVIO_LOGS_SEGUNDOS, assim que o buffer chega a LOTE_ENVIO_LOGS
+# entradas e ao encerrar o processo. Se o envio falhar (planilha fora do ar,
+# cota esgotada), as entradas vão para o spool local em disco (app.spool, um
+# spool por aba de destino), que a mesma thread reenvia, em ordem e antes das
+# entradas novas, quando a planilha voltar. Só se o disco também falhar elas
+# ficam no buffer em memória (limitado a LIMITE_BUFFER_LOGS; as mais antigas são
+# descartadas).
+INTERVALO_ENVIO_LOGS_SEGUNDOS = 5
+LOTE_ENVIO_LOGS = 50
+LIMITE_BUFFER_LOGS = 5000
+
+_buffer = deque()
+_buffer_lock = threading.Lock()
+_envio_lock = threading.Lock()
+_buffer_evento = threading.Event()
+_escritor = None
 
 def _get_sao_paulo_time_str():
     """Retorna o timestamp atual formatado para São Paulo."""
@@ -15,32 +38,112 @@ def _get_sao_paulo_time_str():
 def log_action(action: str, details: str = ""):
     """
     Registra uma ação do usuário na planilha de logs.
+    A entrada vai para o buffer e é gravada em lote; a chamada não acessa a planilha.
     É projetado para não quebrar a aplicação se o log falhar.
     """
     if not is_user_logged_in():
         return
 
     try:
-        user = get_user_display_name()
-        timestamp = _get_sao_paulo_time_str()
-        log_entry = [timestamp, user, action, details]
+        registrar_log(get_user_display_name(), action, details)
+    except Exception as e:
+        print(f"CRITICAL LOGGING ERROR: Falha ao registrar a entrada de log. Erro: {e}")
 
-        credentials, spreadsheet_url = connect_sheet()
-        if not credentials:
-            print(f"LOGGING FAILED: Não foi possível conectar ao Google Sheets.")
-            return
+def registrar_log(user, action, details=""):
+    """
+    Coloca no buffer uma entrada de log em nome do usuário informado, sem
+    consultar a sessão (para uso fora de uma execução do Streamlit, ex.: threads).
+    """
+    log_entry = [_get_sao_paulo_time_str(), user, action, details]
+    with _buffer_lock:
+        _buffer.append(log_entry)
+        lote_completo = len(_buffer) >= LOTE_ENVIO_LOGS
+    iniciar_escritor_logs()
+    if lote_completo:
+        _buffer_evento.set()
 
-        gc = credentials
-        spreadsheet = gc.open_by_url(spreadsheet_url)
+def iniciar_escritor_logs():
+    """
+    Inicia (uma vez por processo) a thread que envia o buffer de logs à planilha
+    e reenvia o que tiver ficado no spool local (inclusive de uma execução anterior).
+    """
+    global _escritor
+    with _buffer_lock:
+        if _escritor is not None and _escritor.is_alive():
+            return
+        primeira_vez = _escritor is None
+        _escritor = threading.Thread(target=_laco_escritor, name='escritor-logs', daemon=True)
+        _escritor.start()
+    if primeira_vez:
+        # Envia o que restar no buffer ao encerrar o processo
+        atexit.register(descarregar_logs)
 
-        try:
-            worksheet = spreadsheet.worksheet_by_title(LOG_SHEET_NAME)
-        except pygsheets.exceptions.WorksheetNotFound:
-            worksheet = spreadsheet.add_worksheet(LOG_SHEET_NAME)
-            worksheet.update_row(1, ["Timestamp", "User", "Action", "Details"])
-            print(f"LOGGING INFO: Criada nova planilha de log '{LOG_SHEET_NAME}'.")
+def _laco_escritor():
+    falhas = 0
+    while True:
+        # Com a planilha inacessível, as tentativas vão se espaçando
+        espera = INTERVALO_ENVIO_LOGS_SEGUNDOS
+        if falhas:
+            espera = min(300, espera * 2 ** falhas) * random.uniform(0.5, 1)
+        _buffer_evento.wait(espera)
+        _buffer_evento.clear()
+        falhas = 0 if descarregar_logs() else min(falhas + 1, 10)
 
-        worksheet.append_table(values=log_entry, start='A2', overwrite=False)
+def aba_do_log(timestamp):
+    """Aba mensal de logs do mês do Timestamp (o mês corrente, se ele for inválido)."""
+    ano, mes = mes_do_log(timestamp) or mes_do_log(_get_sao_paulo_time_str())
+    return nome_aba_logs(ano, mes)
 
+def _enviar_logs(linhas, aba_name):
+    try:
+        # Logs usam a cota da API depois das gravações interativas
+        with prioridade(PRIORIDADE_LOG):
+            return SheetOperations().anexar_linhas_aba(linhas, aba_name)
     except Exception as e:
-        print(f"CRITICAL LOGGING ERROR: Falha ao escrever na planilha de logs. Erro: {e}")
+        print(f"CRITICAL LOGGING ERROR: Falha ao escrever na aba de logs '{aba_name}'. Erro: {e}")
+        return False
+
+def descarregar_logs():
+    """
+    Envia, para cada aba mensal de logs (da mais antiga para a mais recente), as
+    entradas guardadas no spool local e depois, de uma só vez, as acumuladas no
+    buffer. Retorna True se tudo foi enviado, False se algum envio falhou (e as
+    entradas ficaram no spool).
+    """
+    with _envio_lock:
+        with _buffer_lock:
+            lote = list(_buffer)
+            _buffer.clear()
+        grupos = {}
+        for entrada in lote:
+            grupos.setdefault(aba_do_log(entrada[0]), []).append(entrada)
+
+        # Spools deixados por versões anteriores usam a aba única 'logs'
+        pendentes = [nome for nome in spool.nomes() if nome == ABA_LOGS_LEGADA or mes_da_aba_logs(nome)]
+        tudo_enviado = True
+        for aba_name in sorted(set(pendentes) | set(grupos)):
+            # As entradas novas só seguem depois das que já estavam no spool, para manter a ordem
+            gravado = not spool.pendente(aba_name) or spool.drenar(
+                aba_name, lambda linhas, aba_name=aba_name: _enviar_logs(linhas, aba_name)
+            )
+            linhas = grupos.get(aba_name)
+            if linhas and gravado:
+                gravado = _enviar_logs(linhas, aba_name)
+            if linhas and not gravado:
+                _guardar_para_reenvio(linhas, aba_name)
+            tudo_enviado = tudo_enviado and gravado
+        return tudo_enviado
+
+def _guardar_para_reenvio(linhas, aba_name):
+    """Guarda no spool local as entradas que não foram enviadas (ou, se o disco falhar, no buffer)."""
+    if spool.gravar(aba_name, linhas):
+        print(f"LOGGING FAILED: {len(linhas)} entrada(s) de log guardada(s) no spool local para reenvio.")
+        return
+    with _buffer_lock:
+        _buffer.extendleft(reversed(linhas))
+        descartadas = max(0, len(_buffer) - LIMITE_BUFFER_LOGS)
+        for _ in range(descartadas):
+            _buffer.popleft()
+    print(f"LOGGING FAILED: {len(linhas)} entrada(s) de log mantida(s) no buffer para nova tentativa.")
+    if descartadas:
+        print(f"LOGGING FAILED: {descartadas} entrada(s) de log mais antiga(s) descartada(s) (buffer cheio).")
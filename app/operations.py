@@ -1,25 +1,554 @@
 import streamlit as st
 import pandas as pd
 import logging
+import os
 import random
+import re
+import threading
+import time
+from datetime import datetime
 from app.sheets_api import connect_sheet
+from app.utils import get_sao_paulo_time
+from app import schemas, snapshot_cache, write_queue
+from app.storage import BackendArmazenamento, GoogleSheetsBackend, MemoriaBackend, texto_literal
+from app.request_scheduler import erro_transitorio, prioridade, PRIORIDADE_SEGUNDO_PLANO
 import pygsheets 
 
+# Cabeçalhos usados ao criar automaticamente uma aba que ainda não existe
+# (definidos, com os tipos das colunas, em app/schemas.py; as abas mensais usam
+# o cabeçalho da aba de origem, ver schemas.cabecalho).
+CABECALHOS_ABAS = {aba: schemas.cabecalho(aba) for aba in schemas.ESQUEMAS_ABAS}
+
+# Cache compartilhado pelo processo: URL da planilha -> {'backend', 'indices', 'snapshots', 'lotes'}.
+# O backend guarda os handles abertos, evitando repetir open_by_url/worksheet_by_title
+# (metadados) a cada operação.
+# 'indices' guarda, por aba, o mapa ID -> número da linha na planilha.
+# 'snapshots' guarda o último conteúdo lido de cada aba e o estado da última verificação.
+# 'lotes' guarda, por aba, as edições aguardando o envio conjunto (ver _LoteEdicoes).
+_handle_cache = {}
+_handle_lock = threading.Lock()
+
+# Detecção de mudanças: antes de reler uma aba em cache, uma única chamada
+# values_batch_get busca a "impressão digital" de todas as abas em cache: a aba
+# inteira, se for pequena, ou as últimas linhas conhecidas mais a linha seguinte.
+# Se nada mudou, os dados em cache são devolvidos; se só houve linhas anexadas
+# (caso típico da aba 'acess'), apenas o final é buscado; senão, recarga completa.
+# Edições no meio de abas grandes feitas fora da aplicação só são vistas na
+# recarga completa periódica.
+INTERVALO_VERIFICACAO_SEGUNDOS = 5
+RECARGA_COMPLETA_SEGUNDOS = 600
+LIMITE_ABA_PEQUENA = 200
+LINHAS_IMPRESSAO_DIGITAL = 10
+
+# Abas lidas na primeira renderização após o login; são buscadas juntas,
+# em uma única chamada values_batch_get, por pre_carregar_abas.
+ABAS_PRE_CARREGAMENTO = ('acess', 'authorizer', 'blocklist', 'schedules', 'users')
+
+# Cópia local em disco: uma thread em segundo plano confere as abas abaixo a
+# cada INTERVALO_SINCRONIZACAO_SEGUNDOS e grava as que mudaram no cache colunar
+# (app.snapshot_cache); as leituras vêm sempre dos snapshots em memória. Ao
+# iniciar o processo, as leituras partem da cópia em disco, servida de imediato
+# e conferida com a planilha em segundo plano, em vez de reler a planilha
+# inteira; durante indisponibilidades da API a última cópia conhecida continua
+# sendo servida.
+ABAS_ESPELHADAS = ABAS_PRE_CARREGAMENTO + ('materials', 'access_requests')
+INTERVALO_SINCRONIZACAO_SEGUNDOS = 30
+_sincronizador = None
+
+# Particionamento mensal da aba 'acess': ela guarda o mês corrente e os registros
+# ainda em aberto (pessoa na unidade ou aguardando aprovação), que continuam
+# editáveis; os registros encerrados de meses anteriores são movidos pelo
+# arquivamento (arquivar_meses_anteriores, chamado pelo sincronizador) para abas
+# 'acess_AAAA_MM'. As partições não mudam depois de criadas, então ficam em
+# cache sem verificação de mudanças. A portaria lê apenas os últimos meses.
+PADRAO_PARTICAO = re.compile(r'^acess_(\d{4})_(\d{2})$')
+MESES_HISTORICO_PORTARIA = 12
+STATUS_EM_ABERTO = ('Pendente de Aprovação', 'Pendente de Liberação da Blocklist')
+INTERVALO_ARQUIVAMENTO_SEGUNDOS = 3600
+
+# Logs mensais: cada entrada vai para a aba 'logs_AAAA_MM' do mês do seu
+# Timestamp (ver app.logger), então a aba em uso fica pequena. A virada do mês
+# (virar_mes_logs, chamada pelo sincronizador junto do arquivamento) cria de
+# antemão as abas do mês corrente e do seguinte e distribui pelas abas mensais
+# as entradas da antiga aba única 'logs'.
+PADRAO_ABA_LOGS = re.compile(r'^logs_(\d{4})_(\d{2})$')
+ABA_LOGS_LEGADA = 'logs'
+
+# Gravação adiada (write-behind), opcional: com ACCESS_WRITE_BEHIND=1, inclusões e
+# edições nas abas abaixo são validadas, registradas na fila local durável
+# (app.write_queue) e refletidas de imediato nas leituras; uma thread as envia à
+# planilha em ordem, com novas tentativas. Independentemente dessa opção, em
+# qualquer aba, inclusões (adc_dados_aba) e edições (editar_dados_aba) que falham
+# por a planilha estar inacessível (sem conexão, erro de rede ou do servidor, cota
+# esgotada) vão para a mesma fila (ver _guardar_apos_falha); as demais falhas
+# (ex.: 400 por um valor inválido) são informadas, pois repeti-las não adianta.
+# Exclusões em uma aba com itens na fila não esperam por ela: são recusadas
+# até a fila da aba esvaziar (ver _fila_pendente).
+GRAVACAO_ADIADA = os.getenv('ACCESS_WRITE_BEHIND', '').strip().lower() in ('1', 'true', 'sim')
+ABAS_GRAVACAO_ADIADA = ('acess',)
+MAX_TENTATIVAS_GRAVACAO = 10
+AVISO_FILA_PENDENTE = "Há gravações aguardando envio à planilha; tente excluir novamente em instantes."
+# Itens já gravados saem da fila após a retenção (write_queue.RETENCAO_GRAVADOS_SEGUNDOS)
+INTERVALO_LIMPEZA_FILA_SEGUNDOS = 300
+_gravador = None
+_fila_evento = threading.Event()
+
+# Backend de armazenamento alternativo ao Google Sheets (ex.: MemoriaBackend),
+# definido por usar_backend ou pelas variáveis de ambiente ACCESS_STORAGE_BACKEND=memoria
+# e ACCESS_STORAGE_FILE (arquivo JSON opcional). Permite medir e testar a aplicação sem planilha.
+_backend_configurado = None
+
+# Coalescência de edições: edições de uma mesma aba feitas (por qualquer sessão)
+# dentro desta janela são enviadas juntas, com uma leitura em lote das linhas
+# alvo e uma única gravação contendo apenas as células que mudaram.
+JANELA_EDICOES_SEGUNDOS = 0.05
+ESPERA_MAXIMA_EDICAO_SEGUNDOS = 120
+
+# Atualização de campos com controle otimista de concorrência (atualizar_campos_aba):
+# a gravação só acontece se o registro ainda estiver como foi visto; em caso de
+# conflito, a alteração é recalculada sobre o valor atual, até este limite.
+MAX_TENTATIVAS_CONFLITO = 5
+_campos_adiados_lock = threading.Lock()
+
+# Geração de IDs ordenados por tempo: milissegundos desde ID_EPOCH seguidos de
+# ID_DIGITOS_NO dígitos que identificam o processo, sorteados ao iniciá-lo. O
+# relógio lógico nunca repete nem volta dentro do processo, então não é preciso
+# ler a aba para evitar colisões; dois processos só geram o mesmo ID se
+# sortearem o mesmo identificador e alocarem no mesmo milissegundo, e mesmo
+# assim IDs já presentes no índice em cache da aba são descartados (ver
+# _ids_livres). Os IDs são gravados como texto (ver _com_id_texto): como número,
+# a planilha os devolveria em notação científica.
+ID_EPOCH_MS = 1704067200000  # 2024-01-01 00:00:00 UTC
+ID_DIGITOS_NO = 4
+_id_node = random.SystemRandom().randrange(10 ** ID_DIGITOS_NO)
+_id_last_tick = 0
+_id_lock = threading.Lock()
+
+
+def gerar_ids(quantidade=1):
+    """Aloca `quantidade` IDs únicos e crescentes na ordem de inserção."""
+    global _id_last_tick
+    with _id_lock:
+        agora = int(time.time() * 1000) - ID_EPOCH_MS
+        inicio = max(agora, _id_last_tick + 1)
+        _id_last_tick = inicio + quantidade - 1
+    return [(inicio + i) * 10 ** ID_DIGITOS_NO + _id_node for i in range(quantidade)]
+
+
+def _com_id_texto(linhas):
+    """Linhas com o ID (primeira coluna) marcado para ser gravado como texto."""
+    return [[texto_literal(row[0])] + list(row[1:]) if row else [] for row in linhas]
+
+
+def usar_backend(backend):
+    """Define o backend de armazenamento do processo; None volta a usar o Google Sheets."""
+    global _backend_configurado
+    with _handle_lock:
+        _backend_configurado = backend
+
+
+def _backend_do_ambiente():
+    """Cria, uma única vez, o backend em memória pedido pelas variáveis de ambiente."""
+    global _backend_configurado
+    if os.getenv('ACCESS_STORAGE_BACKEND', '').strip().lower() != 'memoria':
+        return None
+    with _handle_lock:
+        if _backend_configurado is None:
+            _backend_configurado = MemoriaBackend(caminho=os.getenv('ACCESS_STORAGE_FILE') or None)
+        return _backend_configurado
+
+
+def iniciar_sincronizacao(intervalo=INTERVALO_SINCRONIZACAO_SEGUNDOS):
+    """Inicia (uma vez por processo) a thread que mantém o espelho local atualizado."""
+    global _sincronizador
+    with _handle_lock:
+        if _sincronizador is not None and _sincronizador.is_alive():
+            return
+        _sincronizador = threading.Thread(
+            target=_laco_sincronizacao, args=(intervalo,), name='sincronizador-espelho', daemon=True
+        )
+        _sincronizador.start()
+
+
+def _laco_sincronizacao(intervalo):
+    assinaturas = {}
+    arquivado_em = 0
+    while True:
+        try:
+            # Cede a cota da API às operações dos usuários
+            with prioridade(PRIORIDADE_SEGUNDO_PLANO):
+                sheet_operations = SheetOperations()
+                if time.time() - arquivado_em >= INTERVALO_ARQUIVAMENTO_SEGUNDOS:
+                    arquivado = sheet_operations.arquivar_meses_anteriores()
+                    if sheet_operations.virar_mes_logs() and arquivado:
+                        arquivado_em = time.time()
+                sheet_operations.sincronizar_espelho(assinaturas=assinaturas)
+        except Exception as e:
+            logging.error(f"Erro inesperado na sincronização do espelho local: {e}")
+        time.sleep(intervalo)
+
+
+def nome_particao(ano, mes):
+    """Nome da aba que guarda os registros de acesso arquivados de um mês."""
+    return f"acess_{ano:04d}_{mes:02d}"
+
+
+def _e_particao(aba_name):
+    return PADRAO_PARTICAO.match(aba_name) is not None
+
+
+def nome_aba_logs(ano, mes):
+    """Nome da aba que guarda as entradas de log de um mês."""
+    return f"logs_{ano:04d}_{mes:02d}"
+
+
+def mes_da_aba_logs(aba_name):
+    """(ano, mês) de uma aba mensal de logs, ou None se não for uma."""
+    correspondencia = PADRAO_ABA_LOGS.match(aba_name)
+    return (int(correspondencia.group(1)), int(correspondencia.group(2))) if correspondencia else None
+
+
+def mes_do_log(timestamp):
+    """(ano, mês) de um Timestamp de log ('%Y-%m-%d %H:%M:%S'), ou None se for inválido."""
+    try:
+        data = datetime.strptime(str(timestamp).strip()[:7], "%Y-%m")
+    except ValueError:
+        return None
+    return data.year, data.month
+
+
+def _erro_estrutural(erro):
+    """Se o erro indica uma aba inexistente (excluída ou renomeada na planilha)."""
+    if isinstance(erro, pygsheets.exceptions.WorksheetNotFound):
+        return True
+    status = getattr(getattr(erro, 'resp', None), 'status', None)
+    return status == 404 or (status == 400 and 'Unable to parse range' in str(erro))
+
+
+def _mes_do_registro(data_str):
+    """(ano, mês) de uma data no formato dd/mm/aaaa, ou None se for inválida."""
+    try:
+        data = datetime.strptime(str(data_str).strip(), "%d/%m/%Y")
+    except ValueError:
+        return None
+    return data.year, data.month
+
+
+def _meses_anteriores(quantidade, hoje=None):
+    """Os `quantidade` meses anteriores ao corrente, do mais antigo ao mais recente."""
+    hoje = hoje or get_sao_paulo_time()
+    indice = hoje.year * 12 + hoje.month - 1
+    return [(i // 12, i % 12 + 1) for i in range(indice - quantidade, indice)]
+
+
+class _LoteEdicoes:
+    """Edições de uma aba aguardando envio. A primeira sessão a chegar envia o lote."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pedidos = []
+        self.com_lider = False
+
+
+def _fila_em_uso():
+    """
+    A gravação adiada está ativa ou a fila ainda guarda itens não gravados (ex.:
+    de uma execução anterior ou de uma inclusão guardada após falha) ou gravados
+    recentemente, cujo status ainda é exibido.
+    """
+    return GRAVACAO_ADIADA or write_queue.tem_itens()
+
+
+def iniciar_gravacao_adiada():
+    """Inicia (uma vez por processo) a thread que envia a fila de gravação à planilha."""
+    global _gravador
+    if not _fila_em_uso():
+        return
+    with _handle_lock:
+        if _gravador is not None and _gravador.is_alive():
+            return
+        _gravador = threading.Thread(target=_laco_gravacao, name='gravador-fila', daemon=True)
+        _gravador.start()
+
+
+def _laco_gravacao():
+    falhas = 0
+    limpa_em = 0
+    while True:
+        try:
+            if time.time() - limpa_em >= INTERVALO_LIMPEZA_FILA_SEGUNDOS:
+                removidos = write_queue.limpar_gravados()
+                limpa_em = time.time()
+                if removidos:
+                    logging.info(f"{removidos} item(ns) já gravado(s) removido(s) da fila local.")
+            itens = write_queue.em_aberto()
+        except Exception as e:
+            logging.error(f"Erro ao ler a fila de gravação: {e}")
+            itens = []
+        if not itens:
+            _fila_evento.wait(5)
+            _fila_evento.clear()
+            continue
+
+        sheet_operations = SheetOperations()
+        if not sheet_operations.credentials or not sheet_operations.my_archive_google_sheets:
+            # Sem conexão com a planilha: aguarda sem gastar as tentativas dos itens
+            falhas += 1
+            time.sleep(min(60, 2 ** falhas) * random.uniform(0.5, 1))
+            continue
+        for item in itens:
+            # A ordem importa (ex.: edição de um registro recém-incluído), então
+            # uma falha interrompe a passagem e o item é tentado de novo
+            if not sheet_operations._gravar_item_da_fila(item):
+                falhas += 1
+                time.sleep(min(60, 2 ** falhas) * random.uniform(0.5, 1))
+                break
+            falhas = 0
+
+
+def estado_gravacoes_adiadas(aba_name='acess'):
+    """Retorna {ID: status} dos registros com gravação adiada recente ('pendente', 'enviando', 'gravado', 'falhou')."""
+    if not _fila_em_uso():
+        return {}
+    return write_queue.estado_por_id(aba_name)
+
+
 class SheetOperations:
     
     def __init__(self):
         """
         Classe para encapsular operações com o Google Sheets,
         suportando múltiplas abas como 'acess', 'users', 'blocklist', etc.
+        Com um backend alternativo configurado (ver usar_backend), `credentials`
+        é o próprio backend e nenhuma conexão com o Google Sheets é feita.
         """
-        self.credentials, self.my_archive_google_sheets = connect_sheet()
+        backend = _backend_configurado or _backend_do_ambiente()
+        if backend is not None:
+            self.credentials, self.my_archive_google_sheets = backend, backend.chave
+        else:
+            self.credentials, self.my_archive_google_sheets = connect_sheet()
         if not self.credentials or not self.my_archive_google_sheets:
             logging.error("Credenciais ou URL do Google Sheets inválidos.")
+        # Se a última inclusão foi guardada na fila local por falha da planilha
+        self._guardado_na_fila = False
+        # Exceção da última inclusão que falhou (ver _anexar_linhas)
+        self._erro_inclusao = None
+
+    @property
+    def _usa_copia_em_disco(self):
+        """A cópia em disco (app.snapshot_cache) só acompanha a planilha do Google Sheets."""
+        return not isinstance(self.credentials, BackendArmazenamento)
+
+    def _abrir_planilha(self):
+        """Retorna a entrada de cache da planilha, abrindo-a apenas na primeira vez."""
+        url = self.my_archive_google_sheets
+        entry = _handle_cache.get(url)
+        if entry is None:
+            if isinstance(self.credentials, BackendArmazenamento):
+                backend = self.credentials
+            else:
+                backend = GoogleSheetsBackend(self.credentials.open_by_url(url))
+            with _handle_lock:
+                entry = _handle_cache.setdefault(url, {'backend': backend, 'indices': {}, 'snapshots': {}, 'lotes': {}})
+        return entry
+
+    def _obter_aba(self, aba_name, criar=False):
+        """
+        Retorna a aba (ver app.storage.AbaArmazenamento).
+        Se a aba não existir e `criar` for True, cria a aba com o cabeçalho padrão;
+        caso contrário propaga WorksheetNotFound.
+        """
+        return self._abrir_planilha()['backend'].aba(aba_name, criar, schemas.cabecalho(aba_name))
+
+    def invalidar_cache(self, aba_name=None):
+        """
+        Descarta handles em cache. Sem `aba_name`, descarta a planilha inteira,
+        o que também recarrega a lista de abas (ver _invalidar_apos_erro).
+        """
+        url = self.my_archive_google_sheets
+        with _handle_lock:
+            if aba_name is None:
+                _handle_cache.pop(url, None)
+            elif url in _handle_cache:
+                _handle_cache[url]['backend'].descartar_aba(aba_name)
+                _handle_cache[url]['indices'].pop(aba_name, None)
+                _handle_cache[url]['snapshots'].pop(aba_name, None)
+
+    def _invalidar_apos_erro(self, erro, *aba_names):
+        """
+        Descarta o cache após um erro de API: a planilha inteira só se a
+        estrutura foi alterada fora da aplicação (aba renomeada/excluída); nos
+        demais erros, apenas as abas envolvidas, para não forçar a recarga de
+        todas as abas. Em erros transitórios (rede, servidor, cota) o snapshot
+        das abas é mantido, pois continua sendo a última cópia conhecida (servida
+        durante a indisponibilidade e base das edições guardadas na fila), e só
+        é conferido de novo na próxima leitura.
+        """
+        if _erro_estrutural(erro):
+            self.invalidar_cache()
+            return
+        for aba_name in aba_names:
+            if not erro_transitorio(erro):
+                self.invalidar_cache(aba_name)
+                continue
+            with _handle_lock:
+                entry = _handle_cache.get(self.my_archive_google_sheets)
+                if entry is None:
+                    continue
+                # Uma gravação pode ter sido aplicada mesmo sem resposta
+                entry['indices'].pop(aba_name, None)
+                snapshot = entry['snapshots'].get(aba_name)
+                if snapshot is not None:
+                    snapshot['verificado_em'] = 0
+
+    def _indice_ids(self, aba_name, aba, reconstruir=False):
+        """
+        Retorna o índice ID -> número da linha da aba, construindo-o a partir
+        apenas da coluna de IDs (coluna A) na primeira vez ou quando solicitado.
+        """
+        entry = self._abrir_planilha()
+        indice = entry['indices'].get(aba_name)
+        if indice is None or reconstruir:
+            ids = aba.ler_coluna(1)
+            indice = {
+                str(valor).strip(): i + 1
+                for i, valor in enumerate(ids)
+                if i > 0 and str(valor).strip()
+            }
+            with _handle_lock:
+                entry['indices'][aba_name] = indice
+        return indice
+
+    def _localizar_linha(self, aba_name, aba, row_id):
+        """
+        Localiza a linha de um ID usando o índice e confere lendo apenas essa linha.
+        Se o índice estiver desatualizado (linhas alteradas fora da aplicação),
+        reconstrói uma vez e tenta de novo. Retorna (numero_linha, valores) ou (None, None).
+        """
+        row_id = str(row_id).strip()
+        for reconstruir in (False, True):
+            linha = self._indice_ids(aba_name, aba, reconstruir).get(row_id)
+            if linha is None:
+                continue
+            valores = aba.ler_linha(linha)
+            if valores and str(valores[0]).strip() == row_id:
+                return linha, valores
+        return None, None
+
+    def _ids_livres(self, aba_name, quantidade):
+        """
+        Gera IDs novos descartando os que já estiverem no índice em cache da aba
+        (gerados por outro processo com o mesmo identificador no mesmo milissegundo).
+        """
+        indice = self._abrir_planilha()['indices'].get(aba_name) or {}
+        ids = []
+        while len(ids) < quantidade:
+            ids.extend(novo for novo in gerar_ids(quantidade - len(ids)) if str(novo) not in indice)
+        return ids
+
+    def _registrar_linha_no_indice(self, aba_name, row_id, linha):
+        """Registra no índice (se já construído) a linha de um ID recém-adicionado."""
+        entry = self._abrir_planilha()
+        with _handle_lock:
+            indice = entry['indices'].get(aba_name)
+            if indice is not None:
+                indice[str(row_id)] = linha
+
+    def _remover_linha_do_indice(self, aba_name, linha):
+        """Atualiza o índice após excluir uma linha, deslocando as linhas seguintes."""
+        entry = self._abrir_planilha()
+        with _handle_lock:
+            indice = entry['indices'].get(aba_name)
+            if indice is not None:
+                entry['indices'][aba_name] = {
+                    row_id: (n - 1 if n > linha else n)
+                    for row_id, n in indice.items()
+                    if n != linha
+                }
 
     def carregar_dados(self):
         """Função de conveniência para carregar dados da aba 'acess'."""
         return self.carregar_dados_aba('acess')
     
+    def carregar_dados_recentes(self, meses=MESES_HISTORICO_PORTARIA):
+        """
+        Carrega os registros de acesso usados pela portaria: a aba 'acess' (mês
+        corrente e registros em aberto) mais as partições dos `meses` anteriores.
+        """
+        return self._carregar_com_particoes(_meses_anteriores(meses))
+
+    def carregar_dados_mes(self, ano, mes):
+        """Carrega os registros de acesso de um mês: os da sua partição, se houver, e os da aba 'acess'."""
+        dados = self._carregar_com_particoes([(ano, mes)])
+        if not dados or 'Data' not in dados[0]:
+            return dados
+        i_data = dados[0].index('Data')
+        return [dados[0]] + [row for row in dados[1:] if _mes_do_registro(row[i_data]) == (ano, mes)]
+
+    def _carregar_com_particoes(self, meses):
+        """
+        Junta às linhas da aba 'acess' as das partições existentes dos meses
+        informados (lidas de uma só vez, se ainda não estiverem em cache), com as
+        colunas na ordem da aba 'acess'.
+        """
+        dados = self.carregar_dados()
+        if not dados:
+            return dados
+        existentes = set(self._abrir_planilha()['backend'].listar_abas())
+        particoes = [nome_particao(ano, mes) for ano, mes in meses if nome_particao(ano, mes) in existentes]
+        if not particoes:
+            return dados
+
+        self.pre_carregar_abas(particoes)
+        header = dados[0]
+        linhas = []
+        for particao in particoes:
+            dados_particao = self.carregar_dados_aba(particao)
+            if dados_particao:
+                linhas.extend(self._alinhar_colunas(dados_particao, header))
+        return [header] + linhas + dados[1:]
+
+    @staticmethod
+    def _alinhar_colunas(dados, header):
+        """Linhas de `dados` com as colunas na ordem de `header` (localizadas pelo nome)."""
+        if dados[0] == header:
+            return dados[1:]
+        posicoes = [dados[0].index(nome) if nome in dados[0] else None for nome in header]
+        return [[row[i] if i is not None and i < len(row) else "" for i in posicoes] for row in dados[1:]]
+
+    def ler_intervalos_aba(self, intervalos):
+        """
+        Lê vários intervalos (aba, linha_inicio, largura, linha_fim) em uma única
+        chamada, direto da planilha (sem os snapshots em cache); ver
+        BackendArmazenamento.ler_intervalos. Retorna None em caso de falha. Não mostra UI.
+        """
+        if not self.credentials or not self.my_archive_google_sheets:
+            return None
+        try:
+            return self._abrir_planilha()['backend'].ler_intervalos(intervalos)
+        except Exception as e:
+            self._invalidar_apos_erro(e, *dict.fromkeys(intervalo[0] for intervalo in intervalos))
+            logging.error(f"Erro ao ler intervalos da planilha: {e}")
+            return None
+
+    def contar_registros_acesso(self):
+        """
+        Conta os registros de acesso da aba 'acess' e de todas as partições, lendo
+        em uma única chamada apenas a coluna de IDs de cada uma.
+        Retorna None em caso de falha.
+        """
+        if not self.credentials or not self.my_archive_google_sheets:
+            return None
+        try:
+            backend = self._abrir_planilha()['backend']
+            abas = [nome for nome in backend.listar_abas() if nome == 'acess' or _e_particao(nome)]
+            colunas = backend.ler_intervalos([(nome, 2, 1, None) for nome in abas])
+            return sum(1 for coluna in colunas for row in coluna if row and str(row[0]).strip())
+        except Exception as e:
+            self._invalidar_apos_erro(e)
+            logging.error(f"Erro ao contar os registros de acesso: {e}")
+            return None
+
     def carregar_dados_aprovadores(self):
         """Carrega a lista de nomes dos aprovadores da aba 'authorizer'."""
         dados = self.carregar_dados_aba('authorizer')
@@ -52,129 +581,851 @@ class SheetOperations:
             return None
         try:
             logging.info(f"Tentando ler dados da aba '{aba_name}'...")
-            archive = self.credentials.open_by_url(self.my_archive_google_sheets)
-            
             try:
-                aba = archive.worksheet_by_title(aba_name)
+                aba = self._obter_aba(aba_name)
             except pygsheets.exceptions.WorksheetNotFound:
                 logging.warning(f"A aba '{aba_name}' não foi encontrada na planilha.")
                 return None
             
-            data = aba.get_all_values()
-            
+            return self._com_gravacoes_pendentes(aba_name, self._carregar_com_cache(aba_name, aba))
+        
+        except Exception as e:
+            copia = self._copia_local(aba_name)
+            self._invalidar_apos_erro(e, aba_name)
+            logging.error(f"Erro ao ler dados da aba '{aba_name}': {e}")
+            if copia is not None:
+                st.warning(f"Google Sheets indisponível no momento; exibindo a última cópia local da aba '{aba_name}'.")
+                return self._com_gravacoes_pendentes(aba_name, copia)
+            st.error(f"Erro ao ler dados da aba '{aba_name}': {e}")
+            return None
+
+    def _com_gravacoes_pendentes(self, aba_name, dados):
+        """Aplica aos dados lidos as inclusões e edições da aba que ainda estão na fila de gravação."""
+        if not dados or not _fila_em_uso():
+            return dados
+        itens = write_queue.em_aberto(aba_name)
+        if not itens:
+            return dados
+
+        entry = _handle_cache.get(self.my_archive_google_sheets) or {'snapshots': {}}
+        snapshot = entry['snapshots'].get(aba_name)
+        colunas = snapshot['colunas'] if snapshot is not None else list(range(len(dados[0])))
+        posicoes = {row[0]: i for i, row in enumerate(dados) if i > 0 and row}
+        for item in itens:
+            if item['operacao'] == 'campos':
+                row_id = item['ids'][0]
+                if row_id in posicoes:
+                    row = dados[posicoes[row_id]] = list(dados[posicoes[row_id]])
+                    for nome, valor in item['dados']['campos'].items():
+                        if nome in dados[0]:
+                            row[dados[0].index(nome)] = str(valor).strip()
+                continue
+            for row_id, linha in zip(item['ids'], item['dados']):
+                valores = self._filtrar_colunas([[row_id] + list(linha)], aba_name, colunas)[0][0]
+                if row_id in posicoes:
+                    # Já gravado e relido
+                    dados[posicoes[row_id]] = valores
+                else:
+                    posicoes[row_id] = len(dados)
+                    dados.append(valores)
+        return dados
+
+    def _copia_local(self, aba_name):
+        """Última cópia conhecida da aba: o snapshot em memória ou, na falta dele, a cópia em disco."""
+        entry = _handle_cache.get(self.my_archive_google_sheets)
+        if entry is not None:
+            with _handle_lock:
+                snapshot = entry['snapshots'].get(aba_name)
+                if snapshot is not None:
+                    return list(snapshot['dados'])
+        if not self._usa_copia_em_disco:
+            return None
+        dados, _, _ = snapshot_cache.carregar(aba_name)
+        return dados
+
+    @staticmethod
+    def _filtrar_colunas(data, aba_name, valid_columns_indices=None):
+        """
+        Mantém apenas as colunas com cabeçalho preenchido e normaliza os valores.
+        Retorna (dados_filtrados, indices_das_colunas_validas).
+        """
+        if valid_columns_indices is None:
             if not data:
                 logging.warning(f"A aba '{aba_name}' está vazia.")
-                return []
+                return [], None
 
             header = data[0]
             valid_columns_indices = [i for i, col_name in enumerate(header) if col_name.strip()]
             
             if not valid_columns_indices:
-                return [[]]
+                return [[]], None
 
             filtered_data = [[header[i] for i in valid_columns_indices]]
-            for row in data[1:]:
-                filtered_row = [str(row[i]).strip() if i < len(row) else "" for i in valid_columns_indices]
-                filtered_data.append(filtered_row)
-            
-            return filtered_data
+            data = data[1:]
+        else:
+            filtered_data = []
+
+        for row in data:
+            filtered_row = [str(row[i]).strip() if i < len(row) else "" for i in valid_columns_indices]
+            filtered_data.append(filtered_row)
         
-        except Exception as e:
-            logging.error(f"Erro ao ler dados da aba '{aba_name}': {e}")
-            st.error(f"Erro ao ler dados da aba '{aba_name}': {e}")
+        return filtered_data, valid_columns_indices
+
+    def _verificar_alteracoes(self, entry):
+        """
+        Compara, com uma única chamada à API, a impressão digital de todas as abas
+        em cache cuja última verificação expirou, e registra em cada snapshot o
+        estado: 'inalterada', 'anexada' ou 'alterada'.
+        """
+        agora = time.time()
+        pendentes = [
+            (aba_name, snapshot) for aba_name, snapshot in list(entry['snapshots'].items())
+            if agora - snapshot['verificado_em'] >= INTERVALO_VERIFICACAO_SEGUNDOS and not _e_particao(aba_name)
+        ]
+        if not pendentes:
+            return
+
+        intervalos = []
+        for aba_name, snapshot in pendentes:
+            total = len(snapshot['dados'])
+            inicio = 1 if total <= LIMITE_ABA_PEQUENA else total - LINHAS_IMPRESSAO_DIGITAL + 1
+            intervalos.append((aba_name, snapshot, inicio, total))
+
+        respostas = entry['backend'].ler_intervalos([
+            (aba_name, inicio, max(snapshot['colunas']) + 1, total + 1)
+            for aba_name, snapshot, inicio, total in intervalos
+        ])
+
+        with _handle_lock:
+            for (aba_name, snapshot, inicio, total), brutas in zip(intervalos, respostas):
+                brutas = list(brutas)
+                brutas += [[]] * (total - inicio + 2 - len(brutas))
+                linhas, _ = self._filtrar_colunas(brutas, aba_name, snapshot['colunas'])
+                if inicio == 1:
+                    # O cabeçalho é guardado sem normalização
+                    linhas[0] = [brutas[0][i] if i < len(brutas[0]) else "" for i in snapshot['colunas']]
+                esperado = snapshot['dados'][inicio - 1:]
+                if linhas[:-1] != esperado:
+                    snapshot['estado'] = 'alterada'
+                elif any(linhas[-1]):
+                    snapshot['estado'] = 'anexada'
+                else:
+                    snapshot['estado'] = 'inalterada'
+                snapshot['verificado_em'] = agora
+
+    def _carregar_com_cache(self, aba_name, aba):
+        """
+        Carrega a aba reaproveitando o snapshot em memória quando a verificação
+        de mudanças indica que nada mudou, ou buscando apenas as linhas anexadas.
+        """
+        entry = self._abrir_planilha()
+        snapshot = entry['snapshots'].get(aba_name)
+        if snapshot is None:
+            snapshot = self._semear_do_disco(entry, aba_name)
+
+        if snapshot is not None and _e_particao(aba_name):
+            # Partições só mudam pelo arquivamento, que descarta o snapshot
+            with _handle_lock:
+                return list(snapshot['dados'])
+
+        if snapshot is not None and snapshot.get('semeado'):
+            # Cópia vinda do disco: servida de imediato e conferida em segundo plano
+            self._reconciliar_em_segundo_plano(entry, aba_name, snapshot)
+            with _handle_lock:
+                return list(snapshot['dados'])
+
+        if snapshot is not None and time.time() - snapshot['carregado_em'] < RECARGA_COMPLETA_SEGUNDOS:
+            self._verificar_alteracoes(entry)
+
+            if snapshot['estado'] == 'inalterada':
+                with _handle_lock:
+                    return list(snapshot['dados'])
+
+            if snapshot['estado'] == 'anexada':
+                total = len(snapshot['dados'])
+                largura = max(snapshot['colunas']) + 1
+                novas = aba.ler_a_partir(total + 1, largura)
+                novas, _ = self._filtrar_colunas(novas, aba_name, snapshot['colunas'])
+                with _handle_lock:
+                    # Outra sessão pode ter atualizado o snapshot enquanto líamos
+                    if entry['snapshots'].get(aba_name) is snapshot and len(snapshot['dados']) == total:
+                        snapshot['dados'].extend(novas)
+                        snapshot['estado'] = 'inalterada'
+                    dados = list(snapshot['dados'])
+                logging.info(f"Aba '{aba_name}': {len(novas)} linha(s) nova(s) carregada(s) incrementalmente.")
+                return dados
+            logging.info(f"Aba '{aba_name}' alterada fora da aplicação; recarregando por completo.")
+
+        dados, colunas = self._filtrar_colunas(aba.ler_tudo(), aba_name)
+        self._guardar_snapshot(entry, aba_name, dados, colunas)
+        return list(dados)
+
+    @staticmethod
+    def _guardar_snapshot(entry, aba_name, dados, colunas):
+        """Guarda o conteúdo recém-lido de uma aba como seu snapshot em memória."""
+        with _handle_lock:
+            if colunas is not None:
+                agora = time.time()
+                entry['snapshots'][aba_name] = {
+                    'dados': dados, 'colunas': colunas,
+                    'carregado_em': agora, 'verificado_em': agora, 'estado': 'inalterada'
+                }
+            else:
+                entry['snapshots'].pop(aba_name, None)
+
+    def _semear_do_disco(self, entry, aba_name):
+        """
+        Cria o snapshot da aba a partir da cópia em disco (ver
+        app.snapshot_cache). O snapshot fica marcado como 'semeado': é servido
+        como está e conferido com a planilha em segundo plano na primeira leitura
+        (partições não precisam de conferência).
+        """
+        if not self._usa_copia_em_disco:
             return None
-        
+        dados, colunas, carregado_em = snapshot_cache.carregar(aba_name)
+        if dados is None:
+            return None
+        with _handle_lock:
+            return entry['snapshots'].setdefault(aba_name, {
+                'dados': dados, 'colunas': colunas,
+                'carregado_em': carregado_em, 'verificado_em': 0, 'estado': 'inalterada',
+                'semeado': not _e_particao(aba_name)
+            })
+
+    def _reconciliar_em_segundo_plano(self, entry, aba_name, snapshot):
+        """Inicia (uma vez por snapshot semeado) a conferência da aba com a planilha."""
+        with _handle_lock:
+            if snapshot.get('semeado') is not True:
+                return
+            snapshot['semeado'] = 'reconciliando'
+        threading.Thread(
+            target=self._reconciliar, args=(entry, aba_name, snapshot),
+            name=f'reconciliar-{aba_name}', daemon=True
+        ).start()
+
+    def _reconciliar(self, entry, aba_name, snapshot):
+        """
+        Confere um snapshot vindo do disco: se for recente, pela verificação de
+        mudanças (leitura leve); senão, relendo a aba. Enquanto isso, as leituras
+        continuam servindo a cópia do disco. Em caso de falha, tenta de novo na
+        próxima leitura.
+        """
+        try:
+            with prioridade(PRIORIDADE_SEGUNDO_PLANO):
+                aba = self._obter_aba(aba_name)
+                if time.time() - snapshot['carregado_em'] < RECARGA_COMPLETA_SEGUNDOS:
+                    with _handle_lock:
+                        snapshot['semeado'] = False
+                    self._carregar_com_cache(aba_name, aba)
+                else:
+                    dados, colunas = self._filtrar_colunas(aba.ler_tudo(), aba_name)
+                    self._guardar_snapshot(entry, aba_name, dados, colunas)
+            logging.info(f"Aba '{aba_name}' carregada do disco e conferida com a planilha.")
+        except Exception as e:
+            with _handle_lock:
+                snapshot['semeado'] = True
+            logging.error(f"Erro ao conferir com a planilha a cópia em disco da aba '{aba_name}': {e}")
+
+    def sincronizar_espelho(self, aba_names=ABAS_ESPELHADAS, assinaturas=None):
+        """
+        Confere as abas com a planilha (uma leitura em lote para as que não estão
+        em memória e a verificação de mudanças para as demais) e grava no cache
+        colunar em disco as que mudaram desde a última sincronização, além das partições em memória ainda sem cópia em disco.
+        `assinaturas` guarda, entre chamadas, o conteúdo já gravado de cada aba.
+        Retorna True em caso de sucesso, False em caso de falha. Não mostra UI.
+        """
+        if not self.credentials or not self.my_archive_google_sheets or not self._usa_copia_em_disco:
+            return False
+        assinaturas = {} if assinaturas is None else assinaturas
+        try:
+            if not self.pre_carregar_abas(aba_names):
+                return False
+            entry = self._abrir_planilha()
+            for aba_name in aba_names:
+                if aba_name not in entry['snapshots']:
+                    continue
+                dados = self._carregar_com_cache(aba_name, self._obter_aba(aba_name))
+                with _handle_lock:
+                    snapshot = entry['snapshots'].get(aba_name)
+                if snapshot is None or snapshot['colunas'] is None or snapshot.get('semeado'):
+                    # Cópia do disco ainda não conferida: não é gravada como sincronizada
+                    continue
+                assinatura = hash(tuple(map(tuple, dados)))
+                if assinaturas.get(aba_name) == assinatura:
+                    continue
+                versao = snapshot_cache.assinatura(dados)
+                gravado = snapshot_cache.versao(aba_name) == versao or snapshot_cache.salvar(
+                    aba_name, dados, snapshot['colunas'], snapshot['carregado_em'], versao
+                )
+                if gravado:
+                    assinaturas[aba_name] = assinatura
+
+            with _handle_lock:
+                particoes = [
+                    (aba_name, snapshot) for aba_name, snapshot in entry['snapshots'].items()
+                    if _e_particao(aba_name) and snapshot['colunas'] is not None
+                ]
+            for aba_name, snapshot in particoes:
+                if snapshot_cache.versao(aba_name) is None:
+                    snapshot_cache.salvar(aba_name, snapshot['dados'], snapshot['colunas'], snapshot['carregado_em'])
+            return True
+        except Exception as e:
+            self._invalidar_apos_erro(e)
+            logging.error(f"Erro ao sincronizar o espelho local: {e}")
+            return False
+
+    def pre_carregar_abas(self, aba_names=ABAS_PRE_CARREGAMENTO):
+        """
+        Lê de uma só vez, com uma única chamada values_batch_get, as abas
+        informadas que ainda não têm snapshot válido (nem cópia em disco),
+        preenchendo o cache usado por carregar_dados_aba.
+        Abas inexistentes são ignoradas.
+        Retorna True em caso de sucesso, False em caso de falha.
+        """
+        if not self.credentials or not self.my_archive_google_sheets:
+            return False
+        try:
+            entry = self._abrir_planilha()
+            agora = time.time()
+            pendentes = []
+            for aba_name in aba_names:
+                snapshot = entry['snapshots'].get(aba_name) or self._semear_do_disco(entry, aba_name)
+                if snapshot is not None and (
+                    _e_particao(aba_name) or snapshot.get('semeado')
+                    or agora - snapshot['carregado_em'] < RECARGA_COMPLETA_SEGUNDOS
+                ):
+                    continue
+                try:
+                    self._obter_aba(aba_name)
+                except pygsheets.exceptions.WorksheetNotFound:
+                    logging.warning(f"A aba '{aba_name}' não foi encontrada na planilha.")
+                    continue
+                pendentes.append(aba_name)
+
+            if not pendentes:
+                return True
+
+            respostas = entry['backend'].ler_intervalos([(aba_name, None, None, None) for aba_name in pendentes])
+            for aba_name, valores in zip(pendentes, respostas):
+                dados, colunas = self._filtrar_colunas(valores, aba_name)
+                self._guardar_snapshot(entry, aba_name, dados, colunas)
+            logging.info(f"Pré-carregadas em uma única leitura as abas: {', '.join(pendentes)}.")
+            return True
+        except Exception as e:
+            self._invalidar_apos_erro(e)
+            logging.error(f"Erro ao pré-carregar as abas {', '.join(aba_names)}: {e}")
+            return False
+
+    def _marcar_para_verificacao(self, aba_name):
+        """Força a verificação de mudanças da aba na próxima leitura (após gravações)."""
+        entry = self._abrir_planilha()
+        with _handle_lock:
+            snapshot = entry['snapshots'].get(aba_name)
+            if snapshot is not None:
+                snapshot['verificado_em'] = 0
+
+    def _atualizar_snapshot(self, aba_name, linha, valores):
+        """Aplica ao snapshot em memória (se houver) uma linha recém-editada."""
+        entry = self._abrir_planilha()
+        with _handle_lock:
+            snapshot = entry['snapshots'].get(aba_name)
+            if snapshot is not None and 1 < linha <= len(snapshot['dados']):
+                snapshot['dados'][linha - 1] = self._filtrar_colunas([valores], aba_name, snapshot['colunas'])[0][0]
+
+    def _remover_linhas_do_snapshot(self, aba_name, linhas):
+        """Remove do snapshot em memória (se houver) linhas recém-excluídas."""
+        entry = self._abrir_planilha()
+        with _handle_lock:
+            snapshot = entry['snapshots'].get(aba_name)
+            if snapshot is None:
+                return
+            for linha in sorted(set(linhas), reverse=True):
+                if 1 < linha <= len(snapshot['dados']):
+                    del snapshot['dados'][linha - 1]
+
     def adc_dados_aba(self, new_data, aba_name):
         """
         Função genérica e "silenciosa" para adicionar dados a uma aba específica.
         Retorna True em caso de sucesso, False em caso de falha. Não mostra UI.
         """
+        return self.adc_dados_aba_lote([new_data], aba_name)
+
+    def adc_dados_aba_lote(self, linhas, aba_name):
+        """
+        Adiciona várias linhas a uma aba com uma única operação de anexação,
+        alocando um ID para cada linha. Com a gravação adiada ativa, apenas
+        registra a operação na fila local. Se a planilha estiver inacessível (sem
+        conexão, erro transitório, cota esgotada), as linhas também vão para a
+        fila local, de onde são enviadas quando ela voltar; outras falhas não.
+        Retorna True em caso de sucesso, False em caso de falha.
+        """
+        if not linhas:
+            return True
+        self._guardado_na_fila = False
+        if self._grava_adiado(aba_name):
+            return self._enfileirar('anexar', aba_name, self._ids_livres(aba_name, len(linhas)), [list(linha) for linha in linhas])
+        ids = self._ids_livres(aba_name, len(linhas))
         if not self.credentials or not self.my_archive_google_sheets:
+            return self._guardar_apos_falha('anexar', aba_name, ids, [list(linha) for linha in linhas], "sem conexão com o Google Sheets")
+        if self._anexar_linhas(linhas, aba_name, ids=ids):
+            return True
+        if not erro_transitorio(self._erro_inclusao):
             return False
+        return self._guardar_apos_falha('anexar', aba_name, ids, [list(linha) for linha in linhas], "falha ao gravar na planilha")
+
+    def _guardar_apos_falha(self, operacao, aba_name, ids, dados, motivo):
+        """
+        Guarda na fila local durável (app.write_queue) uma inclusão ('anexar') ou
+        edição ('campos', ver _item_de_edicao) que não chegou à planilha; a thread
+        de gravação adiada a envia em ordem quando ela voltar. O item já conta
+        como uma tentativa: antes de reenviar uma inclusão, a thread confere se os
+        IDs chegaram à planilha. Retorna True se a operação foi guardada.
+        """
+        descricao = f"inclusão de {len(dados)} linha(s)" if operacao == 'anexar' else f"edição do ID {ids[0]}"
         try:
-            archive = self.credentials.open_by_url(self.my_archive_google_sheets)
-            
-            try:
-                aba = archive.worksheet_by_title(aba_name)
-            except pygsheets.exceptions.WorksheetNotFound:
-                aba = archive.add_worksheet(aba_name)
-                if aba_name == 'blocklist':
-                    aba.update_row(1, ["ID", "Type", "Value", "Reason", "BlockedBy", "Timestamp"])
-                elif aba_name == 'acess':
-                    aba.update_row(1, ["ID", "Nome", "CPF", "Placa", "Marca do Carro", "Horário de Entrada", "Horário de Saída", "Data", "Empresa", "Status da Entrada", "Motivo do Bloqueio", "Aprovador", "Data do Primeiro Registro"])
-                elif aba_name == 'logs':
-                    aba.update_row(1, ["Timestamp", "User", "Action", "Details"])
-                elif aba_name == 'schedules':
-                    aba.update_row(1, ["ID", "VisitorName", "VisitorCPF", "Company", "ScheduledDate", "ScheduledTime", "AuthorizedBy", "Status", "CheckInTime"])
-                elif aba_name == 'access_requests':
-                    aba.update_row(1, [
-                        "ID",
-                        "user_email",
-                        "user_name",
-                        "desired_role",
-                        "department",
-                        "justification",
-                        "manager_email",
-                        "request_date",
-                        "status",
-                        "reviewed_by"
-                    ])
-                elif aba_name == 'materials':
-                    aba.update_row(1, ["ID", "Item", "Quantidade", "Destino", "Responsável pela Saída"])
-            
-            all_values = aba.get_all_values()
-            existing_ids = [row[0] for row in all_values[1:] if row and row[0]]
-            while True:
-                new_id = random.randint(10000, 99999)
-                if str(new_id) not in existing_ids:
-                    break
+            seq = write_queue.enfileirar(aba_name, operacao, ids, dados)
+            write_queue.marcar(seq, 'pendente', erro=motivo, nova_tentativa=True)
+        except Exception as e:
+            logging.error(f"Erro ao guardar na fila local a {descricao} na aba '{aba_name}': {e}", exc_info=True)
+            return False
+        self._guardado_na_fila = True
+        iniciar_gravacao_adiada()
+        _fila_evento.set()
+        logging.warning(f"A {descricao} na aba '{aba_name}' foi guardada na fila local ({motivo}).")
+        return True
 
-            new_data.insert(0, new_id)
-            aba.append_table(values=[new_data])
-            logging.info(f"Dados adicionados com sucesso à aba '{aba_name}'.")
+    def _anexar_linhas(self, linhas, aba_name, ids=None):
+        """
+        Anexa as linhas à planilha, com os IDs informados ou com IDs novos. Em caso
+        de falha, a exceção fica em self._erro_inclusao.
+        """
+        self._erro_inclusao = None
+        try:
+            aba = self._obter_aba(aba_name, criar=True)
+            
+            novos_ids = ids or self._ids_livres(aba_name, len(linhas))
+            valores = [[novo_id] + list(linha) for novo_id, linha in zip(novos_ids, linhas)]
+            primeira_linha = aba.anexar(_com_id_texto(valores))
+            for deslocamento, novo_id in enumerate(novos_ids):
+                self._registrar_linha_no_indice(aba_name, novo_id, primeira_linha + deslocamento)
+            self._marcar_para_verificacao(aba_name)
+            logging.info(f"{len(valores)} linha(s) adicionada(s) com sucesso à aba '{aba_name}'.")
             return True
         except Exception as e:
+            self._erro_inclusao = e
+            self._invalidar_apos_erro(e, aba_name)
             logging.error(f"Erro ao adicionar dados à aba '{aba_name}': {e}", exc_info=True)
             return False
             
+    def anexar_linhas_aba(self, linhas, aba_name):
+        """
+        Anexa as linhas como estão, sem coluna de ID (ex.: aba 'logs'), em uma
+        única chamada, criando a aba com o cabeçalho padrão se necessário. Não mostra UI.
+        Retorna True em caso de sucesso, False em caso de falha.
+        """
+        if not self.credentials or not self.my_archive_google_sheets:
+            return False
+        try:
+            self._obter_aba(aba_name, criar=True).anexar([list(linha) for linha in linhas])
+            self._marcar_para_verificacao(aba_name)
+            return True
+        except Exception as e:
+            self._invalidar_apos_erro(e, aba_name)
+            logging.error(f"Erro ao adicionar linhas à aba '{aba_name}': {e}")
+            return False
+
     def adc_dados(self, new_data):
         """Função de conveniência para adicionar dados à aba 'acess' e mostrar mensagem de sucesso."""
         if self.adc_dados_aba(new_data, 'acess'):
-            st.success("Dados adicionados com sucesso!")
+            st.success(self._mensagem_sucesso('acess'))
         else:
             st.error("Falha ao adicionar dados na planilha 'acess'.")
 
+    def adc_dados_lote(self, linhas):
+        """Função de conveniência para adicionar várias linhas à aba 'acess' de uma só vez."""
+        if self.adc_dados_aba_lote(linhas, 'acess'):
+            st.success(self._mensagem_sucesso('acess'))
+            return True
+        st.error("Falha ao adicionar dados na planilha 'acess'.")
+        return False
+
     def editar_dados_aba(self, row_id, updated_data, aba_name):
-        """Edita uma linha em uma aba específica com base no ID."""
+        """
+        Edita uma linha em uma aba específica com base no ID. Com a gravação
+        adiada ativa, confere o ID nos dados atuais e apenas registra a edição na
+        fila; sem ela, a edição vai para a fila se a planilha estiver inacessível
+        (erro transitório); outras falhas são mostradas e não são repetidas.
+        """
+        self._guardado_na_fila = False
         if not self.credentials or not self.my_archive_google_sheets:
+            return self._guardar_edicao_apos_falha(row_id, updated_data, aba_name, "sem conexão com o Google Sheets")
+        if self._grava_adiado(aba_name):
+            item = self._item_de_edicao(self.carregar_dados_aba(aba_name), row_id, updated_data)
+            if item is None:
+                logging.error(f"ID {row_id} não encontrado na aba '{aba_name}' para edição.")
+                return False
+            return not item['campos'] or self._enfileirar('campos', aba_name, [row_id], item)
+        pedido = self._enviar_edicao(aba_name, {
+            'row_id': str(row_id).strip(), 'valores': [str(row_id)] + list(updated_data)
+        }, mostrar_erro=False)
+        if pedido['ok']:
+            return True
+        if not pedido['erro']:
+            # ID não encontrado: não adianta tentar de novo
             return False
+        if pedido['transitorio'] and self._guardar_edicao_apos_falha(
+            row_id, updated_data, aba_name, "falha ao gravar na planilha"
+        ):
+            return True
+        st.error(f"Erro crítico ao tentar editar dados: {pedido['erro']}")
+        return False
+
+    @staticmethod
+    def _item_de_edicao(dados, row_id, updated_data):
+        """
+        Converte a edição de uma linha inteira no item de fila 'campos': só as
+        colunas que mudam em relação à linha atual em `dados` (com a fila já
+        aplicada) e, como 'esperado', os valores atuais delas. Assim, o reenvio
+        não desfaz edições feitas depois em outras colunas e, se uma das colunas
+        alteradas mudou nesse meio-tempo, é recusado como conflito.
+        Retorna None se o ID não estiver em `dados`.
+        """
+        row_id = str(row_id).strip()
+        row = next((row for row in (dados or [])[1:] if row and row[0] == row_id), None)
+        if row is None:
+            return None
+        atual = dict(zip(dados[0], row))
+        novos = dict(zip(dados[0], [row_id] + [str(valor).strip() for valor in updated_data]))
+        campos = {nome: valor for nome, valor in novos.items() if atual.get(nome, "") != valor}
+        return {'campos': campos, 'esperado': {nome: atual.get(nome, "") for nome in campos}}
+
+    def _guardar_edicao_apos_falha(self, row_id, updated_data, aba_name, motivo):
+        """
+        Guarda na fila a edição que não chegou à planilha, calculada sobre a
+        última cópia local da aba (ver _copia_local e _item_de_edicao). Sem essa
+        cópia, a edição não é guardada: reenviá-la às cegas sobrescreveria a linha.
+        """
+        dados = self._com_gravacoes_pendentes(aba_name, self._copia_local(aba_name))
+        item = self._item_de_edicao(dados, row_id, updated_data)
+        if item is None:
+            logging.error(f"Edição do ID {row_id} na aba '{aba_name}' não guardada: registro ausente da cópia local.")
+            return False
+        return not item['campos'] or self._guardar_apos_falha('campos', aba_name, [row_id], item, motivo)
+
+    def atualizar_campos_aba(self, row_id, alterar, aba_name):
+        """
+        Atualiza campos de um registro com controle otimista de concorrência.
+        `alterar` recebe o registro atual ({coluna: valor}) e retorna as colunas
+        a alterar ({coluna: novo_valor}), ou None se a alteração não se aplica
+        mais (ex.: a saída já foi registrada por outra portaria). A gravação só
+        acontece se o registro continuar como `alterar` o viu; em caso de
+        conflito, `alterar` é chamada de novo com o registro atual.
+        Retorna True se gravou, None se `alterar` desistiu, False em caso de falha.
+        """
+        if not self.credentials or not self.my_archive_google_sheets:
+            return False
+        if self._grava_adiado(aba_name):
+            return self._enfileirar_campos(str(row_id).strip(), alterar, aba_name)
+        return self._atualizar_campos(str(row_id).strip(), alterar, aba_name)
+
+    def atualizar_campos(self, row_id, alterar):
+        """Função de conveniência para atualizar campos de um registro da aba 'acess'."""
+        return self.atualizar_campos_aba(row_id, alterar, 'acess')
+
+    def _atualizar_campos(self, row_id, alterar, aba_name):
+        """
+        Ciclo otimista: parte do registro no snapshot em memória (ou lê apenas a
+        linha alvo), calcula a alteração e a envia no lote de edições da aba,
+        que só grava se a linha não mudou. O conflito já traz o registro atual,
+        então a nova tentativa não faz outra leitura.
+        """
         try:
-            archive = self.credentials.open_by_url(self.my_archive_google_sheets)
-            aba = archive.worksheet_by_title(aba_name)
-            
-            all_values = aba.get_all_values()
-            row_to_update_index = -1
-            
-            # Itera sobre as linhas para encontrar o ID
-            for i, row in enumerate(all_values):
-                # Compara o valor da primeira coluna (ID)
-                if row and str(row[0]) == str(row_id):
-                    row_to_update_index = i + 1
-                    break
-            
-            if row_to_update_index != -1:
-                updated_row = [str(row_id)] + updated_data
-                aba.update_row(row_to_update_index, updated_row)
-                logging.info(f"Dados do ID {row_id} editados com sucesso na aba '{aba_name}'.")
-                return True
-            else:
+            registro = self._registro_em_cache(aba_name, row_id)
+            for tentativa in range(MAX_TENTATIVAS_CONFLITO):
+                if registro is None:
+                    registro = self._ler_registro(aba_name, row_id)
+                    if registro is None:
+                        logging.error(f"ID {row_id} não encontrado na aba '{aba_name}' para edição.")
+                        return False
+                campos = alterar(dict(registro))
+                if not campos:
+                    return None
+                pedido = self._enviar_edicao(aba_name, {
+                    'row_id': row_id, 'esperado': registro, 'campos': dict(campos)
+                })
+                if pedido['ok']:
+                    return True
+                if not pedido.get('conflito'):
+                    return False
+                registro = pedido['atual']
+                logging.info(f"Conflito ao editar o ID {row_id} na aba '{aba_name}'; nova tentativa {tentativa + 2}.")
+            logging.error(f"ID {row_id} na aba '{aba_name}' alterado concorrentemente {MAX_TENTATIVAS_CONFLITO} vezes; edição abandonada.")
+            return False
+        except Exception as e:
+            self._invalidar_apos_erro(e, aba_name)
+            logging.error(f"Erro ao atualizar campos do ID {row_id} na aba '{aba_name}': {e}", exc_info=True)
+            return False
+
+    @staticmethod
+    def _como_registro(cabecalho, valores):
+        """Converte uma linha em {coluna: valor}, normalizada como em _filtrar_colunas."""
+        return {
+            nome: str(valores[i]).strip() if i < len(valores) else ""
+            for i, nome in enumerate(cabecalho) if nome.strip()
+        }
+
+    def _registro_em_cache(self, aba_name, row_id):
+        """Registro do ID no snapshot em memória da aba, ou None se não estiver lá."""
+        entry = self._abrir_planilha()
+        with _handle_lock:
+            snapshot = entry['snapshots'].get(aba_name)
+            if snapshot is None or not snapshot['dados']:
+                return None
+            header = snapshot['dados'][0]
+            row = next((row for row in snapshot['dados'][1:] if row and row[0] == row_id), None)
+        return dict(zip(header, row)) if row is not None else None
+
+    def _ler_registro(self, aba_name, row_id):
+        """Lê o cabeçalho e apenas a linha do ID, em uma única chamada. Retorna o registro ou None."""
+        aba = self._obter_aba(aba_name)
+        for reconstruir in (False, True):
+            linha = self._indice_ids(aba_name, aba, reconstruir).get(row_id)
+            if linha is None:
+                continue
+            cabecalho, valores = self._abrir_planilha()['backend'].ler_intervalos(
+                [(aba_name, 1, None, 1), (aba_name, linha, None, linha)]
+            )
+            valores = valores[0] if valores else []
+            if valores and str(valores[0]).strip() == row_id:
+                return self._como_registro([str(v) for v in (cabecalho or [[]])[0]], valores)
+        return None
+
+    def _enfileirar_campos(self, row_id, alterar, aba_name):
+        """
+        Com a gravação adiada, calcula a alteração sobre os dados atuais (já com
+        a fila aplicada) e registra na fila os campos alterados e, como
+        'esperado', o registro visto, conferido no reenvio como em
+        _atualizar_campos. O lock impede que duas sessões decidam sobre o mesmo
+        estado antes do registro.
+        """
+        with _campos_adiados_lock:
+            dados = self.carregar_dados_aba(aba_name) or []
+            row = next((row for row in dados[1:] if row and row[0] == row_id), None)
+            if row is None:
                 logging.error(f"ID {row_id} não encontrado na aba '{aba_name}' para edição.")
                 return False
-                
+            registro = dict(zip(dados[0], row))
+            campos = alterar(dict(registro))
+            if not campos:
+                return None
+            return self._enfileirar('campos', aba_name, [row_id], {
+                'campos': {nome: str(valor) for nome, valor in campos.items()}, 'esperado': registro
+            })
+
+    def _enviar_edicao(self, aba_name, pedido, mostrar_erro=True):
+        """
+        Coloca um pedido de edição no lote da aba e retorna o pedido com o
+        resultado. A primeira sessão a chegar espera a janela de coalescência e
+        envia o lote inteiro, as demais aguardam o resultado.
+        """
+        pedido.update({'ok': False, 'erro': None, 'transitorio': False, 'pronto': threading.Event()})
+        entry = self._abrir_planilha()
+        with _handle_lock:
+            lote = entry['lotes'].setdefault(aba_name, _LoteEdicoes())
+        with lote.lock:
+            lote.pedidos.append(pedido)
+            lider = not lote.com_lider
+            lote.com_lider = True
+
+        if lider:
+            time.sleep(JANELA_EDICOES_SEGUNDOS)
+            with lote.lock:
+                pedidos, lote.pedidos, lote.com_lider = lote.pedidos, [], False
+            self._gravar_edicoes(aba_name, pedidos)
+        elif not pedido['pronto'].wait(ESPERA_MAXIMA_EDICAO_SEGUNDOS):
+            pedido['erro'] = "tempo esgotado aguardando o envio do lote de edições"
+            pedido['transitorio'] = True
+
+        if pedido['erro'] and mostrar_erro:
+            st.error(f"Erro crítico ao tentar editar dados: {pedido['erro']}")
+        return pedido
+
+    def _gravar_edicoes(self, aba_name, pedidos):
+        """
+        Envia um lote de edições: confere as linhas alvo com uma única leitura,
+        compara com os valores atuais e grava só as células alteradas em uma
+        única requisição. Pedidos com 'campos' só são aplicados se as colunas do
+        'esperado' ainda tiverem os valores dele; senão, recebem 'conflito' e o
+        registro atual. Sinaliza o resultado em cada pedido; nunca levanta exceção.
+        """
+        try:
+            aba = self._obter_aba(aba_name)
+            linhas_atuais = {}
+            cabecalho = None
+            for reconstruir in (False, True):
+                faltantes = [p['row_id'] for p in pedidos if p['row_id'] not in linhas_atuais]
+                if not faltantes:
+                    break
+                indice = self._indice_ids(aba_name, aba, reconstruir)
+                alvos = sorted({indice[row_id] for row_id in faltantes if row_id in indice})
+                if not alvos:
+                    continue
+                intervalos = [(aba_name, linha, None, linha) for linha in alvos]
+                if cabecalho is None and any('campos' in p for p in pedidos):
+                    # O cabeçalho vem na mesma leitura, para localizar as colunas por nome
+                    intervalos.insert(0, (aba_name, 1, None, 1))
+                lidas = self._abrir_planilha()['backend'].ler_intervalos(intervalos)
+                if len(intervalos) > len(alvos):
+                    cabecalho = [str(v) for v in (lidas.pop(0) or [[]])[0]]
+                for linha, valores in zip(alvos, lidas):
+                    valores = valores[0] if valores else []
+                    # Confere se a linha ainda é a do ID (o índice pode estar desatualizado)
+                    if valores and str(valores[0]).strip() in faltantes:
+                        linhas_atuais[str(valores[0]).strip()] = (linha, [str(v) for v in valores])
+
+            finais = {}
+            aplicados = []
+            for pedido in pedidos:
+                if pedido['row_id'] not in linhas_atuais:
+                    logging.error(f"ID {pedido['row_id']} não encontrado na aba '{aba_name}' para edição.")
+                    continue
+                linha, atuais = linhas_atuais[pedido['row_id']]
+                final = finais.setdefault(linha, (list(atuais), list(atuais)))[1]
+                if 'campos' in pedido:
+                    # Compara com o estado da linha após as edições anteriores do lote
+                    registro = self._como_registro(cabecalho, final)
+                    if any(registro.get(nome) != valor for nome, valor in pedido['esperado'].items()):
+                        pedido['conflito'], pedido['atual'] = True, registro
+                        continue
+                    desconhecidas = [nome for nome in pedido['campos'] if nome not in cabecalho]
+                    if desconhecidas:
+                        logging.error(f"Coluna(s) {desconhecidas} não encontrada(s) na aba '{aba_name}'.")
+                        continue
+                    for nome, valor in pedido['campos'].items():
+                        i = cabecalho.index(nome)
+                        final.extend([""] * (i + 1 - len(final)))
+                        final[i] = str(valor)
+                else:
+                    final.extend([""] * (len(pedido['valores']) - len(final)))
+                    final[:len(pedido['valores'])] = [str(v) for v in pedido['valores']]
+                aplicados.append(pedido)
+
+            alteracoes = []
+            for linha, (antes, depois) in sorted(finais.items()):
+                inicio = None
+                for coluna, valor in enumerate(depois + [None]):
+                    anterior = antes[coluna] if coluna < len(antes) else ""
+                    mudou = valor is not None and anterior != valor
+                    if mudou and inicio is None:
+                        inicio = coluna
+                    elif not mudou and inicio is not None:
+                        alteracoes.append((linha, inicio + 1, depois[inicio:coluna]))
+                        inicio = None
+            if alteracoes:
+                aba.atualizar_celulas(alteracoes)
+
+            for linha, (_, depois) in finais.items():
+                self._atualizar_snapshot(aba_name, linha, depois)
+            for pedido in aplicados:
+                pedido['ok'] = True
+                logging.info(f"Dados do ID {pedido['row_id']} editados com sucesso na aba '{aba_name}'.")
+            if len(pedidos) > 1 or alteracoes:
+                logging.info(
+                    f"Lote de {len(pedidos)} edição(ões) na aba '{aba_name}': "
+                    f"{len(alteracoes)} faixa(s) de células alterada(s)."
+                )
         except Exception as e:
+            self._invalidar_apos_erro(e, aba_name)
             logging.error(f"Erro ao editar dados na aba '{aba_name}': {e}", exc_info=True)
-            st.error(f"Erro crítico ao tentar editar dados: {e}")
+            for pedido in pedidos:
+                pedido['ok'], pedido['erro'], pedido['transitorio'] = False, str(e), erro_transitorio(e)
+        finally:
+            for pedido in pedidos:
+                pedido['pronto'].set()
+
+    def _grava_adiado(self, aba_name):
+        return GRAVACAO_ADIADA and aba_name in ABAS_GRAVACAO_ADIADA
+
+    def _mensagem_sucesso(self, aba_name):
+        if self._grava_adiado(aba_name) or self._guardado_na_fila:
+            return "Dados registrados! A gravação na planilha será concluída em instantes."
+        return "Dados adicionados com sucesso!"
+
+    def _enfileirar(self, operacao, aba_name, ids, dados):
+        """Registra uma gravação adiada na fila local e acorda a thread de envio."""
+        try:
+            write_queue.enfileirar(aba_name, operacao, ids, dados)
+        except Exception as e:
+            logging.error(f"Erro ao registrar gravação na fila local da aba '{aba_name}': {e}", exc_info=True)
+            return False
+        iniciar_gravacao_adiada()
+        _fila_evento.set()
+        logging.info(f"Operação '{operacao}' na aba '{aba_name}' registrada na fila de gravação.")
+        return True
+
+    def _gravar_item_da_fila(self, item):
+        """
+        Envia à planilha um item da fila de gravação. Retorna False se o item deve
+        ser tentado de novo mais tarde; True se foi gravado ou descartado.
+        """
+        seq, aba_name, erro = item['seq'], item['aba'], None
+        try:
+            if item['operacao'] == 'anexar':
+                if item['status'] == 'enviando' or item['tentativas']:
+                    # O envio anterior pode ter chegado à planilha antes da falha
+                    aba = self._obter_aba(aba_name, criar=True)
+                    if item['ids'][0] in self._indice_ids(aba_name, aba, reconstruir=True):
+                        write_queue.marcar(seq, 'gravado')
+                        return True
+                write_queue.marcar(seq, 'enviando')
+                gravado = self._anexar_linhas(item['dados'], aba_name, ids=item['ids'])
+            else:
+                # Edição: gravação condicional, só se as colunas do 'esperado' não
+                # mudaram desde que ela foi registrada (não é tratada como um
+                # pedido interativo, então nenhum erro aparece na tela)
+                write_queue.marcar(seq, 'enviando')
+                campos = item['dados']['campos']
+                pedido = self._enviar_edicao(aba_name, {
+                    'row_id': item['ids'][0], 'esperado': item['dados']['esperado'], 'campos': campos
+                }, mostrar_erro=False)
+                gravado, erro = pedido['ok'], pedido['erro'] or f"ID {item['ids'][0]} não encontrado"
+                if pedido.get('conflito'):
+                    # Já com os valores novos, o envio anterior chegou à planilha; senão, o
+                    # registro foi alterado depois da edição, que é descartada para não sobrescrevê-lo
+                    gravado = all(pedido['atual'].get(nome) == str(valor) for nome, valor in campos.items())
+                    if not gravado:
+                        write_queue.marcar(seq, 'falhou', "registro alterado na planilha depois da edição", nova_tentativa=True)
+                        logging.error(
+                            f"Edição adiada {seq} do ID {item['ids'][0]} na aba '{aba_name}' descartada: "
+                            f"o registro foi alterado na planilha depois dela."
+                        )
+                        return True
+        except Exception as e:
+            gravado, erro = False, str(e)
+
+        if gravado:
+            write_queue.marcar(seq, 'gravado')
+            return True
+        if item['tentativas'] + 1 >= MAX_TENTATIVAS_GRAVACAO:
+            write_queue.marcar(seq, 'falhou', erro, nova_tentativa=True)
+            logging.error(f"Gravação adiada {seq} na aba '{aba_name}' descartada após {MAX_TENTATIVAS_GRAVACAO} tentativas: {erro}")
+            return True
+        write_queue.marcar(seq, 'pendente', erro, nova_tentativa=True)
+        return False
+
+    def _fila_pendente(self, aba_name):
+        """
+        Indica se a aba ainda tem gravações na fila, caso em que a exclusão é
+        recusada: a fila pode mudar as linhas a excluir e, durante uma
+        indisponibilidade, esperar por ela bloquearia a tela. Acorda a thread de
+        gravação para que a fila esvazie.
+        """
+        if not _fila_em_uso() or not write_queue.em_aberto(aba_name):
             return False
+        iniciar_gravacao_adiada()
+        _fila_evento.set()
+        logging.warning(f"Exclusão na aba '{aba_name}' recusada: há gravações da aba na fila local.")
+        return True
 
     def editar_dados(self, id, updated_data):
         """Função de conveniência para editar dados na aba 'acess'."""
@@ -184,20 +1435,16 @@ class SheetOperations:
         """Exclui uma linha de uma aba específica com base no ID."""
         if not self.credentials or not self.my_archive_google_sheets:
             return False
+        if self._fila_pendente(aba_name):
+            st.warning(AVISO_FILA_PENDENTE)
+            return False
         try:
-            archive = self.credentials.open_by_url(self.my_archive_google_sheets)
-            aba = archive.worksheet_by_title(aba_name)
+            aba = self._obter_aba(aba_name)
             
-            all_values = aba.get_all_values()
-            row_to_delete_index = -1
-            
-            for i, row in enumerate(all_values):
-                if row and str(row[0]) == str(id_to_delete):
-                    row_to_delete_index = i + 1
-                    break
+            row_to_delete_index, _ = self._localizar_linha(aba_name, aba, id_to_delete)
 
-            if row_to_delete_index != -1:
-                aba.delete_rows(row_to_delete_index)
+            if row_to_delete_index is not None:
+                self._excluir_linhas(aba_name, aba, [row_to_delete_index])
                 logging.info(f"Dados do ID {id_to_delete} excluídos com sucesso da aba '{aba_name}'.")
                 return True
             else:
@@ -206,45 +1453,278 @@ class SheetOperations:
                 return False
                 
         except Exception as e:
+            self._invalidar_apos_erro(e, aba_name)
             logging.error(f"Erro ao excluir dados da aba '{aba_name}': {e}", exc_info=True)
             st.error(f"Erro crítico ao tentar excluir dados: {e}")
             return False
 
-    def excluir_dados(self, id_to_delete):
-        """Função de conveniência para excluir dados da aba 'acess'."""
-        return self.excluir_dados_por_id_aba(id_to_delete, 'acess')
+    def excluir_dados(self, id_to_delete, data_str=""):
+        """
+        Exclui um registro de acesso pelo ID. Se o registro já tiver sido
+        arquivado, a exclusão é feita na partição do mês de `data_str`
+        (dd/mm/aaaa), cujo snapshot e cópia em disco são descartados.
+        """
+        aba_name = self._aba_do_registro_acesso(id_to_delete, data_str)
+        if not self.excluir_dados_por_id_aba(id_to_delete, aba_name):
+            return False
+        if aba_name != 'acess':
+            self.invalidar_cache(aba_name)
+            snapshot_cache.descartar(aba_name)
+        return True
+
+    def _aba_do_registro_acesso(self, row_id, data_str):
+        """Partição do mês de `data_str` se o registro estiver arquivado nela; senão 'acess'."""
+        mes = _mes_do_registro(data_str)
+        if mes is None or not self.credentials or not self.my_archive_google_sheets:
+            return 'acess'
+        particao = nome_particao(*mes)
+        try:
+            if particao not in self._abrir_planilha()['backend'].listar_abas():
+                return 'acess'
+        except Exception as e:
+            logging.error(f"Erro ao listar as partições da aba 'acess': {e}")
+            return 'acess'
+        dados = self.carregar_dados_aba(particao) or []
+        row_id = str(row_id).strip()
+        return particao if any(row and row[0] == row_id for row in dados[1:]) else 'acess'
+
+    def excluir_dados_por_ids_aba(self, ids, aba_name):
+        """
+        Exclui várias linhas de uma aba pelos IDs. Resolve todas as linhas com uma
+        única leitura da coluna de IDs e exclui com uma única requisição.
+        Retorna a lista de IDs efetivamente excluídos.
+        """
+        if not self.credentials or not self.my_archive_google_sheets:
+            return []
+        if self._fila_pendente(aba_name):
+            st.warning(AVISO_FILA_PENDENTE)
+            return []
+        try:
+            aba = self._obter_aba(aba_name)
+            
+            indice = self._indice_ids(aba_name, aba, reconstruir=True)
+            linhas_por_id = {}
+            for row_id in ids:
+                row_id = str(row_id).strip()
+                if row_id in indice:
+                    linhas_por_id[row_id] = indice[row_id]
+                else:
+                    logging.error(f"ID {row_id} não encontrado na aba '{aba_name}'.")
+
+            if linhas_por_id:
+                self._excluir_linhas(aba_name, aba, linhas_por_id.values())
+                logging.info(f"{len(linhas_por_id)} registro(s) excluído(s) da aba '{aba_name}'.")
+            return list(linhas_por_id)
+                
+        except Exception as e:
+            self._invalidar_apos_erro(e, aba_name)
+            logging.error(f"Erro ao excluir dados da aba '{aba_name}': {e}", exc_info=True)
+            st.error(f"Erro crítico ao tentar excluir dados: {e}")
+            return []
 
     def excluir_linha_por_valor(self, valor_busca, nome_coluna, nome_aba):
         """Exclui a primeira linha encontrada que corresponde a um valor em uma coluna específica."""
+        return bool(self.excluir_linhas_por_valores([valor_busca], nome_coluna, nome_aba))
+
+    def excluir_linhas_por_valores(self, valores_busca, nome_coluna, nome_aba):
+        """
+        Para cada valor, exclui a primeira linha em que a coluna corresponde a ele.
+        Usa uma única leitura da aba e uma única requisição de exclusão.
+        Retorna a lista de valores cujas linhas foram excluídas.
+        """
         if not self.credentials or not self.my_archive_google_sheets:
-            return False
+            return []
+        if self._fila_pendente(nome_aba):
+            st.warning(AVISO_FILA_PENDENTE)
+            return []
         try:
-            archive = self.credentials.open_by_url(self.my_archive_google_sheets)
-            aba = archive.worksheet_by_title(nome_aba)
+            aba = self._obter_aba(nome_aba)
             
-            all_data = aba.get_all_values()
-            if not all_data: return False
+            all_data = aba.ler_tudo()
+            if not all_data: return []
 
             header = all_data[0]
             try:
                 col_index = header.index(nome_coluna)
             except ValueError:
                 logging.error(f"Coluna '{nome_coluna}' não encontrada na aba '{nome_aba}'.")
-                return False
+                return []
 
-            row_to_delete_index = -1
+            pendentes = {str(valor) for valor in valores_busca}
+            linhas_por_valor = {}
             for i, row in enumerate(all_data[1:]):
-                if row and len(row) > col_index and str(row[col_index]) == str(valor_busca):
-                    row_to_delete_index = i + 2 
-                    break
+                if row and len(row) > col_index and str(row[col_index]) in pendentes:
+                    linhas_por_valor[str(row[col_index])] = i + 2
+                    pendentes.discard(str(row[col_index]))
+                    if not pendentes:
+                        break
             
-            if row_to_delete_index != -1:
-                aba.delete_rows(row_to_delete_index)
-                logging.info(f"Linha com valor '{valor_busca}' na coluna '{nome_coluna}' excluída de '{nome_aba}'.")
+            for valor in pendentes:
+                logging.warning(f"Nenhum valor '{valor}' encontrado para exclusão em '{nome_aba}'.")
+
+            if linhas_por_valor:
+                self._excluir_linhas(nome_aba, aba, linhas_por_valor.values())
+                logging.info(f"{len(linhas_por_valor)} linha(s) excluída(s) de '{nome_aba}' pela coluna '{nome_coluna}'.")
+            return list(linhas_por_valor)
+        except Exception as e:
+            self._invalidar_apos_erro(e, nome_aba)
+            logging.error(f"Erro ao excluir linha por valor: {e}", exc_info=True)
+            return []
+
+    def _excluir_linhas(self, aba_name, aba, linhas):
+        """
+        Exclui várias linhas com uma única requisição e mantém o índice de IDs
+        e o snapshot em memória coerentes com a aba.
+        """
+        linhas = sorted(set(linhas), reverse=True)
+        aba.excluir_linhas(linhas)
+        for linha in linhas:
+            self._remover_linha_do_indice(aba_name, linha)
+        self._remover_linhas_do_snapshot(aba_name, linhas)
+
+    def arquivar_meses_anteriores(self, hoje=None):
+        """
+        Move os registros encerrados de meses anteriores da aba 'acess' para as
+        partições 'acess_AAAA_MM'. Registros em aberto (pessoa ainda na unidade ou
+        aguardando aprovação) ficam na aba 'acess' até serem encerrados.
+        Pode ser repetido após uma falha: IDs já presentes na partição não são
+        copiados de novo. Retorna True em caso de sucesso, False em caso de falha.
+        """
+        if not self.credentials or not self.my_archive_google_sheets:
+            return False
+        hoje = hoje or get_sao_paulo_time()
+        mes_atual = (hoje.year, hoje.month)
+        try:
+            aba = self._obter_aba('acess')
+            # Decide pela cópia em cache; só relê a aba se houver o que arquivar
+            if not self._selecionar_para_arquivo(self._carregar_com_cache('acess', aba), mes_atual):
                 return True
-            else:
-                logging.warning(f"Nenhum valor '{valor_busca}' encontrado para exclusão em '{nome_aba}'.")
+
+            if self._fila_pendente('acess'):
+                # Tentado de novo na próxima passagem do sincronizador
                 return False
+            brutas = aba.ler_tudo()
+            grupos = self._selecionar_para_arquivo(brutas, mes_atual)
+            if not grupos:
+                return True
+
+            backend = self._abrir_planilha()['backend']
+            header = brutas[0]
+            for (ano, mes), linhas in sorted(grupos.items()):
+                nome = nome_particao(ano, mes)
+                particao = backend.aba(nome, criar=True, cabecalho=header)
+                existentes = {str(valor).strip() for valor in particao.ler_coluna(1)}
+                novas = [row for row in linhas if str(row[0]).strip() not in existentes]
+                if novas:
+                    particao.anexar(_com_id_texto(novas))
+                self.invalidar_cache(nome)
+                snapshot_cache.descartar(nome)
+                logging.info(f"{len(novas)} registro(s) de {mes:02d}/{ano} arquivado(s) na aba '{nome}'.")
+
+            arquivados = {str(row[0]).strip() for linhas in grupos.values() for row in linhas}
+            indice = self._indice_ids('acess', aba, reconstruir=True)
+            self._excluir_linhas('acess', aba, [indice[row_id] for row_id in arquivados if row_id in indice])
+            logging.info(f"{len(arquivados)} registro(s) de meses anteriores removido(s) da aba 'acess'.")
+            return True
         except Exception as e:
-            logging.error(f"Erro ao excluir linha por valor: {e}", exc_info=True)
-            return False
\ No newline at end of file
+            self._invalidar_apos_erro(e, 'acess')
+            logging.error(f"Erro ao arquivar os registros de meses anteriores: {e}", exc_info=True)
+            return False
+
+    @staticmethod
+    def _selecionar_para_arquivo(dados, mes_atual):
+        """Agrupa por (ano, mês) as linhas encerradas de meses anteriores a `mes_atual`."""
+        if not dados or len(dados) < 2:
+            return {}
+        header = dados[0]
+        try:
+            i_data, i_saida, i_status = (header.index(nome) for nome in ("Data", "Horário de Saída", "Status da Entrada"))
+        except ValueError:
+            logging.error("Aba 'acess' sem as colunas necessárias para o arquivamento.")
+            return {}
+
+        def valor(row, i):
+            return str(row[i]).strip() if i < len(row) else ""
+
+        grupos = {}
+        for row in dados[1:]:
+            if not row or not valor(row, 0):
+                continue
+            mes = _mes_do_registro(valor(row, i_data))
+            status = valor(row, i_status)
+            if mes is None or mes >= mes_atual or status in STATUS_EM_ABERTO:
+                continue
+            if status == "Autorizado" and not valor(row, i_saida):
+                continue
+            grupos.setdefault(mes, []).append(row)
+        return grupos
+
+    def abas_de_logs(self):
+        """
+        Abas com entradas de log, da mais recente para a mais antiga: as mensais
+        'logs_AAAA_MM' e, por último, a antiga aba única 'logs', se existir.
+        """
+        if not self.credentials or not self.my_archive_google_sheets:
+            return []
+        try:
+            existentes = self._abrir_planilha()['backend'].listar_abas()
+        except Exception as e:
+            self._invalidar_apos_erro(e)
+            logging.error(f"Erro ao listar as abas de logs: {e}")
+            return []
+        mensais = sorted((nome for nome in existentes if mes_da_aba_logs(nome)), reverse=True)
+        return mensais + ([ABA_LOGS_LEGADA] if ABA_LOGS_LEGADA in existentes else [])
+
+    def virar_mes_logs(self, hoje=None):
+        """
+        Cria (se ainda não existirem) as abas de logs do mês corrente e do
+        seguinte, para que a primeira gravação do mês não precise criá-las, e
+        move as entradas da antiga aba única 'logs' para as abas mensais. Um mês
+        só é movido se sua aba mensal ainda não existir (ou se já contiver as
+        entradas, quando uma execução anterior foi interrompida), para que cada
+        aba mensal continue em ordem cronológica; as entradas restantes continuam
+        na aba 'logs', lida por último. Retorna True em caso de sucesso, False em caso de falha.
+        """
+        if not self.credentials or not self.my_archive_google_sheets:
+            return False
+        hoje = hoje or get_sao_paulo_time()
+        indice = hoje.year * 12 + hoje.month - 1
+        try:
+            backend = self._abrir_planilha()['backend']
+            existentes = set(backend.listar_abas())
+            for i in (indice, indice + 1):
+                nome = nome_aba_logs(i // 12, i % 12 + 1)
+                if nome not in existentes:
+                    self._obter_aba(nome, criar=True)
+                    logging.info(f"Aba de logs '{nome}' criada.")
+            if ABA_LOGS_LEGADA not in existentes:
+                return True
+
+            legada = self._obter_aba(ABA_LOGS_LEGADA)
+            brutas = legada.ler_tudo()
+            grupos = {}
+            for numero, row in enumerate(brutas[1:], start=2):
+                mes = mes_do_log(row[0]) if row else None
+                if mes is not None:
+                    grupos.setdefault(mes, []).append((numero, row))
+
+            movidas = []
+            for (ano, mes), linhas in sorted(grupos.items()):
+                nome = nome_aba_logs(ano, mes)
+                valores = [list(row) for _, row in linhas]
+                if nome not in existentes:
+                    self._obter_aba(nome, criar=True).anexar(valores)
+                else:
+                    # Só remove da aba antiga as entradas que já estão na aba mensal
+                    presentes = {tuple(row) for row in self._obter_aba(nome).ler_tudo()[1:]}
+                    linhas = [(numero, row) for numero, row in linhas if tuple(row) in presentes]
+                movidas.extend(numero for numero, _ in linhas)
+                if linhas:
+                    logging.info(f"{len(linhas)} entrada(s) de log de {mes:02d}/{ano} movida(s) para a aba '{nome}'.")
+            if movidas:
+                self._excluir_linhas(ABA_LOGS_LEGADA, legada, movidas)
+            return True
+        except Exception as e:
+            self._invalidar_apos_erro(e, ABA_LOGS_LEGADA)
+            logging.error(f"Erro na virada mensal das abas de logs: {e}", exc_info=True)
+            return False
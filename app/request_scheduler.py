@@ -0,0 +1,162 @@
+import os
+import time
+import heapq
+import random
+import socket
+import logging
+import itertools
+import threading
+import httplib2
+from contextlib import contextmanager
+from googleapiclient.errors import HttpError
+
+# Agendador central das chamadas à API do Google Sheets.
+#
+# Todas as requisições de um cliente pygsheets passam por um balde de fichas
+# (token bucket) dimensionado pela cota por minuto. Quando não há ficha, as
+# chamadas esperam em fila por prioridade: gravações interativas antes da
+# gravação de logs, e esta antes das recargas em segundo plano. Erros 429 e
+# 5xx (e falhas transitórias de rede) são repetidos com espera exponencial
+# com jitter, em vez de chegarem à interface como "Falha ao adicionar dados".
+# Gravações (values.append, batchUpdate...) só são repetidas após 429, que
+# garante que a requisição não foi aplicada: após um 5xx ou uma queda de rede
+# ela pode ter sido aplicada e só a resposta se perdeu, e repeti-la duplicaria
+# linhas anexadas ou excluiria as linhas que se deslocaram para os mesmos índices.
+
+PRIORIDADE_INTERATIVA = 0
+PRIORIDADE_LOG = 1
+PRIORIDADE_SEGUNDO_PLANO = 2
+
+COTA_POR_MINUTO = int(os.getenv('SHEETS_QUOTA_PER_MINUTE', '60'))
+MAX_TENTATIVAS = 5
+ESPERA_BASE_SEGUNDOS = 1.0
+ESPERA_MAXIMA_SEGUNDOS = 32.0
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+STATUS_COTA = 429
+# Falhas de rede (inclusive sem DNS, quando a máquina está fora da rede)
+ERROS_DE_REDE = (ConnectionError, socket.timeout, TimeoutError, socket.gaierror, httplib2.ServerNotFoundError)
+
+_contexto = threading.local()
+
+
+@contextmanager
+def prioridade(nivel):
+    """Define a prioridade das chamadas à API feitas pela thread atual dentro do bloco."""
+    anterior = getattr(_contexto, 'prioridade', PRIORIDADE_INTERATIVA)
+    _contexto.prioridade = nivel
+    try:
+        yield
+    finally:
+        _contexto.prioridade = anterior
+
+
+def prioridade_atual():
+    """Prioridade das chamadas feitas pela thread atual (interativa por padrão)."""
+    return getattr(_contexto, 'prioridade', PRIORIDADE_INTERATIVA)
+
+
+def _espera_sugerida(erro, tentativa):
+    """Tempo de espera antes da próxima tentativa: Retry-After, se houver, ou exponencial com jitter."""
+    if isinstance(erro, HttpError):
+        retry_after = erro.resp.get('retry-after')
+        if retry_after and str(retry_after).isdigit():
+            return float(retry_after)
+    return random.uniform(0, min(ESPERA_MAXIMA_SEGUNDOS, ESPERA_BASE_SEGUNDOS * 2 ** tentativa))
+
+
+def _status_http(erro):
+    """Status HTTP de um HttpError, ou None."""
+    if not isinstance(erro, HttpError):
+        return None
+    try:
+        return int(erro.resp.status)
+    except (TypeError, ValueError):
+        return None
+
+
+def erro_transitorio(erro):
+    """Indica se o erro é transitório (cota excedida, erro do servidor ou de rede)."""
+    if isinstance(erro, HttpError):
+        return _status_http(erro) in STATUS_REPETIVEIS
+    return isinstance(erro, ERROS_DE_REDE)
+
+
+def _repetivel(erro, leitura=True):
+    """
+    Indica se a requisição pode ser repetida após o erro: leituras, em qualquer
+    erro transitório; gravações, só com a cota excedida, quando com certeza não
+    foram aplicadas.
+    """
+    return erro_transitorio(erro) if leitura else _status_http(erro) == STATUS_COTA
+
+
+def _e_leitura(request):
+    """Requisições GET (values.get, values.batchGet, spreadsheets.get) só leem."""
+    return str(getattr(request, 'method', '')).upper() == 'GET'
+
+
+class AgendadorRequisicoes:
+    """Balde de fichas com fila por prioridade e repetição com espera exponencial."""
+
+    def __init__(self, cota_por_minuto=COTA_POR_MINUTO):
+        self.capacidade = max(1, cota_por_minuto)
+        self.taxa = self.capacidade / 60.0  # fichas por segundo
+        self.fichas = float(self.capacidade)
+        self.atualizado_em = time.monotonic()
+        self._fila = []
+        self._sequencia = itertools.count()
+        self._condicao = threading.Condition()
+
+    def _reabastecer(self):
+        agora = time.monotonic()
+        self.fichas = min(self.capacidade, self.fichas + (agora - self.atualizado_em) * self.taxa)
+        self.atualizado_em = agora
+
+    def _adquirir(self, nivel):
+        """Bloqueia até haver uma ficha e nenhuma chamada de prioridade maior (ou mais antiga) na fila."""
+        senha = (nivel, next(self._sequencia))
+        with self._condicao:
+            heapq.heappush(self._fila, senha)
+            while True:
+                self._reabastecer()
+                if self._fila[0] == senha and self.fichas >= 1:
+                    heapq.heappop(self._fila)
+                    self.fichas -= 1
+                    self._condicao.notify_all()
+                    return
+                espera = (1 - self.fichas) / self.taxa if self._fila[0] == senha else None
+                self._condicao.wait(espera)
+
+    def executar(self, funcao, *args, leitura=True, **kwargs):
+        """
+        Executa `funcao` respeitando a cota e repetindo em caso de erro
+        transitório; com `leitura` False (gravação), só se a cota foi excedida.
+        """
+        nivel = prioridade_atual()
+        for tentativa in range(MAX_TENTATIVAS):
+            self._adquirir(nivel)
+            try:
+                return funcao(*args, **kwargs)
+            except Exception as e:
+                if not _repetivel(e, leitura) or tentativa == MAX_TENTATIVAS - 1:
+                    raise
+                espera = _espera_sugerida(e, tentativa)
+                logging.warning(
+                    f"Erro transitório na API do Google Sheets ({e}); "
+                    f"nova tentativa {tentativa + 2}/{MAX_TENTATIVAS} em {espera:.1f}s."
+                )
+                time.sleep(espera)
+
+
+def instalar_agendador(client, cota_por_minuto=COTA_POR_MINUTO):
+    """
+    Faz todas as requisições à API de planilhas do cliente pygsheets passarem
+    por um agendador próprio (a cota é por conta de serviço). Retorna o agendador.
+    """
+    agendador = AgendadorRequisicoes(cota_por_minuto)
+    executar_original = client.sheet._execute_requests
+    client.sheet._execute_requests = lambda request: agendador.executar(
+        executar_original, request, leitura=_e_leitura(request)
+    )
+    client.agendador = agendador
+    return agendador
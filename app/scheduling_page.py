@@ -1,7 +1,7 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 from app.operations import SheetOperations
+from app.schemas import para_dataframe
 from auth.auth_utils import get_user_display_name
 from app.utils import get_sao_paulo_time, format_cpf, validate_cpf
 from app.logger import log_action
@@ -81,9 +81,7 @@ def scheduling_page():
         st.info("Nenhum agendamento encontrado para exibir.")
         return
 
-    df_schedules = pd.DataFrame(schedules_data[1:], columns=schedules_data[0])
-    
-    df_schedules['ScheduledDate_dt'] = pd.to_datetime(df_schedules['ScheduledDate'], format='%d/%m/%Y', errors='coerce')
+    df_schedules = para_dataframe(schedules_data, 'schedules')
   
     df_schedules.dropna(subset=['ScheduledDate_dt'], inplace=True)
 
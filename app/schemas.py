@@ -0,0 +1,100 @@
+import pandas as pd
+
+# Esquema de cada aba da planilha: colunas, na ordem do cabeçalho, e seus tipos.
+# A planilha guarda tudo como texto; para_dataframe converte uma única vez, ao
+# carregar, mantendo as colunas originais (exibidas e gravadas como estão) e
+# acrescentando as versões tipadas:
+#   DATA / DATA_HORA -> '<coluna>_dt' (datetime; NaT se vazia ou inválida)
+#   HORA             -> '<coluna>_min' (minutos desde 00:00, Int64; <NA> se vazia)
+#   CATEGORIA        -> a própria coluna vira 'category' (valores repetidos)
+TEXTO = 'texto'
+CATEGORIA = 'categoria'
+DATA = 'data'
+HORA = 'hora'
+DATA_HORA = 'data_hora'
+
+FORMATOS_DATA = {
+    DATA: '%d/%m/%Y',
+    DATA_HORA: '%Y-%m-%d %H:%M:%S',
+}
+
+_PADRAO_HORA = r'^\s*(\d{1,2}):(\d{2})'
+
+ESQUEMAS_ABAS = {
+    'blocklist': (
+        ("ID", TEXTO), ("Type", CATEGORIA), ("Value", TEXTO), ("Reason", TEXTO),
+        ("BlockedBy", TEXTO), ("Timestamp", DATA_HORA),
+    ),
+    'acess': (
+        ("ID", TEXTO), ("Nome", TEXTO), ("CPF", TEXTO), ("Placa", TEXTO),
+        ("Marca do Carro", TEXTO), ("Horário de Entrada", HORA), ("Horário de Saída", HORA),
+        ("Data", DATA), ("Empresa", CATEGORIA), ("Status da Entrada", CATEGORIA),
+        ("Motivo do Bloqueio", TEXTO), ("Aprovador", CATEGORIA), ("Data do Primeiro Registro", DATA),
+    ),
+    'logs': (
+        ("Timestamp", DATA_HORA), ("User", TEXTO), ("Action", CATEGORIA), ("Details", TEXTO),
+    ),
+    'schedules': (
+        ("ID", TEXTO), ("VisitorName", TEXTO), ("VisitorCPF", TEXTO), ("Company", TEXTO),
+        ("ScheduledDate", DATA), ("ScheduledTime", HORA), ("AuthorizedBy", TEXTO),
+        ("Status", CATEGORIA), ("CheckInTime", HORA),
+    ),
+    'access_requests': (
+        ("ID", TEXTO), ("user_email", TEXTO), ("user_name", TEXTO), ("desired_role", TEXTO),
+        ("department", TEXTO), ("justification", TEXTO), ("manager_email", TEXTO),
+        ("request_date", TEXTO), ("status", CATEGORIA), ("reviewed_by", TEXTO),
+    ),
+    'materials': (
+        ("ID", TEXTO), ("Item", TEXTO), ("Quantidade", TEXTO), ("Destino", TEXTO),
+        ("Responsável pela Saída", TEXTO),
+    ),
+}
+
+
+def esquema(aba_name):
+    """
+    Esquema da aba; as abas mensais (acess_AAAA_MM, logs_AAAA_MM) usam o da
+    aba 'acess' ou 'logs'.
+    """
+    if aba_name not in ESQUEMAS_ABAS:
+        aba_name = next((base for base in ('acess', 'logs') if aba_name.startswith(base + '_')), aba_name)
+    return ESQUEMAS_ABAS.get(aba_name, ())
+
+
+def cabecalho(aba_name):
+    """Cabeçalho da aba segundo o esquema, ou None se a aba não tiver esquema."""
+    colunas = [coluna for coluna, _ in esquema(aba_name)]
+    return colunas or None
+
+
+def com_tipos(df, aba_name):
+    """
+    Acrescenta ao DataFrame da aba as colunas tipadas do esquema que ainda não
+    existirem (pode ser chamada de novo sobre um DataFrame já convertido).
+    Colunas ausentes no DataFrame são ignoradas. Altera e retorna o próprio df.
+    """
+    for coluna, tipo in esquema(aba_name):
+        if coluna not in df.columns:
+            continue
+        if tipo in FORMATOS_DATA and f"{coluna}_dt" not in df.columns:
+            df[f"{coluna}_dt"] = pd.to_datetime(df[coluna], format=FORMATOS_DATA[tipo], errors='coerce')
+        elif tipo == HORA and f"{coluna}_min" not in df.columns:
+            partes = df[coluna].astype(str).str.extract(_PADRAO_HORA).apply(pd.to_numeric)
+            df[f"{coluna}_min"] = (partes[0] * 60 + partes[1]).astype('Int64')
+        elif tipo == CATEGORIA and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            # "" entre as categorias para que fillna("") continue funcionando
+            valores = df[coluna].fillna("").astype(str)
+            df[coluna] = pd.Categorical(valores, categories=sorted(set(valores) | {""}))
+    return df
+
+
+def para_dataframe(dados, aba_name):
+    """
+    Converte o retorno de carregar_dados_aba (cabeçalho + linhas) em um
+    DataFrame tipado segundo o esquema da aba. Retorna um DataFrame vazio se
+    não houver dados.
+    """
+    if not dados:
+        return pd.DataFrame()
+    df = pd.DataFrame(dados[1:], columns=dados[0]).fillna("")
+    return com_tipos(df, aba_name)
@@ -1,8 +1,101 @@
 import re
+import time
+import atexit
+import threading
 import streamlit as st
 from datetime import datetime, timedelta
 from app.utils import get_sao_paulo_time
-from app.logger import log_action
+from app.logger import log_action, registrar_log
+from auth.auth_utils import get_user_display_name, is_user_logged_in
+
+# Alertas de segurança agregados: o primeiro alerta de uma sessão para um mesmo
+# campo e tipo vai para o log na hora; os repetidos nos
+# JANELA_ALERTAS_SEGUNDOS seguintes só são contados e viram uma única entrada
+# ao fim da janela (com a contagem e o último detalhe). Assim, um texto colado
+# repetidas vezes gera poucas entradas em vez de uma por tentativa. O envio à
+# planilha é feito em lote pelo app.logger, fora da validação.
+JANELA_ALERTAS_SEGUNDOS = 300
+INTERVALO_VERIFICACAO_ALERTAS_SEGUNDOS = 10
+
+# (sessão, campo, tipo) -> {'usuario', 'inicio', 'repeticoes', 'detalhes'}
+_janelas_alertas = {}
+_alertas_lock = threading.Lock()
+_verificador_alertas = None
+
+
+def registrar_alerta_seguranca(campo, tipo, detalhes):
+    """
+    Registra um SECURITY_ALERT agregado por sessão, campo e tipo (ex.: 'SQL
+    Injection', 'XSS'). Não acessa a planilha.
+    """
+    if not is_user_logged_in():
+        return
+    try:
+        usuario = get_user_display_name()
+        sessao = st.session_state.get('session_id') or usuario
+        chave = (sessao, campo, tipo)
+        agora = time.time()
+        with _alertas_lock:
+            encerradas = _encerrar_janelas(agora)
+            janela = _janelas_alertas.get(chave)
+            if janela is not None:
+                janela['repeticoes'] += 1
+                janela['detalhes'] = detalhes
+            else:
+                _janelas_alertas[chave] = {'usuario': usuario, 'inicio': agora, 'repeticoes': 0, 'detalhes': detalhes}
+        _registrar_resumos(encerradas)
+        if janela is None:
+            log_action("SECURITY_ALERT", detalhes)
+        _iniciar_verificador_alertas()
+    except Exception as e:
+        print(f"CRITICAL LOGGING ERROR: Falha ao registrar o alerta de segurança. Erro: {e}")
+
+
+def _encerrar_janelas(agora, todas=False):
+    """Remove (chamada com _alertas_lock adquirido) e retorna as janelas vencidas com repetições."""
+    vencidas = [chave for chave, janela in _janelas_alertas.items()
+                if todas or agora - janela['inicio'] >= JANELA_ALERTAS_SEGUNDOS]
+    encerradas = [_janelas_alertas.pop(chave) for chave in vencidas]
+    return [janela for janela in encerradas if janela['repeticoes']]
+
+
+def _registrar_resumos(janelas):
+    for janela in janelas:
+        registrar_log(
+            janela['usuario'], "SECURITY_ALERT",
+            f"Repeated {janela['repeticoes']} more time(s) in {JANELA_ALERTAS_SEGUNDOS}s; last: {janela['detalhes']}"
+        )
+
+
+def descarregar_alertas(todas=False):
+    """Registra o resumo das janelas de alertas vencidas (ou de todas, ao encerrar o processo)."""
+    with _alertas_lock:
+        encerradas = _encerrar_janelas(time.time(), todas)
+    _registrar_resumos(encerradas)
+
+
+def _iniciar_verificador_alertas():
+    """Inicia (uma vez por processo) a thread que encerra as janelas vencidas."""
+    global _verificador_alertas
+    with _alertas_lock:
+        if _verificador_alertas is not None and _verificador_alertas.is_alive():
+            return
+        primeira_vez = _verificador_alertas is None
+        _verificador_alertas = threading.Thread(target=_laco_verificador_alertas, name='verificador-alertas', daemon=True)
+        _verificador_alertas.start()
+    if primeira_vez:
+        # Registrado depois do envio de logs, então roda antes dele ao encerrar
+        atexit.register(descarregar_alertas, True)
+
+
+def _laco_verificador_alertas():
+    while True:
+        time.sleep(INTERVALO_VERIFICACAO_ALERTAS_SEGUNDOS)
+        try:
+            descarregar_alertas()
+        except Exception as e:
+            print(f"CRITICAL LOGGING ERROR: Falha ao registrar o resumo dos alertas de segurança. Erro: {e}")
+
 
 class SecurityValidator:
     """Classe para validações de segurança do sistema"""
@@ -49,16 +142,18 @@ class SecurityValidator:
         
         # Verifica SQL Injection
         text_upper = text.upper()
-        for keyword in SecurityValidator.SQL_KEYWORDS:
-            if keyword in text_upper:
-                errors.append(f"Palavra não permitida detectada em {field_name}: '{keyword}'")
-                log_action("SECURITY_ALERT", f"SQL Injection attempt detected in {field_name}: {original_text}")
+        sql_found = [keyword for keyword in SecurityValidator.SQL_KEYWORDS if keyword in text_upper]
+        for keyword in sql_found:
+            errors.append(f"Palavra não permitida detectada em {field_name}: '{keyword}'")
+        if sql_found:
+            registrar_alerta_seguranca(field_name, "SQL Injection", f"SQL Injection attempt detected in {field_name} ({', '.join(sql_found)}): {original_text}")
         
         # Verifica XSS
-        for pattern in SecurityValidator.XSS_PATTERNS:
-            if re.search(pattern, text, re.IGNORECASE):
-                errors.append(f"Padrão suspeito detectado em {field_name}")
-                log_action("SECURITY_ALERT", f"XSS attempt detected in {field_name}: {original_text}")
+        xss_found = [pattern for pattern in SecurityValidator.XSS_PATTERNS if re.search(pattern, text, re.IGNORECASE)]
+        for pattern in xss_found:
+            errors.append(f"Padrão suspeito detectado em {field_name}")
+        if xss_found:
+            registrar_alerta_seguranca(field_name, "XSS", f"XSS attempt detected in {field_name} ({len(xss_found)} pattern(s)): {original_text}")
         
         # Verifica caracteres perigosos
         dangerous_found = [char for char in SecurityValidator.DANGEROUS_CHARS if char in text]
@@ -240,7 +335,7 @@ class RateLimiter:
         # Verifica se excedeu o limite
         if len(rate_data['attempts']) >= max_attempts:
             rate_data['blocked_until'] = now + timedelta(seconds=time_window * 2)
-            log_action("SECURITY_ALERT", f"Rate limit exceeded for {user_id} on action {action}")
+            registrar_alerta_seguranca(action, "Rate limit", f"Rate limit exceeded for {user_id} on action {action}")
             return False, 0, time_window * 2
         
         # Registra nova tentativa
@@ -3,10 +3,78 @@ import pandas as pd
 import pygsheets
 import os
 import json
+import hashlib
 import logging
+import threading
+from google.oauth2 import service_account
+from google.auth.transport.requests import Request
+from app.request_scheduler import instalar_agendador
 
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 
+SCOPES = (
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive',
+)
+
+# Pool de clientes autorizados, compartilhado por todo o processo.
+# Um cliente por conjunto de credenciais; a chave é um hash das credenciais.
+_client_pool = {}
+_pool_lock = threading.Lock()
+
+
+def _credentials_key(raw):
+    """Gera uma chave estável para identificar um conjunto de credenciais."""
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _refresh_if_needed(client):
+    """Renova o token do cliente de forma centralizada, se estiver expirado."""
+    credentials = client.oauth
+    if credentials.valid:
+        return
+    with _pool_lock:
+        # Outra thread pode ter renovado enquanto esperávamos o lock
+        if not credentials.valid:
+            logging.info("Renovando token de acesso do Google Sheets...")
+            credentials.refresh(Request())
+
+
+def get_pooled_client(service_account_info=None, service_file=None):
+    """
+    Retorna o cliente pygsheets do pool para o conjunto de credenciais informado,
+    autorizando apenas na primeira vez. Seguro para uso entre threads (sessões).
+    """
+    if service_account_info is not None:
+        raw = json.dumps(service_account_info, sort_keys=True)
+    else:
+        raw = f"{service_file}:{os.path.getmtime(service_file)}"
+    key = _credentials_key(raw)
+
+    client = _client_pool.get(key)
+    if client is None:
+        with _pool_lock:
+            client = _client_pool.get(key)
+            if client is None:
+                if service_account_info is not None:
+                    credentials = service_account.Credentials.from_service_account_info(
+                        service_account_info, scopes=SCOPES
+                    )
+                else:
+                    credentials = service_account.Credentials.from_service_account_file(
+                        service_file, scopes=SCOPES
+                    )
+                # Repetições e esperas por cota ficam a cargo do agendador
+                # (em vez da pausa fixa de 100s do pygsheets ao receber 429)
+                client = pygsheets.authorize(custom_credentials=credentials, check=False, retries=0)
+                instalar_agendador(client)
+                _client_pool[key] = client
+                logging.info("Novo cliente do Google Sheets autorizado e adicionado ao pool.")
+
+    _refresh_if_needed(client)
+    return client
+
+
 def connect_sheet():
     try:
         logging.info("Tentando conectar ao Google Sheets...")
@@ -14,25 +82,22 @@ def connect_sheet():
         if "connections" in st.secrets and "gsheets" in st.secrets["connections"]:
             service_account_info = dict(st.secrets["connections"]["gsheets"])
             spreadsheet_url = service_account_info.pop("spreadsheet")
-            
-            json_credentials = json.dumps(service_account_info)
-            os.environ["GCP_SERVICE_ACCOUNT"] = json_credentials
-            
-            credentials = pygsheets.authorize(service_account_env_var="GCP_SERVICE_ACCOUNT")
+
+            credentials = get_pooled_client(service_account_info=service_account_info)
         else:
             # Fallback local
             credentials_path = os.path.join(os.path.dirname(__file__), 'credentials', 'cred.json')
-            
+
             if not os.path.exists(credentials_path):
                 logging.error(f"Arquivo de credenciais não encontrado em: {credentials_path}")
                 st.error("Credenciais do Google Sheets não configuradas. Configure o arquivo secrets.toml ou cred.json.")
                 return None, None
-            
-            credentials = pygsheets.authorize(service_file=credentials_path)
-            
+
+            credentials = get_pooled_client(service_file=credentials_path)
+
             # Use variável de ambiente ou configuração local
             spreadsheet_url = os.getenv('SPREADSHEET_URL', st.secrets.get('spreadsheet_url', ''))
-            
+
             if not spreadsheet_url:
                 logging.error("URL da planilha não configurada.")
                 st.error("URL da planilha não foi configurada. Adicione SPREADSHEET_URL nas variáveis de ambiente ou no secrets.toml")
@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+import logging
+from urllib.parse import quote
+
+# pyarrow é dependência do streamlit; sem ele o cache em disco fica desativado.
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+# Cache colunar em disco (Feather/Arrow) dos snapshots das abas. Ao reiniciar o
+# processo, as abas são carregadas daqui em milissegundos e conferidas com a
+# planilha em segundo plano (ver SheetOperations._semear_do_disco). Cada arquivo
+# guarda nos metadados o cabeçalho, as colunas da planilha mantidas, o instante
+# da leitura e a versão (assinatura do conteúdo), usada para não regravar um
+# arquivo que não mudou.
+DIRETORIO_SNAPSHOTS = os.getenv(
+    'ACCESS_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(__file__), 'cache', 'snapshots')
+)
+
+# Arquivos gravados com outro formato são ignorados.
+VERSAO_FORMATO = '1'
+
+
+def disponivel():
+    return pa is not None
+
+
+def _caminho(aba_name):
+    return os.path.join(DIRETORIO_SNAPSHOTS, quote(aba_name, safe='') + '.feather')
+
+
+def assinatura(dados):
+    """Assinatura estável (entre processos) do conteúdo de uma aba."""
+    return hashlib.sha1(json.dumps(dados, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _metadados(aba_name):
+    """Metadados do arquivo da aba (lidos só do rodapé), ou None."""
+    caminho = _caminho(aba_name)
+    if pa is None or not os.path.exists(caminho):
+        return None
+    with pa.memory_map(caminho) as origem:
+        metadados = pa.ipc.open_file(origem).schema.metadata or {}
+    metadados = {chave.decode(): valor.decode() for chave, valor in metadados.items()}
+    return metadados if metadados.get('formato') == VERSAO_FORMATO else None
+
+
+def versao(aba_name):
+    """Versão (assinatura do conteúdo) gravada para a aba, ou None."""
+    try:
+        metadados = _metadados(aba_name)
+    except (OSError, pa.ArrowException) as e:
+        logging.error(f"Erro ao ler o snapshot em disco da aba '{aba_name}': {e}")
+        return None
+    return metadados['versao'] if metadados else None
+
+
+def salvar(aba_name, dados, colunas_planilha, carregado_em, versao_dados=None):
+    """
+    Grava o snapshot da aba (cabeçalho + linhas, como em carregar_dados_aba).
+    As colunas são posicionais (c0, c1, ...); o cabeçalho vai nos metadados.
+    Retorna True em caso de sucesso, False em caso de falha.
+    """
+    if pa is None or not dados:
+        return False
+    header = dados[0]
+    tabela = pa.table({
+        f"c{i}": pa.array([row[i] if i < len(row) else "" for row in dados[1:]], type=pa.string())
+        for i in range(len(header))
+    })
+    tabela = tabela.replace_schema_metadata({
+        'formato': VERSAO_FORMATO,
+        'versao': versao_dados or assinatura(dados),
+        'cabecalho': json.dumps(header, ensure_ascii=False),
+        'colunas': json.dumps(colunas_planilha),
+        'carregado_em': repr(carregado_em),
+    })
+    caminho = _caminho(aba_name)
+    temporario = caminho + '.tmp'
+    try:
+        os.makedirs(DIRETORIO_SNAPSHOTS, exist_ok=True)
+        feather.write_feather(tabela, temporario, compression='uncompressed')
+        os.replace(temporario, caminho)
+        return True
+    except (OSError, pa.ArrowException) as e:
+        logging.error(f"Erro ao gravar o snapshot em disco da aba '{aba_name}': {e}")
+        return False
+
+
+def carregar(aba_name):
+    """
+    Retorna (dados, colunas_planilha, carregado_em) do snapshot em disco da aba,
+    ou (None, None, None) se não houver um arquivo válido.
+    """
+    try:
+        metadados = _metadados(aba_name)
+        if metadados is None:
+            return None, None, None
+        tabela = feather.read_table(_caminho(aba_name), memory_map=True)
+        colunas = [coluna.to_pylist() for coluna in tabela.columns]
+        dados = [json.loads(metadados['cabecalho'])] + [list(row) for row in zip(*colunas)]
+        return dados, json.loads(metadados['colunas']), float(metadados['carregado_em'])
+    except (OSError, ValueError, KeyError, pa.ArrowException) as e:
+        logging.error(f"Erro ao ler o snapshot em disco da aba '{aba_name}': {e}")
+        return None, None, None
+
+
+def descartar(aba_name):
+    """Remove o snapshot em disco da aba, se houver."""
+    try:
+        os.remove(_caminho(aba_name))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.error(f"Erro ao remover o snapshot em disco da aba '{aba_name}': {e}")
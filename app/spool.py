@@ -0,0 +1,140 @@
+import os
+import json
+import logging
+import threading
+
+# Spool local, somente de anexação, para o que não pôde ser enviado à planilha
+# (ex.: entradas de log durante uma queda do Google Sheets ou falta de cota).
+# Cada spool é uma sequência de segmentos JSON Lines (<nome>-<número>.jsonl);
+# cada gravação é sincronizada com o disco (fsync). Um segmento fechado ao
+# atingir TAMANHO_SEGMENTO_BYTES dá lugar ao seguinte, e os mais antigos são
+# descartados se o spool passar de LIMITE_SPOOL_BYTES. drenar() reenvia os
+# segmentos em ordem e remove os que foram aceitos.
+DIRETORIO_SPOOL = os.getenv(
+    'ACCESS_SPOOL_DIR',
+    os.path.join(os.path.dirname(__file__), 'cache', 'spool')
+)
+
+TAMANHO_SEGMENTO_BYTES = 1024 * 1024
+LIMITE_SPOOL_BYTES = 50 * 1024 * 1024
+
+_lock = threading.Lock()
+# Spools cujo segmento atual foi fechado por drenar(): a próxima gravação abre outro
+_fechados = set()
+
+
+def _segmentos(nome):
+    """Caminhos dos segmentos do spool, do mais antigo ao mais recente."""
+    if not os.path.isdir(DIRETORIO_SPOOL):
+        return []
+    prefixo = f"{nome}-"
+    numeros = sorted(
+        int(arquivo[len(prefixo):-len('.jsonl')]) for arquivo in os.listdir(DIRETORIO_SPOOL)
+        if arquivo.startswith(prefixo) and arquivo.endswith('.jsonl') and arquivo[len(prefixo):-len('.jsonl')].isdigit()
+    )
+    return [_caminho(nome, numero) for numero in numeros]
+
+
+def _caminho(nome, numero):
+    return os.path.join(DIRETORIO_SPOOL, f"{nome}-{numero:08d}.jsonl")
+
+
+def _numero(caminho):
+    return int(os.path.basename(caminho).rsplit('-', 1)[1][:-len('.jsonl')])
+
+
+def nomes():
+    """Nomes dos spools com registros aguardando envio, em ordem alfabética."""
+    if not os.path.isdir(DIRETORIO_SPOOL):
+        return []
+    return sorted({
+        arquivo.rsplit('-', 1)[0] for arquivo in os.listdir(DIRETORIO_SPOOL)
+        if arquivo.endswith('.jsonl') and '-' in arquivo
+    })
+
+
+def pendente(nome):
+    """Indica se o spool tem registros aguardando envio."""
+    return bool(_segmentos(nome))
+
+
+def gravar(nome, registros):
+    """
+    Anexa os registros (valores serializáveis em JSON) ao spool e sincroniza com
+    o disco. Retorna True em caso de sucesso, False em caso de falha.
+    """
+    if not registros:
+        return True
+    conteudo = ''.join(json.dumps(registro, ensure_ascii=False) + '\n' for registro in registros)
+    try:
+        with _lock:
+            os.makedirs(DIRETORIO_SPOOL, exist_ok=True)
+            segmentos = _segmentos(nome)
+            if not segmentos:
+                caminho = _caminho(nome, 1)
+            elif nome in _fechados or os.path.getsize(segmentos[-1]) >= TAMANHO_SEGMENTO_BYTES:
+                caminho = _caminho(nome, _numero(segmentos[-1]) + 1)
+            else:
+                caminho = segmentos[-1]
+            _fechados.discard(nome)
+            with open(caminho, 'a', encoding='utf-8') as arquivo:
+                arquivo.write(conteudo)
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+            _aplicar_limite(nome)
+        return True
+    except OSError as e:
+        logging.error(f"Erro ao gravar no spool local '{nome}': {e}")
+        return False
+
+
+def _aplicar_limite(nome):
+    """Descarta os segmentos mais antigos enquanto o spool passar do limite (o atual é mantido)."""
+    segmentos = _segmentos(nome)
+    tamanhos = [os.path.getsize(caminho) for caminho in segmentos]
+    while len(segmentos) > 1 and sum(tamanhos) > LIMITE_SPOOL_BYTES:
+        os.remove(segmentos.pop(0))
+        tamanhos.pop(0)
+        logging.error(f"Spool local '{nome}' cheio: o segmento mais antigo foi descartado.")
+
+
+def _ler(caminho):
+    """Registros de um segmento. Uma linha incompleta (gravação interrompida) é ignorada."""
+    registros = []
+    with open(caminho, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            try:
+                registros.append(json.loads(linha))
+            except ValueError:
+                logging.warning(f"Linha inválida ignorada no spool '{caminho}'.")
+    return registros
+
+
+def drenar(nome, enviar):
+    """
+    Reenvia o spool em ordem, um segmento por vez: `enviar(registros)` deve
+    retornar True se os registros foram aceitos, e então o segmento é removido.
+    Para no primeiro envio que falhar. Retorna True se o spool ficou vazio.
+    """
+    with _lock:
+        segmentos = _segmentos(nome)
+        if segmentos:
+            # Gravações durante o envio vão para um novo segmento
+            _fechados.add(nome)
+    for caminho in segmentos:
+        try:
+            registros = _ler(caminho)
+        except OSError as e:
+            logging.error(f"Erro ao ler o spool local '{caminho}': {e}")
+            return False
+        if registros and not enviar(registros):
+            return False
+        try:
+            with _lock:
+                os.remove(caminho)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Erro ao remover o segmento enviado '{caminho}': {e}")
+            return False
+    return not pendente(nome)
@@ -0,0 +1,380 @@
+import os
+import re
+import json
+import logging
+import threading
+import pygsheets
+
+# Backends de armazenamento usados por SheetOperations.
+#
+# Um backend entrega "abas" com as operações primitivas que a aplicação usa
+# (ler tudo, ler a partir de uma linha, ler coluna/linha, anexar linhas,
+# atualizar células e excluir linhas) e uma leitura em lote de vários intervalos. Há duas
+# implementações com o mesmo comportamento observável:
+#   - GoogleSheetsBackend: a planilha real, via pygsheets;
+#   - MemoriaBackend: listas em memória, opcionalmente persistidas em um
+#     arquivo JSON, para medir e testar a aplicação sem uma planilha real.
+# Em ambos, a ausência de uma aba é sinalizada com
+# pygsheets.exceptions.WorksheetNotFound e os valores lidos são strings.
+#
+# As gravações usam USER_ENTERED e as leituras, FORMATTED_VALUE: um valor
+# numérico gravado vira número na planilha e volta formatado (com o formato
+# Automático, inteiros com mais de 11 dígitos voltam em notação científica,
+# ex.: 8.81439E+13). Valores que precisam voltar exatamente como foram
+# gravados, como os IDs, são enviados como texto (ver texto_literal). O
+# MemoriaBackend reproduz essa conversão nas gravações (ver valor_como_gravado).
+MAX_DIGITOS_NUMERO_EXIBIDO = 11
+_PADRAO_INTEIRO = re.compile(r'^[+-]?\d+$')
+
+
+def texto_literal(valor):
+    """Valor a gravar como texto: com USER_ENTERED, o apóstrofo inicial impede a conversão em número."""
+    return "'" + str(valor)
+
+
+def valor_como_gravado(valor):
+    """
+    Valor como a planilha o devolve (FORMATTED_VALUE) depois de gravado com
+    USER_ENTERED: o apóstrofo inicial marca texto e é removido; inteiros (int ou
+    texto só com dígitos) viram número, sem zeros à esquerda, e os com mais de
+    MAX_DIGITOS_NUMERO_EXIBIDO dígitos são exibidos em notação científica.
+    Datas, horários e decimais (que dependem da localidade) não são reproduzidos.
+    """
+    if isinstance(valor, bool):
+        return "TRUE" if valor else "FALSE"
+    texto = str(valor)
+    if texto.startswith("'"):
+        return texto[1:]
+    if not isinstance(valor, int) and not _PADRAO_INTEIRO.match(texto.strip()):
+        return texto
+    numero = int(texto)
+    if len(str(abs(numero))) <= MAX_DIGITOS_NUMERO_EXIBIDO:
+        return str(numero)
+    mantissa, expoente = f"{numero:.5E}".split("E")
+    return f"{mantissa.rstrip('0').rstrip('.')}E{expoente}"
+
+
+class AbaArmazenamento:
+    """Interface de uma aba. Linhas e colunas são numeradas a partir de 1."""
+
+    def ler_tudo(self):
+        """Retorna todas as linhas da aba, sem as linhas vazias do final."""
+        raise NotImplementedError
+
+    def ler_a_partir(self, linha_inicio, largura):
+        """Retorna as linhas a partir de `linha_inicio`, limitadas às `largura` primeiras colunas."""
+        raise NotImplementedError
+
+    def ler_coluna(self, coluna):
+        """Retorna os valores de uma coluna, sem as células vazias do final."""
+        raise NotImplementedError
+
+    def ler_linha(self, linha):
+        """Retorna os valores de uma linha."""
+        raise NotImplementedError
+
+    def anexar(self, linhas):
+        """Anexa as linhas após a última linha preenchida e retorna o número da primeira."""
+        raise NotImplementedError
+
+    def atualizar_celulas(self, alteracoes):
+        """
+        Grava de uma só vez várias faixas de células. Cada alteração é uma tupla
+        (linha, coluna_inicio, valores) com valores contíguos na mesma linha.
+        """
+        raise NotImplementedError
+
+    def excluir_linhas(self, linhas):
+        """Exclui várias linhas de uma só vez; os números referem-se ao estado anterior."""
+        raise NotImplementedError
+
+
+class BackendArmazenamento:
+    """Interface de um backend: uma planilha com várias abas."""
+
+    def aba(self, nome, criar=False, cabecalho=None):
+        """
+        Retorna a aba `nome`. Se ela não existir e `criar` for True, cria a aba
+        com o `cabecalho` informado; caso contrário levanta WorksheetNotFound.
+        """
+        raise NotImplementedError
+
+    def ler_intervalos(self, intervalos):
+        """
+        Lê vários intervalos de uma só vez. Cada intervalo é uma tupla
+        (nome_aba, linha_inicio, largura, linha_fim); com linha_inicio None a
+        aba inteira é lida, com largura None todas as colunas e com linha_fim
+        None a leitura vai até o fim.
+        Retorna uma lista de listas de linhas, na mesma ordem, sem células e
+        linhas vazias do final.
+        """
+        raise NotImplementedError
+
+    def listar_abas(self):
+        """Retorna os nomes das abas existentes."""
+        raise NotImplementedError
+
+    def descartar_aba(self, nome):
+        """Descarta o que o backend guarda sobre a aba (ex.: handles em cache)."""
+
+
+def _coluna_a1(numero):
+    """Converte o número de uma coluna (1 = A) para letras (ex.: 27 -> AA)."""
+    coluna = ""
+    while numero > 0:
+        numero, resto = divmod(numero - 1, 26)
+        coluna = chr(65 + resto) + coluna
+    return coluna
+
+
+def intervalo_a1(titulo, linha_inicio=None, largura=None, linha_fim=None, coluna_inicio=1):
+    """
+    Monta um intervalo A1 (ex.: 'acess'!A10:M20). Sem linha_inicio, a aba
+    inteira; sem largura, todas as colunas das linhas (ex.: 'acess'!10:12).
+    """
+    titulo = "'" + titulo.replace("'", "''") + "'"
+    if linha_inicio is None:
+        return titulo
+    if largura is None:
+        return f"{titulo}!{linha_inicio}:{linha_fim or ''}"
+    inicio = f"{_coluna_a1(coluna_inicio)}{linha_inicio}"
+    return f"{titulo}!{inicio}:{_coluna_a1(coluna_inicio + largura - 1)}{linha_fim or ''}"
+
+
+class AbaGoogleSheets(AbaArmazenamento):
+    """Aba da planilha do Google Sheets, sobre um pygsheets.Worksheet."""
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+
+    def ler_tudo(self):
+        return self.worksheet.get_all_values(include_tailing_empty_rows=False)
+
+    def ler_a_partir(self, linha_inicio, largura):
+        """
+        Lê o intervalo A1 explícito 'aba'!A<linha_inicio>:<coluna>. Com
+        get_values((linha_inicio, 1), (None, largura)) o pygsheets descarta os
+        dois limites de linha e a leitura traria a aba inteira, cabeçalho incluído.
+        """
+        resposta = self.worksheet.client.sheet.values_get(
+            self.worksheet.spreadsheet.id, intervalo_a1(self.worksheet.title, linha_inicio, largura)
+        )
+        # Sem linhas a API omite 'values' (o pygsheets devolveria [[]])
+        return _sem_linhas_vazias_no_fim(resposta.get('values', []))
+
+    def ler_coluna(self, coluna):
+        return self.worksheet.get_col(coluna, include_tailing_empty=False)
+
+    def ler_linha(self, linha):
+        return self.worksheet.get_row(linha)
+
+    def anexar(self, linhas):
+        resultado = self.worksheet.append_table(values=linhas)
+        return resultado['updates']['updatedRange'].start.row
+
+    def atualizar_celulas(self, alteracoes):
+        """Envia todas as faixas em uma única chamada values.batchUpdate."""
+        data = [
+            {'range': intervalo_a1(self.worksheet.title, linha, len(valores), linha, coluna_inicio),
+             'majorDimension': 'ROWS', 'values': [list(valores)]}
+            for linha, coluna_inicio, valores in alteracoes
+        ]
+        sheet_api = self.worksheet.client.sheet
+        request = sheet_api.service.spreadsheets().values().batchUpdate(
+            spreadsheetId=self.worksheet.spreadsheet.id,
+            body={'valueInputOption': 'USER_ENTERED', 'data': data}
+        )
+        sheet_api._execute_requests(request)
+
+    def excluir_linhas(self, linhas):
+        """
+        Exclui com um único batch_update. As faixas contíguas são agrupadas e
+        enviadas em ordem decrescente, para que os índices das faixas seguintes
+        continuem válidos enquanto a requisição é aplicada.
+        """
+        linhas = sorted(set(linhas), reverse=True)
+        faixas = []
+        for linha in linhas:
+            if faixas and faixas[-1][0] == linha + 1:
+                faixas[-1][0] = linha
+            else:
+                faixas.append([linha, linha])
+
+        requests = [
+            {'deleteDimension': {'range': {'sheetId': self.worksheet.id, 'dimension': 'ROWS',
+                                           'startIndex': inicio - 1, 'endIndex': fim}}}
+            for inicio, fim in faixas
+        ]
+        self.worksheet.client.sheet.batch_update(self.worksheet.spreadsheet.id, requests)
+        # Mantém o tamanho da grade do handle em cache coerente, como faz delete_rows
+        self.worksheet.jsonSheet['properties']['gridProperties']['rowCount'] -= len(linhas)
+
+
+class GoogleSheetsBackend(BackendArmazenamento):
+    """
+    Planilha do Google Sheets. Guarda os handles das abas para não repetir
+    worksheet_by_title (metadados) a cada operação.
+    """
+
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+        self._abas = {}
+        self._lock = threading.Lock()
+
+    def aba(self, nome, criar=False, cabecalho=None):
+        aba = self._abas.get(nome)
+        if aba is not None:
+            return aba
+
+        try:
+            worksheet = self.spreadsheet.worksheet_by_title(nome)
+        except pygsheets.exceptions.WorksheetNotFound:
+            if not criar:
+                raise
+            worksheet = self.spreadsheet.add_worksheet(nome)
+            if cabecalho:
+                worksheet.update_row(1, cabecalho)
+
+        with self._lock:
+            return self._abas.setdefault(nome, AbaGoogleSheets(worksheet))
+
+    def ler_intervalos(self, intervalos):
+        ranges = [intervalo_a1(nome, inicio, largura, fim) for nome, inicio, largura, fim in intervalos]
+        respostas = self.spreadsheet.client.sheet.values_batch_get(self.spreadsheet.id, ranges)
+        return [resposta.get('values', []) for resposta in respostas]
+
+    def listar_abas(self):
+        # Lista mantida pelo pygsheets desde a abertura (atualizada ao criar abas)
+        return [worksheet.title for worksheet in self.spreadsheet.worksheets()]
+
+    def descartar_aba(self, nome):
+        with self._lock:
+            self._abas.pop(nome, None)
+
+
+def _sem_celulas_vazias_no_fim(row):
+    """Remove as células vazias do final de uma linha."""
+    fim = len(row)
+    while fim and row[fim - 1] == "":
+        fim -= 1
+    return row[:fim]
+
+
+def _sem_linhas_vazias_no_fim(linhas):
+    """Remove as linhas vazias do final de uma aba."""
+    fim = len(linhas)
+    while fim and not any(linhas[fim - 1]):
+        fim -= 1
+    return linhas[:fim]
+
+
+class AbaMemoria(AbaArmazenamento):
+    """Aba mantida como lista de linhas (listas de strings) em memória."""
+
+    def __init__(self, backend, nome):
+        self.backend = backend
+        self.nome = nome
+
+    @property
+    def _linhas(self):
+        return self.backend._abas[self.nome]
+
+    def ler_tudo(self):
+        with self.backend._lock:
+            return [list(row) for row in _sem_linhas_vazias_no_fim(self._linhas)]
+
+    def ler_a_partir(self, linha_inicio, largura):
+        with self.backend._lock:
+            return [row[:largura] for row in _sem_linhas_vazias_no_fim(self._linhas)[linha_inicio - 1:]]
+
+    def ler_coluna(self, coluna):
+        with self.backend._lock:
+            return _sem_celulas_vazias_no_fim([row[coluna - 1] if len(row) >= coluna else "" for row in self._linhas])
+
+    def ler_linha(self, linha):
+        with self.backend._lock:
+            linhas = self._linhas
+            return list(linhas[linha - 1]) if linha <= len(linhas) else []
+
+    def anexar(self, linhas):
+        with self.backend._lock:
+            atuais = self.backend._abas[self.nome] = _sem_linhas_vazias_no_fim(self._linhas)
+            primeira = len(atuais) + 1
+            atuais.extend([valor_como_gravado(v) for v in linha] for linha in linhas)
+            self.backend._persistir()
+        return primeira
+
+    def atualizar_celulas(self, alteracoes):
+        with self.backend._lock:
+            linhas = self._linhas
+            for linha, coluna_inicio, valores in alteracoes:
+                while len(linhas) < linha:
+                    linhas.append([])
+                row = linhas[linha - 1]
+                fim = coluna_inicio - 1 + len(valores)
+                row.extend([""] * (fim - len(row)))
+                row[coluna_inicio - 1:fim] = [valor_como_gravado(v) for v in valores]
+            self.backend._persistir()
+
+    def excluir_linhas(self, linhas):
+        with self.backend._lock:
+            atuais = self._linhas
+            for linha in sorted(set(linhas), reverse=True):
+                if linha <= len(atuais):
+                    del atuais[linha - 1]
+            self.backend._persistir()
+
+
+class MemoriaBackend(BackendArmazenamento):
+    """
+    Backend em memória com o mesmo comportamento da planilha, para benchmarks e
+    testes sem acesso ao Google Sheets. Com `caminho`, o conteúdo é carregado de
+    e gravado em um arquivo JSON ({nome_aba: [linhas]}) a cada alteração.
+    """
+
+    def __init__(self, abas=None, caminho=None):
+        self.caminho = caminho
+        self.chave = f"memoria://{caminho or id(self)}"
+        self._lock = threading.RLock()
+        self._abas = {}
+        if caminho and os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as f:
+                abas = json.load(f)
+        for nome, linhas in (abas or {}).items():
+            self._abas[nome] = [[str(v) for v in row] for row in linhas]
+
+    def aba(self, nome, criar=False, cabecalho=None):
+        with self._lock:
+            if nome not in self._abas:
+                if not criar:
+                    raise pygsheets.exceptions.WorksheetNotFound(nome)
+                self._abas[nome] = [list(cabecalho)] if cabecalho else []
+                self._persistir()
+        return AbaMemoria(self, nome)
+
+    def ler_intervalos(self, intervalos):
+        resultado = []
+        with self._lock:
+            for nome, inicio, largura, fim in intervalos:
+                if nome not in self._abas:
+                    raise pygsheets.exceptions.WorksheetNotFound(nome)
+                linhas = self._abas[nome] if inicio is None else self._abas[nome][inicio - 1:fim]
+                linhas = [_sem_celulas_vazias_no_fim(row[:largura] if largura else list(row)) for row in linhas]
+                resultado.append(_sem_linhas_vazias_no_fim(linhas))
+        return resultado
+
+    def listar_abas(self):
+        with self._lock:
+            return list(self._abas)
+
+    def _persistir(self):
+        """Grava o conteúdo no arquivo JSON, se houver (chamado com o lock adquirido)."""
+        if not self.caminho:
+            return
+        temporario = self.caminho + '.tmp'
+        try:
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(self._abas, f, ensure_ascii=False)
+            os.replace(temporario, self.caminho)
+        except OSError as e:
+            logging.error(f"Erro ao gravar o backend em memória em '{self.caminho}': {e}")
@@ -2,6 +2,9 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from app.operations import SheetOperations
+from app.schemas import para_dataframe
+from app import cache_tags
 
 def get_month_name(month):
     """Retorna o nome do mês em português"""
@@ -12,19 +15,28 @@ def get_month_name(month):
     }
     return meses.get(month, "")
 
+def load_month_data(selected_month, selected_year):
+    """Carrega apenas os registros do mês (sua partição mensal e a aba 'acess') como DataFrame tipado."""
+    data = SheetOperations().carregar_dados_mes(selected_year, selected_month)
+    if not data or len(data) < 2:
+        return pd.DataFrame()
+    return para_dataframe(data, 'acess')
+
+@cache_tags.cache_data('access', ttl=600)
+def count_all_records():
+    """Total de registros de acesso de todos os meses (lê só a coluna de IDs)."""
+    return SheetOperations().contar_registros_acesso()
+
 def month_consult(selected_month=None, selected_year=None):
     """Mostra estatísticas mensais dos acessos"""
-    if "df_acesso_veiculos" in st.session_state and not st.session_state.df_acesso_veiculos.empty:
-        df = st.session_state.df_acesso_veiculos.copy()
-        
-        df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
-        
-        if selected_month is None: selected_month = datetime.now().month
-        if selected_year is None: selected_year = datetime.now().year
-        
+    if selected_month is None: selected_month = datetime.now().month
+    if selected_year is None: selected_year = datetime.now().year
+    
+    df = load_month_data(selected_month, selected_year)
+    if not df.empty:
         df_month = df[
-            (df['Data'].dt.month == selected_month) & 
-            (df['Data'].dt.year == selected_year)
+            (df['Data_dt'].dt.month == selected_month) & 
+            (df['Data_dt'].dt.year == selected_year)
         ]
         
         total_acessos = len(df_month)
@@ -37,20 +49,17 @@ def month_consult(selected_month=None, selected_year=None):
         with col3: st.metric("Acessos Bloqueados", acessos_bloqueados)
         
         if not df_month.empty:
-            acessos_por_dia = df_month.groupby(df_month['Data'].dt.day).size()
+            acessos_por_dia = df_month.groupby(df_month['Data_dt'].dt.day).size()
             st.bar_chart(acessos_por_dia)
             st.caption("Acessos por dia do mês")
 
 def consulta_nome_mes(selected_month=None, selected_year=None):
     """Consulta todas as entradas de uma pessoa específica no mês"""
-    if "df_acesso_veiculos" in st.session_state and not st.session_state.df_acesso_veiculos.empty:
-        df = st.session_state.df_acesso_veiculos.copy()
-        
-        df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
-        
-        if selected_month is None: selected_month = datetime.now().month
-        if selected_year is None: selected_year = datetime.now().year
-        
+    if selected_month is None: selected_month = datetime.now().month
+    if selected_year is None: selected_year = datetime.now().year
+    
+    df = load_month_data(selected_month, selected_year)
+    if not df.empty:
         nomes_unicos = sorted(df['Nome'].unique())
         if not nomes_unicos:
             st.warning("Nenhum nome encontrado nos registros.")
@@ -60,8 +69,8 @@ def consulta_nome_mes(selected_month=None, selected_year=None):
         
         if nome_selecionado:
             df_pessoa = df[
-                (df['Data'].dt.month == selected_month) & 
-                (df['Data'].dt.year == selected_year) &
+                (df['Data_dt'].dt.month == selected_month) & 
+                (df['Data_dt'].dt.year == selected_year) &
                 (df['Nome'] == nome_selecionado)
             ]
             
@@ -78,11 +87,10 @@ def consulta_nome_mes(selected_month=None, selected_year=None):
                 with col2: st.metric("Acessos Autorizados", acessos_autorizados)
                 with col3: st.metric("Acessos Bloqueados", acessos_bloqueados)
                 
-                df_pessoa = df_pessoa.sort_values(['Data', 'Horário de Entrada'])
+                df_pessoa = df_pessoa.sort_values(['Data_dt', 'Horário de Entrada_min'])
                 
                 colunas_exibir = ['Data', 'Horário de Entrada', 'Horário de Saída', 'Empresa', 'Status da Entrada', 'Motivo do Bloqueio', 'Aprovador']
-                df_exibir = df_pessoa[colunas_exibir].copy()
-                df_exibir['Data'] = df_exibir['Data'].dt.strftime('%d/%m/%Y')
+                df_exibir = df_pessoa[colunas_exibir]
                 
                 st.dataframe(df_exibir, hide_index=True, use_container_width=True)
 
@@ -113,9 +121,8 @@ def summary_page():
         # --- (CORRIGIDO) Contador de Redução de Papel ---
         st.subheader("Impacto Ambiental da Digitalização")
 
-        if "df_acesso_veiculos" in st.session_state:
-            total_registros = len(st.session_state.df_acesso_veiculos)
-        else:
+        total_registros = count_all_records()
+        if total_registros is None:
             total_registros = 0
             st.warning("Dados de acesso não encontrados.")
 
@@ -8,9 +8,10 @@ from app.data_operations import (
     check_blocked_records,
     is_entity_blocked,
     check_briefing_needed,
+    get_access_dataframe,
     update_schedule_status
 )
-from app.operations import SheetOperations
+from app.operations import SheetOperations, estado_gravacoes_adiadas
 from app.utils import (
     format_cpf, 
     validate_cpf, 
@@ -145,7 +146,7 @@ def show_scheduled_today(sheet_ops):
                         if update_schedule_status(schedule_id, "Realizado", now.strftime("%H:%M")):
                             st.success(f"Chegada de {visitor_name} registrada com sucesso!")
                             log_action("CHECK_IN", f"Check-in realizado para a visita agendada de '{visitor_name}'.")
-                            clear_access_cache()
+                            clear_access_cache('access', 'schedules')
                             st.rerun()
                             
 def get_person_status(name, df):
@@ -162,6 +163,23 @@ def get_person_status(name, df):
     if pd.isna(horario_saida) or str(horario_saida).strip() == "": return "Dentro", latest_record
     return "Fora", latest_record
 
+ROTULOS_GRAVACAO = {
+    'pendente': "⏳ Gravando na planilha...",
+    'enviando': "⏳ Gravando na planilha...",
+    'gravado': "✓ Gravado na planilha",
+    'falhou': "⚠️ Falha ao gravar na planilha",
+}
+
+def show_pending_writes_status():
+    """Mostra um resumo das gravações adiadas (modo write-behind) ainda não concluídas."""
+    estados = list(estado_gravacoes_adiadas('acess').values())
+    em_andamento = sum(1 for estado in estados if estado in ('pendente', 'enviando'))
+    falhas = estados.count('falhou')
+    if em_andamento:
+        st.caption(f"⏳ {em_andamento} registro(s) aguardando gravação na planilha.")
+    if falhas:
+        st.warning(f"⚠️ {falhas} registro(s) não puderam ser gravados na planilha. Verifique os registros marcados e refaça a operação.")
+
 def show_people_inside(df, sheet_operations):
     """Mostra uma lista de pessoas atualmente dentro com um botão de saída rápida."""
     st.subheader("Pessoas na Unidade")
@@ -176,6 +194,8 @@ def show_people_inside(df, sheet_operations):
         st.info("Ninguém registrado na unidade no momento.")
         return
     
+    estados_gravacao = estado_gravacoes_adiadas('acess')
+    
     for _, row in inside_df.iterrows():
         record_id = row.get('ID')
         person_name = row['Nome']
@@ -185,6 +205,8 @@ def show_people_inside(df, sheet_operations):
             st.write(f"**{person_name}**")
         with col2: 
             st.caption(f"Entrada: {row['Data']} às {row['Horário de Entrada']}")
+            if record_id in estados_gravacao:
+                st.caption(ROTULOS_GRAVACAO[estados_gravacao[record_id]])
         with col3:
             # CORREÇÃO: Verifica se já está processando ANTES de mostrar o botão
             is_processing_this = st.session_state.get(f'exit_clicked_{record_id}', False)
@@ -354,7 +376,7 @@ def process_exit_with_material(person_name, record_id, sheet_ops, item, qtd, des
         
         # CORREÇÃO: Limpa TUDO antes de rerun
         cleanup_exit_session_state(record_id)
-        clear_access_cache()
+        clear_access_cache('access', 'materials')
         st.session_state.processing = False
         
         # AGUARDA um momento antes do rerun para garantir que o estado foi limpo
@@ -427,15 +449,9 @@ def vehicle_access_interface():
         except Exception as e:
             st.error(f"Erro ao carregar o vídeo: {e}")
     
-    if 'df_acesso_veiculos' not in st.session_state:
-        data = sheet_operations.carregar_dados()
-        df = pd.DataFrame(data[1:], columns=data[0]).fillna("") if data else pd.DataFrame()
-    else:
-        df = st.session_state.df_acesso_veiculos
-    if not df.empty:
-        df['Data_dt'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
-        df = df.sort_values(by=['Data_dt', 'Horário de Entrada'], ascending=[False, False]).drop(columns=['Data_dt'])
-    st.session_state.df_acesso_veiculos = df
+    # DataFrame compartilhado entre as sessões (tipado e ordenado uma única vez)
+    df = get_access_dataframe()
+    show_pending_writes_status()
     aprovadores_autorizados = sheet_operations.carregar_dados_aprovadores()
     blocked_info = check_blocked_records(df)
     if blocked_info:
@@ -753,7 +769,7 @@ def vehicle_access_interface():
                         records = df[df["Nome"] == person_to_delete].copy()
                         if not records.empty:
                             last_record_id = records.iloc[0]['ID']
-                            if delete_record_by_id(last_record_id):
+                            if delete_record_by_id(last_record_id, records.iloc[0]['Data']):
                                 log_action("DELETE_RECORD", f"Deletou o último registro de '{person_to_delete}' (ID: {last_record_id}).")
                                 st.success(f"Último registro de {person_to_delete} deletado com sucesso.")
                                 clear_access_cache()
@@ -924,7 +940,7 @@ def process_exit_with_material_individual(person_name, sheet_ops, item, qtd, des
             st.warning("⚠️ Saída registrada, mas houve erro ao registrar o material")
         
         cleanup_exit_session_state_individual()
-        clear_access_cache()
+        clear_access_cache('access', 'materials')
         st.session_state.processing = False
         
         import time
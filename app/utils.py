@@ -3,6 +3,7 @@ import pandas as pd
 import pytz
 import re
 import streamlit as st
+from app import cache_tags
 
 # Constantes de formato
 DATE_FORMAT = "%d/%m/%Y"
@@ -125,11 +126,18 @@ def round_to_nearest_interval(time_value, interval=1):
     except (ValueError, TypeError):
         return get_sao_paulo_time().strftime("%H:%M")
 
-def clear_access_cache():
-    """Limpa o cache de dados de acesso de forma centralizada."""
-    if 'df_acesso_veiculos' in st.session_state:
-        del st.session_state['df_acesso_veiculos']
-    st.cache_data.clear()
+def clear_access_cache(*tags):
+    """
+    Invalida, de forma centralizada, o cache dos dados alterados, indicados pelas
+    etiquetas de app.cache_tags (padrão: 'access'). O cache das demais leituras
+    (usuários, papéis, blocklist...) é mantido.
+    """
+    tags = tags or ('access',)
+    if 'access' in tags:
+        # Sem a versão, a próxima leitura confere o conjunto compartilhado da portaria
+        if 'acesso_versao' in st.session_state:
+            del st.session_state['acesso_versao']
+    cache_tags.invalidar(*tags)
 
 
 
@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+# Fila local e durável (SQLite) das gravações adiadas ("write-behind") e das
+# inclusões que não chegaram à planilha por ela estar inacessível.
+# Cada item é uma operação sobre uma aba ('anexar' linhas com IDs já alocados,
+# ou alterar 'campos' de um registro por ID, com os dados {'campos': {coluna:
+# valor}, 'esperado': {coluna: valor atual}}, gravados só se o registro ainda
+# estiver como esperado) e passa pelos estados:
+#   pendente -> enviando -> gravado
+# voltando a 'pendente' (com tentativas + 1) se a gravação falhar, ou indo para
+# 'falhou' após esgotar as tentativas. O item 'enviando' encontrado ao reiniciar
+# o processo pode já ter sido gravado; quem o consome deve conferir antes.
+CAMINHO_FILA = os.getenv(
+    'ACCESS_WRITE_QUEUE_PATH',
+    os.path.join(os.path.dirname(__file__), 'cache', 'fila_gravacao.sqlite3')
+)
+
+# Itens gravados continuam visíveis (status "gravado") por este tempo e depois
+# são removidos por limpar_gravados, chamada periodicamente pela thread de gravação.
+RETENCAO_GRAVADOS_SEGUNDOS = 10 * 60
+
+_local = threading.local()
+_escrita_lock = threading.Lock()
+
+
+def _conexao():
+    """Retorna a conexão SQLite da thread atual, criando a fila se necessário."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(CAMINHO_FILA), exist_ok=True)
+        conn = sqlite3.connect(CAMINHO_FILA, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS fila ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, aba TEXT NOT NULL, operacao TEXT NOT NULL, "
+            "ids TEXT NOT NULL, dados TEXT NOT NULL, status TEXT NOT NULL, "
+            "tentativas INTEGER NOT NULL DEFAULT 0, erro TEXT, "
+            "criado_em REAL NOT NULL, atualizado_em REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_fila_status ON fila (status, seq)")
+        _local.conn = conn
+    return conn
+
+
+def _item(row):
+    return {
+        'seq': row['seq'], 'aba': row['aba'], 'operacao': row['operacao'],
+        'ids': json.loads(row['ids']), 'dados': json.loads(row['dados']),
+        'status': row['status'], 'tentativas': row['tentativas'], 'erro': row['erro'],
+    }
+
+
+def enfileirar(aba_name, operacao, ids, dados):
+    """Grava uma operação na fila e retorna seu número de sequência."""
+    agora = time.time()
+    conn = _conexao()
+    with _escrita_lock, conn:
+        cursor = conn.execute(
+            "INSERT INTO fila (aba, operacao, ids, dados, status, criado_em, atualizado_em) "
+            "VALUES (?, ?, ?, ?, 'pendente', ?, ?)",
+            (aba_name, operacao, json.dumps([str(i) for i in ids]), json.dumps(dados), agora, agora)
+        )
+    return cursor.lastrowid
+
+
+def em_aberto(aba_name=None):
+    """Itens ainda não gravados (pendentes ou em envio), em ordem de chegada."""
+    sql = "SELECT * FROM fila WHERE status IN ('pendente', 'enviando')"
+    parametros = ()
+    if aba_name is not None:
+        sql += " AND aba = ?"
+        parametros = (aba_name,)
+    return [_item(row) for row in _conexao().execute(sql + " ORDER BY seq", parametros)]
+
+
+def tem_itens():
+    """
+    Indica se a fila guarda itens ainda não gravados ou gravados há menos tempo
+    que a retenção. Não cria o arquivo da fila se ele não existir.
+    """
+    if not os.path.exists(CAMINHO_FILA):
+        return False
+    try:
+        row = _conexao().execute(
+            "SELECT 1 FROM fila WHERE status != 'gravado' OR atualizado_em >= ? LIMIT 1",
+            (time.time() - RETENCAO_GRAVADOS_SEGUNDOS,)
+        ).fetchone()
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao consultar a fila de gravação: {e}")
+        return True
+    return row is not None
+
+
+def marcar(seq, status, erro=None, nova_tentativa=False):
+    """Atualiza o estado de um item da fila."""
+    conn = _conexao()
+    with _escrita_lock, conn:
+        conn.execute(
+            "UPDATE fila SET status = ?, erro = ?, atualizado_em = ?, "
+            "tentativas = tentativas + ? WHERE seq = ?",
+            (status, erro, time.time(), 1 if nova_tentativa else 0, seq)
+        )
+
+
+def estado_por_id(aba_name):
+    """
+    Retorna {ID: status} dos registros da aba com gravação adiada recente
+    ('pendente', 'enviando', 'gravado' ou 'falhou'); vale o item mais recente.
+    """
+    limite = time.time() - RETENCAO_GRAVADOS_SEGUNDOS
+    estados = {}
+    try:
+        rows = _conexao().execute(
+            "SELECT ids, status FROM fila WHERE aba = ? AND (status != 'gravado' OR atualizado_em >= ?) "
+            "ORDER BY seq", (aba_name, limite)
+        )
+        for row in rows:
+            for row_id in json.loads(row['ids']):
+                estados[row_id] = row['status']
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao consultar a fila de gravação: {e}")
+    return estados
+
+
+def limpar_gravados():
+    """Remove da fila os itens gravados há mais tempo que a retenção e retorna quantos foram removidos."""
+    conn = _conexao()
+    with _escrita_lock, conn:
+        cursor = conn.execute(
+            "DELETE FROM fila WHERE status = 'gravado' AND atualizado_em < ?",
+            (time.time() - RETENCAO_GRAVADOS_SEGUNDOS,)
+        )
+    return cursor.rowcount
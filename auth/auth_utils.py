@@ -1,10 +1,11 @@
 import streamlit as st
 from app.operations import SheetOperations
 from app.utils import get_sao_paulo_time
+from app import cache_tags
 import pytz
 from datetime import datetime, time
 
-@st.cache_data(ttl=300)
+@cache_tags.cache_data('roles', ttl=300)
 def _load_user_roles():
     """
     Carrega e cacheia os papéis dos usuários da aba 'users' da planilha.
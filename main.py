@@ -4,7 +4,8 @@ from auth.login_page import show_login_page, show_user_header, show_logout_butto
 from auth.auth_utils import is_user_logged_in, get_user_role, is_session_expired
 from app.utils import get_sao_paulo_time
 from app.data_operations import load_data_from_sheets
-from app.logger import log_action
+from app.operations import iniciar_sincronizacao, iniciar_gravacao_adiada
+from app.logger import log_action, iniciar_escritor_logs
 from app.ui_interface import vehicle_access_interface
 from app.admin_page import admin_page
 from app.summary_page import summary_page 
@@ -16,9 +17,16 @@ st.set_page_config(page_title="Controle de Acesso BAERI", layout="wide")
 def main():
     # Inicializa segurança de sessão
     SessionSecurity.init_session_security()
+
+    # Mantém a cópia local em disco da planilha atualizada (uma thread por processo)
+    iniciar_sincronizacao()
+    # Envia à planilha as gravações adiadas (inclusive as que sobraram de uma execução anterior)
+    iniciar_gravacao_adiada()
+    # Envia os logs em lote e reenvia os que ficaram no spool local
+    iniciar_escritor_logs()
     
     # Carrega os dados se ainda não estiverem na sessão
-    if 'df_acesso_veiculos' not in st.session_state:
+    if 'acesso_versao' not in st.session_state:
         load_data_from_sheets()
 
     if is_user_logged_in():
@@ -0,0 +1,147 @@
+import os
+import re
+import sys
+import tempfile
+from types import SimpleNamespace
+import pytest
+
+# Arquivos locais (fila, snapshots, spool) em um diretório temporário,
+# definidos antes de importar os módulos da aplicação, que os leem na importação.
+_DIRETORIO_TESTES = tempfile.mkdtemp(prefix='controle-acesso-testes-')
+os.environ['ACCESS_WRITE_QUEUE_PATH'] = os.path.join(_DIRETORIO_TESTES, 'fila.sqlite3')
+os.environ['ACCESS_SNAPSHOT_DIR'] = os.path.join(_DIRETORIO_TESTES, 'snapshots')
+os.environ['ACCESS_SPOOL_DIR'] = os.path.join(_DIRETORIO_TESTES, 'spool')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth  # noqa: E402,F401  (importado antes de app.* por causa do import circular auth <-> app)
+import pygsheets  # noqa: E402
+import app.operations as ops  # noqa: E402
+from app import write_queue  # noqa: E402
+from app.storage import valor_como_gravado  # noqa: E402
+
+
+def _numero_coluna(letras):
+    numero = 0
+    for letra in letras:
+        numero = numero * 26 + ord(letra) - 64
+    return numero
+
+
+class WorksheetFalsa:
+    """Worksheet do pygsheets com as chamadas usadas por app.storage."""
+
+    def __init__(self, planilha, title, linhas):
+        self.spreadsheet = planilha
+        self.client = planilha.client
+        self.title = title
+        self.linhas = linhas
+
+    def get_all_values(self, include_tailing_empty_rows=True):
+        self.spreadsheet.chamadas.append(('get_all_values', self.title))
+        return [list(row) for row in self.linhas]
+
+    def get_col(self, coluna, include_tailing_empty=False):
+        return [row[coluna - 1] if len(row) >= coluna else "" for row in self.linhas]
+
+    def get_row(self, linha):
+        return list(self.linhas[linha - 1]) if linha <= len(self.linhas) else []
+
+    def append_table(self, values):
+        """values.append com USER_ENTERED: os valores voltam como a planilha os exibiria."""
+        self.spreadsheet.chamadas.append(('append_table', self.title))
+        primeira = len(self.linhas) + 1
+        self.linhas.extend([valor_como_gravado(v) for v in row] for row in values)
+        return {'updates': {'updatedRange': SimpleNamespace(start=SimpleNamespace(row=primeira))}}
+
+
+class SheetApiFalsa:
+    """
+    values.get / values.batchGet resolvendo intervalos A1 sobre as listas da
+    planilha falsa, e values.batchUpdate (USER_ENTERED) pelo service.
+    """
+
+    def __init__(self, planilha):
+        self.planilha = planilha
+        self.service = self
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def batchUpdate(self, spreadsheetId, body):
+        return body
+
+    def _execute_requests(self, body):
+        for faixa in body['data']:
+            m = re.match(r"^'(.*)'!([A-Z]+)(\d+):", faixa['range'])
+            linhas = self.planilha.abas[m.group(1).replace("''", "'")].linhas
+            linha, coluna = int(m.group(3)), _numero_coluna(m.group(2))
+            self.planilha.chamadas.append(('batchUpdate', faixa['range']))
+            while len(linhas) < linha:
+                linhas.append([])
+            row = linhas[linha - 1]
+            valores = faixa['values'][0]
+            row.extend([""] * (coluna - 1 + len(valores) - len(row)))
+            row[coluna - 1:coluna - 1 + len(valores)] = [valor_como_gravado(v) for v in valores]
+
+    def _resolver(self, intervalo):
+        m = re.match(r"^'(.*)'(?:!(?:([A-Z]+)(\d+):([A-Z]+)(\d*)|(\d+):(\d*)))?$", intervalo)
+        assert m, f"intervalo A1 inesperado: {intervalo}"
+        titulo = m.group(1).replace("''", "'")
+        linhas = self.planilha.abas[titulo].linhas
+        if m.group(2):
+            coluna_inicio, coluna_fim = _numero_coluna(m.group(2)), _numero_coluna(m.group(4))
+            inicio, fim = int(m.group(3)), int(m.group(5)) if m.group(5) else len(linhas)
+        else:
+            coluna_inicio, coluna_fim = 1, None
+            inicio = int(m.group(6)) if m.group(6) else 1
+            fim = int(m.group(7)) if m.group(7) else len(linhas)
+        valores = [list(row[coluna_inicio - 1:coluna_fim]) for row in linhas[inicio - 1:fim]]
+        return {'range': intervalo, 'values': valores} if valores else {'range': intervalo}
+
+    def values_get(self, spreadsheet_id, value_range, **opcoes):
+        self.planilha.chamadas.append(('values_get', value_range))
+        return self._resolver(value_range)
+
+    def values_batch_get(self, spreadsheet_id, value_ranges, **opcoes):
+        self.planilha.chamadas.append(('values_batch_get', tuple(value_ranges)))
+        return [self._resolver(intervalo) for intervalo in value_ranges]
+
+
+class PlanilhaFalsa:
+    """pygsheets.Spreadsheet mínimo: abas em listas e registro das chamadas feitas."""
+
+    def __init__(self, abas):
+        self.id = 'planilha-falsa'
+        self.chamadas = []
+        self.client = self
+        self.sheet = SheetApiFalsa(self)
+        self.abas = {titulo: WorksheetFalsa(self, titulo, linhas) for titulo, linhas in abas.items()}
+
+    def worksheet_by_title(self, titulo):
+        if titulo not in self.abas:
+            raise pygsheets.exceptions.WorksheetNotFound()
+        return self.abas[titulo]
+
+    def worksheets(self):
+        return list(self.abas.values())
+
+
+@pytest.fixture
+def planilha_falsa():
+    return PlanilhaFalsa
+
+
+@pytest.fixture(autouse=True)
+def estado_limpo():
+    """Cada teste começa sem backend configurado, sem handles/snapshots em cache e com a fila local vazia."""
+    ops.usar_backend(None)
+    ops._handle_cache.clear()
+    yield
+    ops.usar_backend(None)
+    ops._handle_cache.clear()
+    with write_queue._conexao() as conn:
+        conn.execute("DELETE FROM fila")
@@ -0,0 +1,178 @@
+import pytest
+import streamlit as st
+import app.data_operations as data_operations
+from app import cache_tags
+import app.operations as ops
+from app.storage import MemoriaBackend
+
+CABECALHO_ACESS = ops.CABECALHOS_ABAS['acess']
+CPF_VALIDO = "529.982.247-25"
+
+
+def _acesso(row_id, nome, data, entrada="08:00", saida="", status="Autorizado"):
+    """Linha completa da aba 'acess', na ordem do cabeçalho."""
+    valores = {
+        "ID": row_id, "Nome": nome, "CPF": "123.456.789-09", "Placa": "", "Marca do Carro": "",
+        "Horário de Entrada": entrada, "Horário de Saída": saida, "Data": data,
+        "Empresa": "Empresa X", "Status da Entrada": status, "Motivo do Bloqueio": "",
+        "Aprovador": "", "Data do Primeiro Registro": data,
+    }
+    return [valores[coluna] for coluna in CABECALHO_ACESS]
+
+
+def _linhas(backend, aba_name):
+    """Registros da aba em memória como dicionários {coluna: valor}."""
+    cabecalho, *linhas = backend.aba(aba_name).ler_tudo()
+    return [dict(zip(cabecalho, row)) for row in linhas]
+
+
+@pytest.fixture
+def backend():
+    backend = MemoriaBackend({
+        'acess': [list(CABECALHO_ACESS), _acesso("1", "Ana", "17/10/2026")],
+        'blocklist': [list(ops.CABECALHOS_ABAS['blocklist'])],
+        'users': [["ID", "user_email", "role"], ["1", "ana@exemplo.com", "operacional"]],
+        'access_requests': [
+            list(ops.CABECALHOS_ABAS['access_requests']),
+            ["1", "bia@exemplo.com", "Bia", "operacional", "TI", "", "", "2026-10-16", "Pendente", ""],
+        ],
+        'schedules': [
+            list(ops.CABECALHOS_ABAS['schedules']),
+            ["1", "Caio", "", "Empresa X", "17/10/2026", "09:00", "Ana", "Agendado", ""],
+        ],
+    })
+    ops.usar_backend(backend)
+    data_operations._shared_access_dataset.clear()
+    cache_tags.invalidar('blocklist', 'users')
+    yield backend
+    data_operations._shared_access_dataset.clear()
+    cache_tags.invalidar('blocklist', 'users')
+
+
+@pytest.fixture
+def mensagens(monkeypatch):
+    """Mensagens de erro, aviso e sucesso mostradas na interface."""
+    mostradas = []
+    monkeypatch.setattr(st, 'error', lambda texto, *a, **k: mostradas.append(('error', texto)))
+    monkeypatch.setattr(st, 'warning', lambda texto, *a, **k: mostradas.append(('warning', texto)))
+    monkeypatch.setattr(st, 'success', lambda texto, *a, **k: mostradas.append(('success', texto)))
+    return mostradas
+
+
+def test_falha_na_leitura_mantem_o_conjunto_compartilhado(backend, mensagens, monkeypatch):
+    sheet_ops = ops.SheetOperations()
+    versao = data_operations.refresh_access_dataset(sheet_ops)
+    assert list(data_operations._shared_access_dataset()['df']['Nome']) == ["Ana"]
+
+    monkeypatch.setattr(ops.SheetOperations, 'carregar_dados_recentes', lambda self: None)
+
+    assert data_operations.refresh_access_dataset(sheet_ops) == versao
+    assert list(data_operations._shared_access_dataset()['df']['Nome']) == ["Ana"]
+    assert [tipo for tipo, _ in mensagens] == ['warning']
+
+
+def test_entrada_registrada_volta_como_a_planilha_exibe(backend, mensagens):
+    assert data_operations.add_record(
+        "Bruno", CPF_VALIDO, "ABC1D23", "Fiat", "09:15", "17/10/2026", "Empresa Y", "Autorizado", "", "Ana", "17/10/2026"
+    )
+
+    novo = _linhas(backend, 'acess')[-1]
+    assert novo["Nome"] == "Bruno" and novo["Horário de Entrada"] == "09:15"
+    assert novo["Horário de Saída"] == ""
+    # O ID gerado é gravado como texto e volta com todos os dígitos
+    assert novo["ID"].isdigit() and len(novo["ID"]) > ops.ID_DIGITOS_NO
+    assert [tipo for tipo, _ in mensagens] == ['success']
+
+
+def test_saida_no_mesmo_dia_fecha_o_registro(backend, mensagens):
+    ok, _ = data_operations.update_exit_time("Ana", "17/10/2026", "17:30")
+
+    assert ok
+    assert _linhas(backend, 'acess')[0]["Horário de Saída"] == "17:30"
+
+    ok, mensagem = data_operations.update_exit_time("Ana", "17/10/2026", "18:00")
+    assert not ok and mensagem == "Nenhum registro em aberto encontrado para esta pessoa."
+    assert _linhas(backend, 'acess')[0]["Horário de Saída"] == "17:30"
+
+
+def test_pernoite_cria_um_registro_por_dia(backend, mensagens):
+    backend.aba('acess').anexar([_acesso("2", "Caio", "15/10/2026", entrada="22:00")])
+
+    ok, _ = data_operations.update_exit_time("Caio", "17/10/2026", "06:45")
+
+    assert ok
+    registros = [r for r in _linhas(backend, 'acess') if r["Nome"] == "Caio"]
+    assert [(r["Data"], r["Horário de Entrada"], r["Horário de Saída"]) for r in registros] == [
+        ("15/10/2026", "22:00", "23:59"),
+        ("16/10/2026", "00:00", "23:59"),
+        ("17/10/2026", "00:00", "06:45"),
+    ]
+    assert len({r["ID"] for r in registros}) == 3
+
+
+def test_saida_sem_registro_em_aberto(backend, mensagens):
+    ok, mensagem = data_operations.update_exit_time("Zeca", "17/10/2026", "17:30")
+
+    assert not ok and mensagem == "Nenhum registro em aberto encontrado para esta pessoa."
+
+
+def test_aprovacao_preenche_o_cpf_da_visita_anterior(backend, mensagens):
+    anterior = _acesso("2", "Davi", "10/10/2026", saida="12:00")
+    pendente = _acesso("3", "Davi", "17/10/2026", status="Pendente")
+    anterior[CABECALHO_ACESS.index("CPF")] = CPF_VALIDO
+    pendente[CABECALHO_ACESS.index("CPF")] = ""
+    backend.aba('acess').anexar([anterior, pendente])
+
+    assert data_operations.update_record_status("3", "Autorizado", "Ana")
+
+    registro = next(r for r in _linhas(backend, 'acess') if r["ID"] == "3")
+    assert registro["Status da Entrada"] == "Autorizado"
+    assert registro["Aprovador"] == "Ana"
+    assert registro["CPF"] == CPF_VALIDO
+
+
+def test_exclusao_de_registro_por_id(backend, mensagens):
+    assert data_operations.delete_record_by_id("1", "17/10/2026")
+    assert _linhas(backend, 'acess') == []
+
+    assert not data_operations.delete_record_by_id("1", "17/10/2026")
+    assert [tipo for tipo, _ in mensagens] == ['warning', 'error']
+
+
+def test_bloqueio_e_liberacao(backend, mensagens):
+    assert data_operations.add_to_blocklist("Empresa", ["Empresa Z"], "Pendência", "Ana")
+    cache_tags.invalidar('blocklist')
+
+    assert data_operations.is_entity_blocked("Fulano", "empresa z") == (True, "Pendência")
+    assert data_operations.is_entity_blocked("Fulano", "Empresa X") == (False, None)
+
+    block_id = _linhas(backend, 'blocklist')[0]["ID"]
+    assert data_operations.remove_from_blocklist([block_id])
+    cache_tags.invalidar('blocklist')
+
+    assert _linhas(backend, 'blocklist') == []
+    assert data_operations.is_entity_blocked("Fulano", "Empresa Z") == (False, None)
+
+
+def test_inclusao_e_remocao_de_usuarios(backend, mensagens):
+    assert data_operations.add_user("Bia@Exemplo.com", "operacional")
+    assert data_operations.add_user("caio@exemplo.com", "operacional")
+    assert [r["user_email"] for r in _linhas(backend, 'users')] == [
+        "ana@exemplo.com", "bia@exemplo.com", "caio@exemplo.com"
+    ]
+
+    assert data_operations.remove_user("ANA@exemplo.com")
+    assert data_operations.remove_users(["bia@exemplo.com", "zeca@exemplo.com"]) == ["bia@exemplo.com"]
+    assert [r["user_email"] for r in _linhas(backend, 'users')] == ["caio@exemplo.com"]
+
+
+def test_revisao_de_solicitacao_e_check_in_de_agendamento(backend, mensagens):
+    assert data_operations.update_access_request_status("1", "Aprovado", "Ana")
+    solicitacao = _linhas(backend, 'access_requests')[0]
+    assert (solicitacao["status"], solicitacao["reviewed_by"]) == ("Aprovado", "Ana")
+    assert solicitacao["user_email"] == "bia@exemplo.com"
+
+    assert data_operations.update_schedule_status("1", "Realizado", "09:05")
+    agendamento = _linhas(backend, 'schedules')[0]
+    assert (agendamento["Status"], agendamento["CheckInTime"]) == ("Realizado", "09:05")
+    assert agendamento["VisitorName"] == "Caio"
@@ -0,0 +1,91 @@
+from datetime import date, datetime
+import pytest
+import app.log_query as log_query
+import app.operations as ops
+from app.storage import MemoriaBackend
+
+CABECALHO_LOGS = ops.CABECALHOS_ABAS['logs']
+
+
+def _logs(ano, mes, usuarios):
+    return [list(CABECALHO_LOGS)] + [
+        [f"{ano:04d}-{mes:02d}-{dia:02d} 10:00:00", usuario, f"acao {usuario}", ""]
+        for dia, usuario in enumerate(usuarios, start=1)
+    ]
+
+
+@pytest.fixture
+def abas_lidas(monkeypatch):
+    """Abas de logs em memória (agosto a outubro de 2026); registra as abas lidas em cada chamada."""
+    backend = MemoriaBackend({
+        'logs_2026_10': _logs(2026, 10, ["ana", "bia"]),
+        'logs_2026_09': _logs(2026, 9, ["caio"]),
+        'logs_2026_08': _logs(2026, 8, ["davi"]),
+    })
+    lidas = []
+    ler_intervalos = backend.ler_intervalos
+
+    def registrar(intervalos):
+        lidas.append([nome for nome, *_ in intervalos])
+        return ler_intervalos(intervalos)
+
+    monkeypatch.setattr(backend, 'ler_intervalos', registrar)
+    monkeypatch.setattr(log_query, '_indices', {})
+    monkeypatch.setattr(log_query, 'get_sao_paulo_time', lambda: datetime(2026, 10, 17, 12, 0))
+    ops.usar_backend(backend)
+    return lidas
+
+
+def test_opcoes_sem_periodo_indexam_so_o_mes_corrente(abas_lidas):
+    usuarios, acoes = log_query.opcoes_filtro_logs()
+
+    assert usuarios == ["ana", "bia"]
+    assert acoes == ["acao ana", "acao bia"]
+    assert abas_lidas == [['logs_2026_10']]
+
+
+def test_opcoes_do_periodo_leem_so_as_abas_dele(abas_lidas):
+    usuarios, _ = log_query.opcoes_filtro_logs(date(2026, 8, 1), date(2026, 8, 31))
+
+    assert usuarios == ["davi"]
+    assert abas_lidas == [['logs_2026_08']]
+
+
+def test_primeira_pagina_indexa_so_as_abas_necessarias(abas_lidas):
+    linhas, ha_mais = log_query.consultar_logs(limite=1)
+
+    assert [row[1] for row in linhas] == ["bia"]
+    assert ha_mais
+    assert all(nome == 'logs_2026_10' for chamada in abas_lidas for nome in chamada)
+
+    abas_lidas.clear()
+    linhas, ha_mais = log_query.consultar_logs(limite=3)
+
+    assert [row[1] for row in linhas] == ["bia", "ana", "caio"]
+    assert ha_mais
+    # Cada aba antiga é indexada só quando a busca chega a ela
+    assert ['logs_2026_09'] in abas_lidas and ['logs_2026_08'] in abas_lidas
+
+
+def test_entradas_da_aba_legada_saem_na_ordem_do_timestamp(abas_lidas):
+    # A virada de mês deixou na aba 'logs' um trecho de outubro (a aba mensal já
+    # existia) e o mês de julho
+    legada = [list(CABECALHO_LOGS),
+              ["2026-07-20 09:00:00", "gil", "acao gil", ""],
+              ["2026-10-01 12:00:00", "eva", "acao eva", ""],
+              ["2026-07-05 09:00:00", "fabio", "acao fabio", ""]]
+    ops.usar_backend(MemoriaBackend({
+        'logs_2026_10': _logs(2026, 10, ["ana", "bia"]),
+        'logs_2026_09': _logs(2026, 9, ["caio"]),
+        'logs': legada,
+    }))
+
+    linhas, ha_mais = log_query.consultar_logs(limite=2)
+
+    assert [row[1] for row in linhas] == ["bia", "eva"]
+    assert ha_mais
+
+    linhas, ha_mais = log_query.consultar_logs()
+
+    assert [row[1] for row in linhas] == ["bia", "eva", "ana", "caio", "gil", "fabio"]
+    assert not ha_mais
@@ -0,0 +1,350 @@
+import time
+from datetime import datetime
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+import app.operations as ops
+from app.storage import AbaMemoria, MemoriaBackend
+
+CABECALHO_ACESS = ops.CABECALHOS_ABAS['acess']
+CABECALHO_MATERIAIS = ops.CABECALHOS_ABAS['materials']
+CABECALHO_LOGS = ops.CABECALHOS_ABAS['logs']
+
+
+def _acesso(nome, data, saida="18:00", status="Autorizado"):
+    """Linha da aba 'acess' sem o ID, na ordem do cabeçalho."""
+    valores = {
+        "Nome": nome, "CPF": "123.456.789-09", "Placa": "", "Marca do Carro": "",
+        "Horário de Entrada": "08:00", "Horário de Saída": saida, "Data": data,
+        "Empresa": "Empresa X", "Status da Entrada": status, "Motivo do Bloqueio": "",
+        "Aprovador": "", "Data do Primeiro Registro": data,
+    }
+    return [valores[coluna] for coluna in CABECALHO_ACESS[1:]]
+
+
+@pytest.fixture
+def backend():
+    backend = MemoriaBackend({
+        'acess': [list(CABECALHO_ACESS)],
+        'materials': [list(CABECALHO_MATERIAIS)],
+    })
+    ops.usar_backend(backend)
+    return backend
+
+
+@pytest.fixture
+def sheet_ops(backend):
+    return ops.SheetOperations()
+
+
+@pytest.fixture
+def anexacoes(monkeypatch):
+    """Registra (aba, quantidade de linhas) de cada chamada de anexação."""
+    chamadas = []
+    original = AbaMemoria.anexar
+
+    def anexar(self, linhas):
+        chamadas.append((self.nome, len(linhas)))
+        return original(self, linhas)
+
+    monkeypatch.setattr(AbaMemoria, 'anexar', anexar)
+    return chamadas
+
+
+def _ids(dados):
+    return [row[0] for row in dados[1:]]
+
+
+def test_incluir_editar_excluir(sheet_ops, backend):
+    assert sheet_ops.adc_dados_aba(["Cabo", "2", "Oficina", "Ana"], 'materials')
+    dados = sheet_ops.carregar_dados_aba('materials')
+    assert [row[1:] for row in dados[1:]] == [["Cabo", "2", "Oficina", "Ana"]]
+    row_id = dados[1][0]
+
+    assert sheet_ops.editar_dados_aba(row_id, ["Cabo", "3", "Oficina", "Ana"], 'materials')
+    assert backend._abas['materials'][1] == [row_id, "Cabo", "3", "Oficina", "Ana"]
+    assert sheet_ops.carregar_dados_aba('materials')[1][2] == "3"
+
+    assert sheet_ops.excluir_dados_por_id_aba(row_id, 'materials')
+    assert backend._abas['materials'] == [list(CABECALHO_MATERIAIS)]
+    assert sheet_ops.carregar_dados_aba('materials') == [list(CABECALHO_MATERIAIS)]
+
+
+def test_ids_unicos_e_crescentes(sheet_ops, backend):
+    assert sheet_ops.adc_dados_aba_lote([["Item", str(i), "", ""] for i in range(20)], 'materials')
+    ids = [int(row_id) for row_id in _ids(backend._abas['materials'])]
+    assert len(set(ids)) == 20 and ids == sorted(ids)
+
+
+def test_inclusao_e_exclusao_em_lote(sheet_ops, backend, anexacoes):
+    assert sheet_ops.adc_dados_aba_lote([["Item", str(i), "", ""] for i in range(5)], 'materials')
+    assert anexacoes == [('materials', 5)]
+
+    ids = _ids(backend._abas['materials'])
+    excluidos = sheet_ops.excluir_dados_por_ids_aba([ids[0], ids[2], ids[4], "inexistente"], 'materials')
+
+    assert sorted(excluidos) == sorted([ids[0], ids[2], ids[4]])
+    assert _ids(backend._abas['materials']) == [ids[1], ids[3]]
+    # O índice de IDs continua certo após a exclusão
+    assert sheet_ops.excluir_dados_por_id_aba(ids[3], 'materials')
+    assert _ids(backend._abas['materials']) == [ids[1]]
+
+
+def test_atualizar_campos_refaz_a_alteracao_em_conflito(sheet_ops, backend):
+    """Edição concorrente: a alteração é recalculada sobre o valor atual, sem sobrescrevê-lo."""
+    assert sheet_ops.adc_dados_aba(["Cabo", "1", "", ""], 'materials')
+    row_id = _ids(backend._abas['materials'])[0]
+    sheet_ops.carregar_dados_aba('materials')
+    vistos = []
+
+    def somar_um(registro):
+        vistos.append(registro["Quantidade"])
+        if len(vistos) == 1:
+            # Outra sessão grava entre a leitura e a gravação desta
+            backend._abas['materials'][1][2] = "5"
+        return {"Quantidade": str(int(registro["Quantidade"]) + 1)}
+
+    assert sheet_ops.atualizar_campos_aba(row_id, somar_um, 'materials') is True
+    assert vistos == ["1", "5"]
+    assert backend._abas['materials'][1][2] == "6"
+
+
+def test_atualizar_campos_desiste_quando_nao_se_aplica(sheet_ops, backend):
+    assert sheet_ops.adc_dados_aba(["Cabo", "1", "", ""], 'materials')
+    row_id = _ids(backend._abas['materials'])[0]
+    assert sheet_ops.atualizar_campos_aba(row_id, lambda registro: None, 'materials') is None
+    assert sheet_ops.atualizar_campos_aba("inexistente", lambda registro: {"Quantidade": "9"}, 'materials') is False
+
+
+def test_arquivamento_mensal(sheet_ops, backend):
+    assert sheet_ops.adc_dados_aba_lote([
+        _acesso("Setembro Encerrado", "10/09/2026"),
+        _acesso("Setembro Na Unidade", "11/09/2026", saida=""),
+        _acesso("Setembro Pendente", "12/09/2026", saida="", status="Pendente de Aprovação"),
+        _acesso("Agosto Encerrado", "05/08/2026"),
+        _acesso("Outubro Encerrado", "01/10/2026"),
+    ], 'acess')
+
+    assert sheet_ops.arquivar_meses_anteriores(hoje=datetime(2026, 10, 17))
+
+    def nomes(aba_name):
+        return sorted(row[1] for row in backend._abas[aba_name][1:])
+
+    assert nomes('acess') == ["Outubro Encerrado", "Setembro Na Unidade", "Setembro Pendente"]
+    assert nomes('acess_2026_09') == ["Setembro Encerrado"]
+    assert nomes('acess_2026_08') == ["Agosto Encerrado"]
+    assert backend._abas['acess_2026_09'][0] == list(CABECALHO_ACESS)
+
+    # Repetir não duplica nada
+    assert sheet_ops.arquivar_meses_anteriores(hoje=datetime(2026, 10, 17))
+    assert nomes('acess_2026_09') == ["Setembro Encerrado"]
+
+    setembro = sheet_ops.carregar_dados_mes(2026, 9)
+    assert sorted(row[1] for row in setembro[1:]) == ["Setembro Encerrado", "Setembro Na Unidade", "Setembro Pendente"]
+
+
+def test_virada_mensal_dos_logs(backend):
+    backend._abas['logs'] = [list(CABECALHO_LOGS)] + [
+        [f"2026-{mes:02d}-05 10:00:0{i}", "Ana", "LOGIN", f"{mes}-{i}"] for mes in (8, 9, 10) for i in range(2)
+    ]
+    backend._abas['logs_2026_09'] = [list(CABECALHO_LOGS), ["2026-09-05 10:00:00", "Ana", "LOGIN", "9-0"]]
+    sheet_ops = ops.SheetOperations()
+
+    assert sheet_ops.virar_mes_logs(hoje=datetime(2026, 10, 17))
+
+    assert [row[3] for row in backend._abas['logs_2026_08'][1:]] == ["8-0", "8-1"]
+    assert [row[3] for row in backend._abas['logs_2026_10'][1:]] == ["10-0", "10-1"]
+    assert backend._abas['logs_2026_11'] == [list(CABECALHO_LOGS)]
+    # Setembro já tinha aba mensal: só sai da aba antiga o que já está nela
+    assert [row[3] for row in backend._abas['logs_2026_09'][1:]] == ["9-0"]
+    assert [row[3] for row in backend._abas['logs'][1:]] == ["9-1"]
+    assert sheet_ops.abas_de_logs() == ['logs_2026_11', 'logs_2026_10', 'logs_2026_09', 'logs_2026_08', 'logs']
+
+    # Repetir não move nem duplica nada
+    assert sheet_ops.virar_mes_logs(hoje=datetime(2026, 10, 17))
+    assert len(backend._abas['logs_2026_10']) == 3 and len(backend._abas['logs']) == 2
+
+
+def test_recarga_apos_inclusao_externa(sheet_ops, backend, monkeypatch):
+    """Linhas anexadas por outro processo entram no snapshot uma única vez."""
+    monkeypatch.setattr(ops, 'INTERVALO_VERIFICACAO_SEGUNDOS', 0)
+    assert sheet_ops.adc_dados_aba_lote([_acesso(f"Pessoa {i}", "01/10/2026") for i in range(3)], 'acess')
+    antes = sheet_ops.carregar_dados_aba('acess')
+    assert len(antes) == 4
+
+    backend._abas['acess'].append(["999", *_acesso("Externa", "02/10/2026")])
+    depois = sheet_ops.carregar_dados_aba('acess')
+
+    assert depois[:4] == antes
+    assert [row[1] for row in depois[4:]] == ["Externa"]
+    assert depois.count(list(CABECALHO_ACESS)) == 1
+
+
+def test_fila_deixa_de_estar_em_uso_apos_gravar_e_limpar(monkeypatch):
+    from app import write_queue
+    monkeypatch.setattr(ops, 'GRAVACAO_ADIADA', False)
+    seq = write_queue.enfileirar('acess', 'anexar', ["1"], [["Pessoa"]])
+    assert ops._fila_em_uso()
+    assert ops.estado_gravacoes_adiadas('acess') == {"1": 'pendente'}
+
+    write_queue.marcar(seq, 'gravado')
+    assert ops._fila_em_uso()
+    assert ops.estado_gravacoes_adiadas('acess') == {"1": 'gravado'}
+
+    monkeypatch.setattr(write_queue, 'RETENCAO_GRAVADOS_SEGUNDOS', -1)
+    assert not ops._fila_em_uso()
+    assert write_queue.limpar_gravados() >= 1
+    assert write_queue.em_aberto() == []
+
+
+def test_excluir_registro_ja_arquivado(sheet_ops, backend):
+    assert sheet_ops.adc_dados_aba_lote([
+        _acesso("Setembro Encerrado", "10/09/2026"),
+        _acesso("Outubro Encerrado", "01/10/2026"),
+    ], 'acess')
+    assert sheet_ops.arquivar_meses_anteriores(hoje=datetime(2026, 10, 17))
+    arquivado = backend._abas['acess_2026_09'][1][0]
+    atual = backend._abas['acess'][1][0]
+    assert len(sheet_ops.carregar_dados_mes(2026, 9)) == 2
+
+    assert sheet_ops.excluir_dados(arquivado, "10/09/2026")
+    assert backend._abas['acess_2026_09'] == [list(CABECALHO_ACESS)]
+    assert sheet_ops.carregar_dados_mes(2026, 9) == [list(CABECALHO_ACESS)]
+
+    assert sheet_ops.excluir_dados(atual, "01/10/2026")
+    assert backend._abas['acess'] == [list(CABECALHO_ACESS)]
+
+
+def test_inclusao_e_edicao_guardadas_durante_queda(sheet_ops, backend, monkeypatch):
+    """Com a planilha fora do ar, inclusões e edições em qualquer aba vão para a fila e são reenviadas depois."""
+    from app import write_queue
+    monkeypatch.setattr(ops, 'iniciar_gravacao_adiada', lambda: None)
+    assert sheet_ops.adc_dados_aba(["Cabo", "1", "", ""], 'materials')
+    row_id = _ids(backend._abas['materials'])[0]
+    sheet_ops.carregar_dados_aba('materials')
+
+    def fora_do_ar(*args, **kwargs):
+        raise ConnectionError("planilha fora do ar")
+
+    monkeypatch.setattr(AbaMemoria, 'anexar', fora_do_ar)
+    monkeypatch.setattr(AbaMemoria, 'atualizar_celulas', fora_do_ar)
+    assert sheet_ops.adc_dados_aba(["Fita", "2", "", ""], 'materials')
+    assert sheet_ops.editar_dados_aba(row_id, ["Cabo", "7", "", ""], 'materials')
+    assert sheet_ops._guardado_na_fila
+    assert [item['operacao'] for item in write_queue.em_aberto('materials')] == ['anexar', 'campos']
+    # As leituras já refletem o que está na fila
+    assert [row[1:3] for row in sheet_ops.carregar_dados_aba('materials')[1:]] == [["Cabo", "7"], ["Fita", "2"]]
+
+    monkeypatch.undo()
+    monkeypatch.setattr(ops, 'iniciar_gravacao_adiada', lambda: None)
+    for item in write_queue.em_aberto('materials'):
+        assert sheet_ops._gravar_item_da_fila(item)
+    assert write_queue.em_aberto('materials') == []
+    assert [row[1:3] for row in backend._abas['materials'][1:]] == [["Cabo", "7"], ["Fita", "2"]]
+
+
+def test_falha_permanente_nao_vai_para_a_fila(sheet_ops, backend, monkeypatch):
+    """Um erro que não é de conexão nem de cota (ex.: 400) é informado em vez de ir para a fila."""
+    from app import write_queue
+    monkeypatch.setattr(ops, 'iniciar_gravacao_adiada', lambda: None)
+    assert sheet_ops.adc_dados_aba(["Cabo", "1", "", ""], 'materials')
+    row_id = _ids(backend._abas['materials'])[0]
+    erros = []
+    monkeypatch.setattr(ops.st, 'error', erros.append)
+
+    def valor_invalido(*args, **kwargs):
+        raise HttpError(httplib2.Response({'status': 400}), b'Invalid value')
+
+    monkeypatch.setattr(AbaMemoria, 'anexar', valor_invalido)
+    monkeypatch.setattr(AbaMemoria, 'atualizar_celulas', valor_invalido)
+    assert sheet_ops.adc_dados_aba(["Fita", "2", "", ""], 'materials') is False
+    assert sheet_ops.editar_dados_aba(row_id, ["Cabo", "7", "", ""], 'materials') is False
+    assert not sheet_ops._guardado_na_fila
+    assert write_queue.em_aberto('materials') == []
+    assert len(erros) == 1
+
+
+def test_exclusao_recusada_sem_esperar_a_fila(sheet_ops, backend, monkeypatch):
+    from app import write_queue
+    monkeypatch.setattr(ops, 'iniciar_gravacao_adiada', lambda: None)
+    assert sheet_ops.adc_dados_aba(["Cabo", "1", "", ""], 'materials')
+    row_id = _ids(backend._abas['materials'])[0]
+    avisos = []
+    monkeypatch.setattr(ops.st, 'warning', avisos.append)
+    seq = write_queue.enfileirar('materials', 'campos', [row_id], {'campos': {"Quantidade": "2"}, 'esperado': {"Quantidade": "1"}})
+
+    inicio = time.monotonic()
+    assert sheet_ops.excluir_dados_por_id_aba(row_id, 'materials') is False
+    assert time.monotonic() - inicio < 1
+    assert avisos == [ops.AVISO_FILA_PENDENTE]
+    assert _ids(backend._abas['materials']) == [row_id]
+
+    write_queue.marcar(seq, 'gravado')
+    assert sheet_ops.excluir_dados_por_id_aba(row_id, 'materials')
+
+
+def _edicao_guardada_durante_queda(sheet_ops, backend, monkeypatch, nova_quantidade):
+    """Inclui um material, e edita a quantidade com a planilha fora do ar. Retorna (ID, item da fila)."""
+    from app import write_queue
+    monkeypatch.setattr(ops, 'iniciar_gravacao_adiada', lambda: None)
+    assert sheet_ops.adc_dados_aba(["Cabo", "1", "Oficina", "Ana"], 'materials')
+    row_id = _ids(backend._abas['materials'])[0]
+    sheet_ops.carregar_dados_aba('materials')
+    atualizar_celulas = AbaMemoria.atualizar_celulas
+
+    def fora_do_ar(*args, **kwargs):
+        raise ConnectionError("planilha fora do ar")
+
+    monkeypatch.setattr(AbaMemoria, 'atualizar_celulas', fora_do_ar)
+    assert sheet_ops.editar_dados_aba(row_id, ["Cabo", nova_quantidade, "Oficina", "Ana"], 'materials')
+    monkeypatch.setattr(AbaMemoria, 'atualizar_celulas', atualizar_celulas)
+    item, = write_queue.em_aberto('materials')
+    assert item['dados'] == {'campos': {"Quantidade": nova_quantidade}, 'esperado': {"Quantidade": "1"}}
+    return row_id, item
+
+
+def test_reenvio_da_fila_preserva_edicoes_de_outras_colunas(sheet_ops, backend, monkeypatch):
+    from app import write_queue
+    row_id, item = _edicao_guardada_durante_queda(sheet_ops, backend, monkeypatch, "7")
+    backend._abas['materials'][1][3] = "Portaria"
+
+    assert sheet_ops._gravar_item_da_fila(item)
+    assert backend._abas['materials'][1] == [row_id, "Cabo", "7", "Portaria", "Ana"]
+    assert write_queue.estado_por_id('materials') == {row_id: 'gravado'}
+
+
+def test_reenvio_da_fila_nao_sobrescreve_edicao_posterior(sheet_ops, backend, monkeypatch):
+    from app import write_queue
+    row_id, item = _edicao_guardada_durante_queda(sheet_ops, backend, monkeypatch, "7")
+    backend._abas['materials'][1][2] = "9"
+
+    assert sheet_ops._gravar_item_da_fila(item)
+    assert backend._abas['materials'][1][2] == "9"
+    assert write_queue.estado_por_id('materials') == {row_id: 'falhou'}
+
+
+def test_reenvio_de_edicao_que_ja_chegou_a_planilha(sheet_ops, backend, monkeypatch):
+    from app import write_queue
+    row_id, item = _edicao_guardada_durante_queda(sheet_ops, backend, monkeypatch, "7")
+    backend._abas['materials'][1][2] = "7"
+
+    assert sheet_ops._gravar_item_da_fila(item)
+    assert write_queue.estado_por_id('materials') == {row_id: 'gravado'}
+
+
+def test_campos_adiados_reenviados_com_controle_de_concorrencia(sheet_ops, backend, monkeypatch):
+    from app import write_queue
+    monkeypatch.setattr(ops, 'iniciar_gravacao_adiada', lambda: None)
+    assert sheet_ops.adc_dados_aba(["Cabo", "1", "", ""], 'materials')
+    row_id = _ids(backend._abas['materials'])[0]
+    monkeypatch.setattr(ops, 'GRAVACAO_ADIADA', True)
+    monkeypatch.setattr(ops, 'ABAS_GRAVACAO_ADIADA', ('materials',))
+
+    assert sheet_ops.atualizar_campos_aba(row_id, lambda registro: {"Quantidade": "2"}, 'materials') is True
+    item, = write_queue.em_aberto('materials')
+    # Outra portaria altera o registro antes do envio
+    backend._abas['materials'][1][4] = "Bia"
+
+    assert sheet_ops._gravar_item_da_fila(item)
+    assert backend._abas['materials'][1][2] == "1"
+    assert write_queue.estado_por_id('materials') == {row_id: 'falhou'}
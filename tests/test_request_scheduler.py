@@ -0,0 +1,59 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+import app.request_scheduler as agendamento
+
+
+def _erro_http(status):
+    return HttpError(httplib2.Response({'status': status}), b'')
+
+
+class RequisicaoFalsa:
+    """HttpRequest mínimo: falha com os erros informados e depois responde."""
+
+    def __init__(self, method, erros):
+        self.method = method
+        self.erros = list(erros)
+        self.execucoes = 0
+
+    def execute(self):
+        self.execucoes += 1
+        if self.erros:
+            raise self.erros.pop(0)
+        return {'ok': True}
+
+
+@pytest.fixture
+def executar(monkeypatch):
+    """_execute_requests de um cliente pygsheets falso, com o agendador instalado e sem esperas."""
+    monkeypatch.setattr(agendamento.time, 'sleep', lambda segundos: None)
+
+    class Cliente:
+        class sheet:
+            @staticmethod
+            def _execute_requests(request):
+                return request.execute()
+
+    agendamento.instalar_agendador(Cliente, cota_por_minuto=600)
+    return Cliente.sheet._execute_requests
+
+
+@pytest.mark.parametrize('erro', [_erro_http(503), ConnectionError(), TimeoutError()])
+def test_leitura_repetida_em_erro_transitorio(executar, erro):
+    requisicao = RequisicaoFalsa('GET', [erro])
+    assert executar(requisicao) == {'ok': True}
+    assert requisicao.execucoes == 2
+
+
+@pytest.mark.parametrize('erro', [_erro_http(503), ConnectionError(), TimeoutError()])
+def test_gravacao_nao_repetida_se_pode_ter_sido_aplicada(executar, erro):
+    requisicao = RequisicaoFalsa('POST', [erro])
+    with pytest.raises(type(erro)):
+        executar(requisicao)
+    assert requisicao.execucoes == 1
+
+
+def test_gravacao_repetida_apos_cota_excedida(executar):
+    requisicao = RequisicaoFalsa('POST', [_erro_http(429), _erro_http(429)])
+    assert executar(requisicao) == {'ok': True}
+    assert requisicao.execucoes == 3
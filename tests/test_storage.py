@@ -0,0 +1,87 @@
+import app.operations as ops
+from app.storage import (
+    AbaGoogleSheets, GoogleSheetsBackend, MemoriaBackend, intervalo_a1, texto_literal, valor_como_gravado
+)
+
+CABECALHO = ["ID", "Nome", "Data"]
+
+
+def _linhas(quantidade):
+    return [CABECALHO] + [[str(i), f"Pessoa {i}", "01/10/2026"] for i in range(1, quantidade + 1)]
+
+
+def test_intervalo_a1():
+    assert intervalo_a1('acess') == "'acess'"
+    assert intervalo_a1('acess', 8, 13) == "'acess'!A8:M"
+    assert intervalo_a1('acess', 2, 3, 10) == "'acess'!A2:C10"
+    assert intervalo_a1('acess', 10, None, 12) == "'acess'!10:12"
+    assert intervalo_a1("d'água", 1, 28, 1, coluna_inicio=2) == "'d''água'!B1:AC1"
+
+
+def test_ler_a_partir_google_pede_so_o_final(planilha_falsa):
+    planilha = planilha_falsa({'acess': _linhas(7)})
+    aba = AbaGoogleSheets(planilha.abas['acess'])
+
+    novas = aba.ler_a_partir(7, 3)
+
+    assert planilha.chamadas == [('values_get', "'acess'!A7:C")]
+    assert novas == [["6", "Pessoa 6", "01/10/2026"], ["7", "Pessoa 7", "01/10/2026"]]
+
+
+def test_ler_a_partir_google_sem_linhas_novas(planilha_falsa):
+    planilha = planilha_falsa({'acess': _linhas(7)})
+    assert AbaGoogleSheets(planilha.abas['acess']).ler_a_partir(9, 3) == []
+
+
+def test_ler_a_partir_igual_nos_dois_backends(planilha_falsa):
+    google = AbaGoogleSheets(planilha_falsa({'acess': _linhas(5)}).abas['acess'])
+    memoria = MemoriaBackend({'acess': _linhas(5)}).aba('acess')
+    for inicio, largura in ((1, 3), (3, 2), (6, 3), (10, 1)):
+        assert google.ler_a_partir(inicio, largura) == memoria.ler_a_partir(inicio, largura)
+
+
+def test_recarga_incremental_google_nao_duplica_a_aba(planilha_falsa, monkeypatch):
+    """Linhas anexadas fora da aplicação entram no snapshot uma única vez, sem o cabeçalho."""
+    monkeypatch.setattr(ops, 'INTERVALO_VERIFICACAO_SEGUNDOS', 0)
+    planilha = planilha_falsa({'acess': _linhas(6)})
+    backend = GoogleSheetsBackend(planilha)
+    backend.chave = 'planilha-falsa'
+    ops.usar_backend(backend)
+    sheet_ops = ops.SheetOperations()
+
+    assert sheet_ops.carregar_dados_aba('acess') == _linhas(6)
+
+    planilha.abas['acess'].linhas.append(["7", "Pessoa 7", "01/10/2026"])
+    planilha.chamadas.clear()
+    dados = sheet_ops.carregar_dados_aba('acess')
+
+    assert dados == _linhas(7)
+    assert ('get_all_values', 'acess') not in planilha.chamadas
+    assert ('values_get', "'acess'!A8:C") in planilha.chamadas
+
+
+def test_valor_como_gravado_reproduz_a_planilha():
+    assert valor_como_gravado(88143912345678) == "8.81439E+13"
+    assert valor_como_gravado("120000000000000") == "1.2E+14"
+    assert valor_como_gravado(texto_literal(88143912345678)) == "88143912345678"
+    assert valor_como_gravado("0123") == "123"
+    assert valor_como_gravado("123.456.789-09") == "123.456.789-09"
+    assert valor_como_gravado("Pessoa 1") == "Pessoa 1"
+
+
+def test_ids_gerados_voltam_intactos_do_google(planilha_falsa):
+    """Os IDs (inteiros de 15 dígitos) vão como texto e continuam localizáveis para edição."""
+    cabecalho = ops.CABECALHOS_ABAS['materials']
+    planilha = planilha_falsa({'materials': [list(cabecalho)]})
+    backend = GoogleSheetsBackend(planilha)
+    backend.chave = 'planilha-falsa'
+    ops.usar_backend(backend)
+    sheet_ops = ops.SheetOperations()
+
+    assert sheet_ops.adc_dados_aba(["Notebook", "1", "Almoxarifado", "Ana"], 'materials')
+    row_id = planilha.abas['materials'].linhas[1][0]
+    assert len(row_id) >= 15 and row_id.isdigit()
+
+    assert sheet_ops.editar_dados_aba(row_id, ["Notebook", "2", "Almoxarifado", "Ana"], 'materials')
+    assert planilha.abas['materials'].linhas[1] == [row_id, "Notebook", "2", "Almoxarifado", "Ana"]
+    assert sheet_ops._indice_ids('materials', sheet_ops._obter_aba('materials'), reconstruir=True) == {row_id: 2}